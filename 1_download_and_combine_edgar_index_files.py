@@ -18,8 +18,10 @@ Description: This code downloads SEC index files from EDGAR and combines the
 # =================================================================================================
 import os
 import time
-import pandas as pd
 import requests
+from f8_edgar_index import (write_directory, index_files, refresh_index,   # selfmade functions
+                            append_directory, fetch_index, FULL_INDEX_URL, FULL_INDEX_GZ_URL)
+from f13_metrics import Metrics
 
 
 # =================================================================================================
@@ -34,93 +36,86 @@ QUARTERS = ['QTR1', 'QTR2', 'QTR3', 'QTR4']
 # the absolute path to the folder for saving the index files and the final csv
 FILE_DIR = 'D:/path/subpath'
 
+# with True, only index files that may have changed are requested (conditional requests) and
+# only the new filings are appended to 'NSAR_directory.csv'; they are also written to
+# 'NSAR_directory_delta.csv', which can be given to the download code; YEARS has to include
+# the current year
+INCREMENTAL = False
+# with True, the current quarter is read from the daily indexes instead of its full index
+DAILY_INDEX = True
+# with True, the compressed full indexes (form.gz) are downloaded and filtered while they arrive;
+# the saved index files only keep their header and the N-SAR and N-CEN rows (FORM_TYPES in
+# f8_edgar_index.py), so other form types need a new download
+COMPRESSED_INDEX = False
+# EDGAR asks for a User-Agent that identifies you, e.g., 'Name Surname name@domain.com'
+USER_AGENT = 'Name Surname name@domain.com'
+
+# metrics of every run are appended as JSON lines (stages, errors, summary; see f13_metrics.py)
+METRICS = 'D:/path/subpath/metrics.jsonl'
+
 
 # =================================================================================================
 # DOWNLOAD INDEX FILES
 # =================================================================================================
-# get a list of the files already saved; they will be skipped
-saved_files = os.listdir(FILE_DIR)
-
-# loop over the years and quarters. For each year/quarter combination, get the corresponding
-# index file from EDGAR, and save it as a text file
-for yr in YEARS:
-    for qtr in QUARTERS:
-        # filename pattern to store the index files locally
-        cur_file_name =  f'form-index-{yr}-{qtr}.txt'
-
-        # absolute path for storing the index file
-        cur_file_path = os.path.join(FILE_DIR, cur_file_name)
-
-        # only download if not already saved
-        if cur_file_name in saved_files:
-            print(f'Skipping index file for {yr}, {qtr} because it is already saved.')
-            continue
-
-        # SEC url leading to the index file
-        url = f'https://www.sec.gov/Archives/edgar/full-index/{yr}/{qtr}/form.idx'
-
-        # save the index file as txt
-        r = requests.get(url, stream=True)
-        with open(cur_file_path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=10240):
-                f.write(chunk)
-
-        # wait 0.1 seconds to not get blocked
-        time.sleep(0.1)
+metrics = Metrics(METRICS, 'index')
+metrics.begin_stage('download index')
+
+if INCREMENTAL:
+    # request what may have changed and append the new filings to the directory
+    changed_files = refresh_index(FILE_DIR, YEARS, QUARTERS, USER_AGENT, DAILY_INDEX,
+                                  compressed=COMPRESSED_INDEX, metrics=metrics)
+    new_filings = append_directory(changed_files, os.path.join(FILE_DIR, "NSAR_directory.csv"),
+                                   os.path.join(FILE_DIR, "NSAR_directory_delta.csv"))
+    metrics.count('index_files_changed', len(changed_files))
+    metrics.count('filings_new', new_filings)
+    print(f"{len(changed_files)} index files changed, {new_filings} new filings.")
+
+else:
+    # get a list of the files already saved; they will be skipped
+    saved_files = os.listdir(FILE_DIR)
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+
+    # loop over the years and quarters. For each year/quarter combination, get the corresponding
+    # index file from EDGAR, and save it as a text file
+    for yr in YEARS:
+        for qtr in QUARTERS:
+            # filename pattern to store the index files locally
+            cur_file_name =  f'form-index-{yr}-{qtr}.txt'
+
+            # absolute path for storing the index file
+            cur_file_path = os.path.join(FILE_DIR, cur_file_name)
+
+            # only download if not already saved
+            if cur_file_name in saved_files:
+                print(f'Skipping index file for {yr}, {qtr} because it is already saved.')
+                continue
+
+            # save the index file as txt; an error page (e.g., 403 or 404) is not saved
+            if COMPRESSED_INDEX:
+                # decompress and filter the compressed index file while it arrives
+                status, _ = fetch_index(session, FULL_INDEX_GZ_URL.format(yr=yr, qtr=qtr), cur_file_path,
+                                        filtered=True, metrics=metrics)
+            else:
+                status, _ = fetch_index(session, FULL_INDEX_URL.format(yr=yr, qtr=qtr), cur_file_path,
+                                        metrics=metrics)
+            if status != 200:
+                print(f'Index file for {yr}, {qtr}: HTTP status {status}.')
+
+            # wait 0.1 seconds to not get blocked
+            time.sleep(0.1)
 
 
 # =================================================================================================
 # COMBINE DOWNLOADED SEC INDEX FILES
 # =================================================================================================
-# loop through all filings
-filings = os.listdir(FILE_DIR)
-
-# keep files ending with txt
-filings = [f for f in filings if f.endswith(".txt")]
-
-for filing_name in filings:
-
-    # Open the current file and split it into lines
-    filing = os.path.join(FILE_DIR, filing_name)
-    filing = open(filing, "r")
-    filing = filing.read().splitlines()
-
-    # the EDGAR index file format is unusual; it doesn't use a column separator
-    # a columns starts always at a predefined distance from the line start
-    # identify this distance by finding the location of the headers
-    form_loc = filing[8].find('Form Type')
-    company_loc = filing[8].find('Company Name')
-    cik_loc = filing[8].find('CIK')
-    fdate_loc = filing[8].find('Date Filed')
-    fname_loc = filing[8].find('File Name')
-
-    # now loop through the lines in the file and extract the information
-    # from the previously identifed positional characters
-    entries = []
-    for line in filing[10:]:
-        entries.append([line[form_loc:company_loc].strip(),
-                        line[company_loc:cik_loc].strip(),
-                        line[cik_loc:fdate_loc].strip(),
-                        line[fdate_loc:fname_loc].strip(),
-                        line[fname_loc:].strip()])
-
-    # convert to data frame
-    index_table = pd.DataFrame(entries, 
-                               columns=["form_type", "comp_name", "cik", "fdate", "fname"])
-
-    # keep only relevant filings; restrict form_type on starting with "NSAR" or "N-CEN"
-    index_table = index_table[index_table.form_type.str.startswith(("NSAR", "N-CEN"))]
-
-    # save as csv
-    output_name = os.path.join(FILE_DIR, filing_name.split(".")[0]+"_NSAR.csv")
-    index_table.to_csv(output_name, index=False)
-
-    # print progress
-    print("File " + filing_name.split(".")[0] + " successfully exported as csv.")
-
-# finally, combine all csv to single file; first get filenames
-filings_csv = [f for f in os.listdir(FILE_DIR) if f.endswith(".csv")]
-
-# now combine to single file and save
-all_filings = pd.concat([pd.read_csv(os.path.join(FILE_DIR, f)) for f in filings_csv])
-all_filings.to_csv(os.path.join(FILE_DIR, "NSAR_directory.csv"), index=False)
+    metrics.end_stage()
+    metrics.begin_stage('combine')
+
+    # all index files in the order of years and quarters
+    index_paths = index_files(FILE_DIR)
+
+    # the N-SAR and N-CEN rows of every index file are written straight into the single csv file
+    write_directory(index_paths, os.path.join(FILE_DIR, "NSAR_directory.csv"))
+
+metrics.close()
@@ -15,73 +15,133 @@ Description: This code downloads all SEC filings from 'NSAR_directory.csv', whic
 # PACKAGES
 # =================================================================================================
 import os
-import time
+import sys
+import asyncio
 import pandas as pd
-import requests
+from f3_download import download_filings, save_file, SharedTokenBucket   # selfmade functions
+from f4_catalog import (open_catalog, add_index_rows, adopt_existing_files, pending_filings,
+                        record_download)
+from f5_filing_store import append_filing
+from f13_metrics import Metrics
+from f16_shards import shard_of, shard_dir, shard_path, write_manifest, catalog_counts
 
 
 # =================================================================================================
 # SETTINGS
 # =================================================================================================
+# after an incremental index refresh, 'NSAR_directory_delta.csv' holds only the new filings;
+# either file works, filings already in the catalog keep their state
 FILING_LIST = 'D:/path/subpath/NSAR_directory.csv'
 OUTPUT_DIR = 'D:/path/subpath'
+# catalog with the download state of every filing; the parser reads it as well
+CATALOG = 'D:/path/subpath/catalog.sqlite'
+# 'files' saves every filing as OUTPUT_DIR/<year>/<file name>; 'pack' appends the filings
+# to one compressed OUTPUT_DIR/<year>.pack per year (see f5_filing_store.py)
+STORAGE = 'files'
+
+# EDGAR archive; point to a local server to try the download without EDGAR
+SEC_URL = 'https://www.sec.gov/Archives/'
+# EDGAR asks for a User-Agent that identifies you, e.g., 'Name Surname name@domain.com'
+USER_AGENT = 'Name Surname name@domain.com'
+
+# EDGAR in general does not allow more than 10 requests per second
+RATE = 10
+# number of requests in flight at the same time; hides the download time of each request
+MAX_IN_FLIGHT = 20
+# retries on rate limiting, server, and connection errors (with exponential backoff)
+RETRIES = 5
+# filings are requested again in later runs until they were tried this many times
+MAX_ATTEMPTS = 20
+# with True, N-CEN filings are only downloaded up to the end of their first document, i.e., the
+# header and the primary XML form, which hold everything the parser reads; the attachments are
+# not transferred or stored (saved files then only contain these parts)
+NCEN_PRIMARY_ONLY = False
+
+# sharded download on several workers, e.g., machines: every worker runs this code with the same
+# N_SHARDS and its own SHARD (0 to N_SHARDS-1), which can also be given on the command line,
+# e.g., 'python 2_1_download_nsar_filings.py 3'; a worker only downloads the filings of its shard,
+# into OUTPUT_DIR/shard-<shard>-of-<n> with its own catalog (see f16_shards.py and merge_shards.py)
+N_SHARDS = 1
+SHARD = 0
+# file on storage shared by all workers that holds their common request rate (RATE for all of
+# them together); with None, every worker keeps an equal share of RATE
+RATE_FILE = None
+
+# metrics of every run are appended as JSON lines (stages, errors, summary; see f13_metrics.py)
+METRICS = 'D:/path/subpath/metrics.jsonl'
+# with True, every stage is profiled with cProfile (<METRICS>.<run>.<stage>.prof)
+PROFILE = False
 
 
 # =================================================================================================
 # RUN
 # =================================================================================================
+shard = int(sys.argv[1]) if len(sys.argv) > 1 else SHARD
+# a shard has its own folder, catalog, and metrics
+output_dir, catalog_path, metrics_path = OUTPUT_DIR, CATALOG, METRICS
+if N_SHARDS > 1:
+    output_dir = shard_dir(OUTPUT_DIR, shard, N_SHARDS)
+    catalog_path = shard_path(CATALOG, shard, N_SHARDS)
+    metrics_path = shard_path(METRICS, shard, N_SHARDS)
+    os.makedirs(output_dir, exist_ok=True)
+
+metrics = Metrics(metrics_path, 'download', profile=PROFILE)
+
+# the catalog keeps the state of every filing; a new catalog adopts files downloaded before
+new_catalog = not os.path.exists(catalog_path)
+catalog = open_catalog(catalog_path)
+
 # load information on all prefiltered filings
-filing_addresses = pd.read_csv(FILING_LIST)
+filing_addresses = pd.read_csv(FILING_LIST, dtype=str)
 # drop duplicate links
 filing_addresses = filing_addresses.drop_duplicates(subset='fname')
-# separate the filings by year
-filing_addresses['fdate'] = pd.to_datetime(filing_addresses['fdate'], format="%Y-%m-%d")
-filing_addresses['year'] = filing_addresses['fdate'].dt.year
-filing_addresses = [[filing_addresses[filing_addresses['year'] == y], y] for y in filing_addresses['year'].unique()]
-
-# keep track of progress
-COUNT = 0
-
-# loop through years
-for cur_filing_addresses, year in filing_addresses:
-
-    # make yearly folder if not existing yet
-    if not os.path.exists(os.path.join(OUTPUT_DIR, str(year))):
-        os.makedirs(os.path.join(OUTPUT_DIR, str(year)))
-
-    # omit the files that are already present in OUTPUT_DIR
-    finished_files = os.listdir(os.path.join(OUTPUT_DIR, str(year)))
-    cur_filing_addresses = cur_filing_addresses[[e.split("/")[-1] not in finished_files
-                                                 for e in cur_filing_addresses['fname']]]
-
-    # download all filings for the current year
-    for fname in cur_filing_addresses["fname"]:
-
-        # try-except block to catch errors and keep the code running
-        try:
-            # generate URL
-            url = 'https://www.sec.gov/Archives/'+fname
-            # read URL
-            r = requests.get(url)
-            # write as output, i.e., save website
-            with open(os.path.join(OUTPUT_DIR, str(year), fname.split("/")[-1]), 'w', 
-                      encoding="utf-8") as outfile:
-                outfile.write(r.text)
-
-        # this is the error handler, something went wrong
-        except Exception as inst:
-            # print failed URL
-            print('https://www.sec.gov/Archives/'+fname)
-            # print error message and continue with next row
-            print(inst)
-            time.sleep(0.1)
-
-        COUNT += 1
-        if COUNT%2000 == 0:
-            print(f"{COUNT} files downloaded.")
-
-        # wait one-tenth of a second before sending another request to EDGAR
-        # EDGAR in general does not allow more than 10 requests per second
-        # due to the download time, a lower sleep time may be enough too
-        # though 0.1 seconds is safest
-        time.sleep(0.1)
+# keep the filings of this shard
+if N_SHARDS > 1:
+    filing_addresses = filing_addresses[[shard_of(fname, N_SHARDS) == shard
+                                         for fname in filing_addresses['fname']]]
+# add new filings to the catalog; known filings keep their state
+print(f"{add_index_rows(catalog, filing_addresses, output_dir)} new filings in the catalog.")
+if new_catalog and STORAGE == 'files':
+    print(f"{adopt_existing_files(catalog)} previously downloaded files adopted.")
+
+# omit the filings that are already done or failed too often
+downloads = pending_filings(catalog, MAX_ATTEMPTS)
+
+# make yearly folders if not existing yet
+if STORAGE == 'files':
+    for folder in {os.path.dirname(path) for fname, path, form_type in downloads}:
+        os.makedirs(folder, exist_ok=True)
+
+# N-CEN filings whose attachments are skipped
+first_document = ({SEC_URL+fname for fname, path, form_type in downloads if form_type.startswith('N-CEN')}
+                  if NCEN_PRIMARY_ONLY else set())
+
+def record(url, http_status, attempts, content):
+    """
+    Records the result of a download in the catalog.
+    """
+    record_download(catalog, url[len(SEC_URL):], http_status, attempts, content)
+
+def save_to_pack(path, content):
+    """
+    Appends a downloaded filing to the pack of its year instead of saving it as a file.
+    """
+    append_filing(output_dir, os.path.basename(os.path.dirname(path)), os.path.basename(path), content)
+
+# the shards share the rate through RATE_FILE or split it
+bucket = SharedTokenBucket(RATE_FILE, RATE) if N_SHARDS > 1 and RATE_FILE else None
+rate = RATE if N_SHARDS == 1 else RATE / N_SHARDS
+
+# download everything; the rate limit is shared by all concurrent requests
+metrics.begin_stage('download')
+count = asyncio.run(download_filings([(SEC_URL+fname, path) for fname, path, form_type in downloads],
+                                     USER_AGENT, rate=rate, max_in_flight=MAX_IN_FLIGHT, retries=RETRIES,
+                                     record=record, save=save_to_pack if STORAGE == 'pack' else save_file,
+                                     metrics=metrics, first_document=first_document, bucket=bucket))
+catalog.commit()
+# the manifest tells the coordinator that this shard finished a run
+if N_SHARDS > 1:
+    write_manifest(output_dir, 'download', shard, N_SHARDS, filings=catalog_counts(catalog))
+catalog.close()
+metrics.close()
+print(f"{count['saved']} files downloaded, {count['failed']} failed.")
@@ -10,7 +10,8 @@ Last Modified: Wednesday, 22nd September 2021 9:56:03 pm
 -----
 Description: This code downloads the adviser-specific location information for
              the newer filing format N-CEN. Then it combines all previously downloaded
-             adviser information files and assigns a timestamp to them.
+             adviser information files and assigns a timestamp to them. Every month is
+             converted once into a Parquet file, later runs only read those.
 '''
 # =================================================================================================
 # PACKAGES
@@ -18,12 +19,13 @@ Description: This code downloads the adviser-specific location information for
 import os
 import csv
 import re                                       # Regular Expressions
-from io import BytesIO                          # In-Memory Bytes Stream
-from zipfile import ZipFile                     # Unwrapping Zip Files
 import requests                                 # HTTP requests
 from bs4 import BeautifulSoup                   # HTML parsing
 from bs4.dammit import EncodingDetector         # Encoding identifier
 import pandas as pd
+from f6_columnar import write_panel_parquet     # selfmade functions
+from f9_adviser_panel import download_file, workbook_names, extract_workbooks, read_workbook_columns
+from f19_adviser_history import load_history, save_history, last_month, add_month
 
 
 # =================================================================================================
@@ -40,6 +42,17 @@ YEARS = [2018, 2019, 2020]
 # do NOT change unless the link is broken
 SEC_ADVISER_URL = "https://www.sec.gov/help/foiadocsinvafoiahtm.html"
 
+# every month is converted once into the typed dataset OUTPUT_DIR/adviser_panel/year_month=<yy-mm>/...
+# (see f6_columnar.py); 'csv' also combines all months into adviser_panel.csv, 'parquet' only
+# keeps the dataset
+OUTPUT_FORMAT = 'csv'
+
+# with True, the months are also kept as a history of validity intervals in adviser_history.csv:
+# one row per adviser and stretch of months with the same SEC number, name, and address (see
+# f19_adviser_history.py); only months after the last month of the history are added to it, so
+# delete the file to rebuild it, e.g., after a new version of an earlier month
+HISTORY = False
+
 
 # =================================================================================================
 # OBTAIN LINKS FOR THE MONTHLY ADVISER FILES
@@ -66,21 +79,6 @@ URLs = [e for e in URLs if bool(re.search(rf"ia\d+({YEARS_ABR})\.zip", e))]
 # =================================================================================================
 # DOWNLOAD AND EXTRACT ZIP FILES
 # =================================================================================================
-for link in URLs:
-    # download file
-    resp = requests.get(link)
-    # identify as zip
-    f = ZipFile(BytesIO(resp.content))
-    # unwrap
-    f.extractall(OUTPUT_DIR)
-
-
-# =================================================================================================
-# ENSURE CONSISTENT FILE NAMING
-# =================================================================================================
-# get file names
-file_names = [f for f in os.listdir(OUTPUT_DIR) if bool(re.search('.xlsx$', f))]
-
 def update_name(file_name):
     """
     This function ensures that file names follow the convention 'ia%m//d//d%y.xlsx' (e.g., ia070119.xlsx)
@@ -95,23 +93,54 @@ def update_name(file_name):
     new_file_name = f"ia{month.zfill(2)}{version.zfill(2)}{year[-2:]}.xlsx"
     return new_file_name
 
+def unwrapped(file_name):
+    """
+    Returns whether a workbook exists under its consistent name or its month is converted.
+    Args: file_name - name of the workbook in the zip file
+    """
+    name = update_name(file_name)[:-5]
+    month, year = re.findall(r'ia(\d{2})(?:\d{2})(\d{2})', name)[0]
+    return os.path.exists(os.path.join(OUTPUT_DIR, f"{name}.xlsx")) or os.path.exists(os.path.join(
+        OUTPUT_DIR, 'adviser_panel', f"year_month={year}-{month}", f"{name}.parquet"))
+
+# the zip files are kept in their own folder; a zip file on disk is not downloaded again
+zip_dir = os.path.join(OUTPUT_DIR, 'zip')
+os.makedirs(zip_dir, exist_ok=True)
+for link in URLs:
+    zip_path = os.path.join(zip_dir, link.split('/')[-1])
+    if not os.path.exists(zip_path):
+        # stream file to disk
+        download_file(link, zip_path)
+    # unwrap the workbooks unless all of them exist under their consistent names or their months
+    # are converted, so a run interrupted after the download extracts them on the next run
+    if not all(unwrapped(name) for name in workbook_names(zip_path)):
+        extract_workbooks(zip_path, OUTPUT_DIR)
+
+
+# =================================================================================================
+# ENSURE CONSISTENT FILE NAMING
+# =================================================================================================
+# get file names
+file_names = [f for f in os.listdir(OUTPUT_DIR) if bool(re.search('.xlsx$', f))]
+
 # change naming to be consistent with ia...xlsx
 new_file_names = [update_name(f) for f in file_names]
 # change only the file names that need to be changed
 file_changes = [(old_f, new_f) for old_f, new_f in zip(file_names, new_file_names) if old_f != new_f]
-# now change names
+# now change names; a workbook extracted again replaces the renamed one
 for old_f, new_f in file_changes:
-    os.rename(os.path.join(OUTPUT_DIR,old_f), os.path.join(OUTPUT_DIR,new_f))
+    os.replace(os.path.join(OUTPUT_DIR,old_f), os.path.join(OUTPUT_DIR,new_f))
 
 
 # ======================================================================================================================
 # COMBINE ALL FILES
 # ======================================================================================================================
 # prepare CSV file that will be filled, csv writer, and csv header
-csv_adv_panel = open(os.path.join(OUTPUT_DIR, 'adviser_panel.csv'), 'w', newline='')
-writer_adv_panel = csv.writer(csv_adv_panel)
-writer_adv_panel.writerow(['crd', 'sec', 'name', 'city', 'state', 'zip', 'year_month'])
-csv_adv_panel.close()
+if OUTPUT_FORMAT == 'csv':
+    csv_adv_panel = open(os.path.join(OUTPUT_DIR, 'adviser_panel.csv'), 'w', newline='')
+    writer_adv_panel = csv.writer(csv_adv_panel)
+    writer_adv_panel.writerow(['crd', 'sec', 'name', 'city', 'state', 'zip', 'year_month'])
+    csv_adv_panel.close()
 
 # loop through all files
 files = [e for e in os.listdir(OUTPUT_DIR) if re.search(r'\.xlsx$', e)]
@@ -119,14 +148,46 @@ for f in files:
 
     # extract month and year from current file name
     month, year = re.findall(r'ia(\d{2})(?:\d{2})(\d{2})\.xlsx', f)[0]
-    # load current file
-    cur_data = pd.read_excel(os.path.join(OUTPUT_DIR, f))
-    # keep only relevant columns
-    cur_data = cur_data[['Organization CRD#', 'SEC#', 'Primary Business Name',
-                         'Main Office City', 'Main Office State', 'Main Office Postal Code']]
+    # typed dataset: every month is a partition, so the timestamp is the partition key
+    month_path = os.path.join(OUTPUT_DIR, 'adviser_panel', f"year_month={year}-{month}",
+                              f"{f[:-5]}.parquet")
+    if not os.path.exists(month_path):
+        # load only the relevant columns of the current file
+        cur_data = read_workbook_columns(os.path.join(OUTPUT_DIR, f))
+        write_panel_parquet(cur_data, os.path.join(OUTPUT_DIR, 'adviser_panel'), f"{year}-{month}",
+                            f[:-5])
+    if OUTPUT_FORMAT == 'parquet':
+        print(f"Finished file {f}.")
+        continue
+    # load the converted month
+    cur_data = pd.read_parquet(month_path)
     # add timestamp
     cur_data['year_month'] = f"{year}-{month}"
     # append to final data
     cur_data.to_csv(os.path.join(OUTPUT_DIR, 'adviser_panel.csv'), mode='a', header=False, index=False)
     # track progress
     print(f"Finished file {f}.")
+
+
+# =================================================================================================
+# COMPRESS MONTHS INTO VALIDITY INTERVALS
+# =================================================================================================
+if HISTORY:
+    history_path = os.path.join(OUTPUT_DIR, 'adviser_history.csv')
+    history = load_history(history_path)
+    # the converted months in order, with their versions in order
+    months = {}
+    for f in sorted(files):
+        month, year = re.findall(r'ia(\d{2})(?:\d{2})(\d{2})\.xlsx', f)[0]
+        months.setdefault(f"{year}-{month}", []).append(f[:-5])
+    last = last_month(history)
+    for year_month in sorted(months):
+        if last is not None and year_month <= last:
+            continue
+        # a later version of the month replaces the advisers of an earlier one
+        month_dir = os.path.join(OUTPUT_DIR, 'adviser_panel', f"year_month={year_month}")
+        cur_data = pd.concat([pd.read_parquet(os.path.join(month_dir, f"{part}.parquet"))
+                              for part in months[year_month]], ignore_index=True)
+        history = add_month(history, cur_data, year_month)
+        print(f"Added month {year_month} to the history.")
+    save_history(history, history_path)
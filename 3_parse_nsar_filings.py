@@ -14,12 +14,20 @@ Description: This code parses and preprocesses all downloaded SEC filings.
 # PACKAGES
 # =================================================================================================
 import os               # Browse directories
-import csv              # CSV documents
-import pandas as pd
+import sys
+from multiprocessing import Pool    # Worker processes
 
 # specify folder containing the code, that's necessary for some python interpreters
 # os.chdir("C:/Users/ga2203/Dropbox/Climate Finance Project/Code/Extract Location")
-from f1_parse_filing import parse_file   # selfmade functions
+from f2_parse_years import (parse_year, parse_year_parallel, parse_year_incremental,   # selfmade functions
+                            parse_registrants, combine_tables, DEDUP_KEYS)
+from f4_catalog import open_catalog, downloaded_filings
+from f7_parse_cache import open_cache
+from f5_filing_store import pack_years
+from f6_columnar import write_year_parquet
+from f13_metrics import Metrics
+from f16_shards import shard_dir, shard_path, write_manifest
+from f17_supervisor import parse_year_supervised, quarantined_filings, QUARANTINE
 
 
 # =================================================================================================
@@ -29,89 +37,158 @@ from f1_parse_filing import parse_file   # selfmade functions
 FILE_DIR = 'D:/path/subpath'
 # specify output path
 OUTPUT_DIR = 'D:/path/subpath'
-
-
-# =================================================================================================
-# LOOP THROUGH YEARS
-# =================================================================================================
-# years downloaded
-years = [y for y in os.listdir(FILE_DIR) if y.isdigit()]
-
-for year in years:
-# =================================================================================================
-# PREPARE OUTPUT FILES
-# =================================================================================================
-    # create empty CSV file, this will be filled
-    csv_registrants = open(os.path.join(OUTPUT_DIR, f'nsar_registrants_{year}.csv'), 'w', newline='')
-    csv_funds       = open(os.path.join(OUTPUT_DIR, f'nsar_funds_{year}.csv'),       'w', newline='')
-    csv_advisers    = open(os.path.join(OUTPUT_DIR, f'nsar_advisers_{year}.csv'),    'w', newline='')
-
-    # setup writer
-    writer_registrants = csv.writer(csv_registrants)
-    writer_funds = csv.writer(csv_funds)
-    writer_advisers = csv.writer(csv_advisers)
-
-    # make headers; the tables can be merged on cik-fdate-fund_id
-    # fi (fund identifier), rh (registrant header), fh (fund header), ah (adviser header)
-    # adviser info is in long format, i.e., 'adviser_info' specifies the information contained in 'value'
-    rh = ['file_name', 'cik', 'fdate', 'rdate', 'ftype', 'accession', 'reg_name', 
-          'reg_state', 'reg_zip', 'reg_city']
-    fh = ['file_name', 'cik', 'fdate', 'fund_id', 'fund']
-    ah = ['file_name', 'cik', 'fdate', 'fund_id', 'adviser_id', 'adviser_info', 'value']
-
-    # write headers in csv files
-    writer_registrants.writerow(rh)
-    writer_funds.writerow(fh)
-    writer_advisers.writerow(ah)
-
-
+# catalog written by the download code; only completely downloaded filings are parsed
+# if it does not exist, all files in the yearly folders are parsed
+CATALOG = 'D:/path/subpath/catalog.sqlite'
+# 'files' if the filings are saved as FILE_DIR/<year>/<file name>, 'pack' if they are saved
+# in one compressed FILE_DIR/<year>.pack per year (see f5_filing_store.py)
+STORAGE = 'files'
+
+# 'csv' combines the yearly csv files into nsar_registrants.csv, nsar_funds.csv, nsar_advisers.csv;
+# 'parquet' writes typed datasets OUTPUT_DIR/nsar_registrants/year=<year>/... (see f6_columnar.py)
+OUTPUT_FORMAT = 'csv'
+# with True, the combined csv files keep only the first row of every filing (registrants), fund
+# (funds), and adviser information (advisers), see DEDUP_KEYS in f2_parse_years.py
+DEDUPLICATE = False
+
+# with True, only the registrant table is extracted from the headers of the filings; the bodies
+# are never read, which takes a fraction of the time of a full parse
+REGISTRANTS_ONLY = False
+
+# with True, only new or changed filings are parsed and the rest is taken from the parse cache;
+# years whose filings did not change are not written again
+INCREMENTAL = False
+PARSE_CACHE = 'D:/path/subpath/parse_cache.sqlite'
+
+# number of worker processes; with 1, all filings are parsed serially in this process
+# note: the parallel tables are sorted by file name instead of the directory order
+N_WORKERS = 1
+# number of filings handed to a worker at once
+CHUNK_SIZE = 200
+
+# with True, every filing is parsed in one of N_WORKERS supervised worker processes with a time
+# budget (see f17_supervisor.py); filings that fail, run out of TIME_BUDGET seconds (their worker
+# is stopped), are parsed only in part (e.g., broken N-CEN XML), or take longer than SLOW_SECONDS
+# are listed in OUTPUT_DIR/quarantine.jsonl with reason, size, and time; the tables keep the
+# order of the unsupervised parse
+# not with REGISTRANTS_ONLY; INCREMENTAL is ignored
+SUPERVISED = False
+TIME_BUDGET = 60
+SLOW_SECONDS = 10
+# supervised workers are replaced after this many filings, so their memory cannot grow over a run
+FILES_PER_WORKER = 1000
+# with True, only the filings of the quarantine list are parsed again (supervised), e.g., with a
+# larger TIME_BUDGET or a fixed parser; the tables and the new quarantine list are written to
+# OUTPUT_DIR/replay
+REPLAY_QUARANTINE = False
+
+# sharded parse on several workers (the shards of the download code): every worker runs this code
+# with the same N_SHARDS and its own SHARD, which can also be given on the command line; a worker
+# parses FILE_DIR/shard-<shard>-of-<n> into OUTPUT_DIR/shard-<shard>-of-<n> and leaves the
+# combined tables to merge_shards.py
+N_SHARDS = 1
+SHARD = 0
+
+# metrics of every run are appended as JSON lines (stages, errors, summary; see f13_metrics.py)
+METRICS = 'D:/path/subpath/metrics.jsonl'
+# with True, every stage is profiled with cProfile (<METRICS>.<run>.<stage>.prof)
+PROFILE = False
+
+
+# the guard is necessary for the worker processes on platforms that spawn them (e.g., Windows)
+if __name__ == '__main__':
 # =================================================================================================
-# PARSE FILINGS
+# LOOP THROUGH YEARS AND PARSE FILINGS
 # =================================================================================================
-    # loop over all SEC filings
-    for file_name in os.listdir(os.path.join(FILE_DIR, year)):
-
-        # full path to the current file
-        full_path = os.path.join(FILE_DIR, year, file_name)
-
-        # try-except block to catch errors and keep the code running
-        try:
-            # open and read the complete filing into a very long string
-            filing = open(full_path, 'r')
-            data = filing.read()
-            filing.close()
-
-            # parse the file, extract everything we need
-            registrant_info, fund_info, adviser_info = parse_file(file_name, data)
-
-            # write lines
-            writer_registrants.writerow(registrant_info)
-            writer_funds.writerows(fund_info)
-            writer_advisers.writerows(adviser_info)
-
-        except Exception as inst:
-            print(f'In parse_file: {full_path}, error: {str(inst)}')
-
-    # we are done, close files
-    csv_registrants.close()
-    csv_funds.close()
-    csv_advisers.close()
-
-    print(f"Finished year {year}.")
+    shard = int(sys.argv[1]) if len(sys.argv) > 1 else SHARD
+    # a shard has its own folders, catalog, cache, and metrics
+    file_dir, output_dir, catalog_path, cache_path, metrics_path = (FILE_DIR, OUTPUT_DIR, CATALOG,
+                                                                    PARSE_CACHE, METRICS)
+    if N_SHARDS > 1:
+        file_dir = shard_dir(FILE_DIR, shard, N_SHARDS)
+        output_dir = shard_dir(OUTPUT_DIR, shard, N_SHARDS)
+        catalog_path = shard_path(CATALOG, shard, N_SHARDS)
+        cache_path = shard_path(PARSE_CACHE, shard, N_SHARDS)
+        metrics_path = shard_path(METRICS, shard, N_SHARDS)
+        os.makedirs(output_dir, exist_ok=True)
+        # the manifest counts the filings of the catalog
+        if not os.path.exists(catalog_path):
+            raise FileNotFoundError(f'The catalog of the shard is missing: {catalog_path}')
+    quarantine_path = os.path.join(output_dir, QUARANTINE)
+
+    metrics = Metrics(metrics_path, 'parse', profile=PROFILE)
+
+    # years downloaded and their filings (with their hashes if they come from the catalog)
+    if os.path.exists(catalog_path):
+        catalog = open_catalog(catalog_path)
+        filings = downloaded_filings(catalog)
+        catalog.close()
+    elif STORAGE == 'pack':
+        filings = {y: None for y in pack_years(file_dir)}
+    else:
+        filings = {y: None for y in os.listdir(file_dir) if y.isdigit()}
+    # only the quarantined filings, into a separate folder
+    if REPLAY_QUARANTINE:
+        filings = quarantined_filings(quarantine_path)
+        output_dir = os.path.join(output_dir, 'replay')
+        quarantine_path = os.path.join(output_dir, QUARANTINE)
+        os.makedirs(output_dir, exist_ok=True)
+    years = list(filings)
+    supervised = (SUPERVISED or REPLAY_QUARANTINE) and not REGISTRANTS_ONLY
+
+    # the pool is shared by all years; supervised workers are started per year
+    pool = Pool(N_WORKERS) if N_WORKERS > 1 and not REGISTRANTS_ONLY and not supervised else None
+    cache = open_cache(cache_path) if INCREMENTAL else None
+
+    for year in years:
+        metrics.begin_stage(f'year {year}')
+        # every year gets its registrant, fund, and adviser csv file
+        if REGISTRANTS_ONLY:
+            parse_registrants(file_dir, output_dir, year, filings[year], STORAGE, metrics)
+        elif supervised:
+            parse_year_supervised(file_dir, output_dir, year, filings[year], STORAGE, metrics, N_WORKERS,
+                                  TIME_BUDGET, SLOW_SECONDS, FILES_PER_WORKER, quarantine_path)
+        elif INCREMENTAL:
+            if not parse_year_incremental(cache, file_dir, output_dir, year, filings[year], filings[year],
+                                          STORAGE, pool, CHUNK_SIZE, metrics):
+                metrics.end_stage()
+                continue
+        elif pool is None:
+            parse_year(file_dir, output_dir, year, filings[year], STORAGE, metrics)
+        else:
+            parse_year_parallel(pool, file_dir, output_dir, year, CHUNK_SIZE, filings[year], STORAGE, metrics)
+
+        # the yearly csv files become the partitions of the typed datasets (of the shards by merge_shards.py)
+        if OUTPUT_FORMAT == 'parquet' and N_SHARDS == 1:
+            write_year_parquet(output_dir, year, ['registrants'] if REGISTRANTS_ONLY else None)
+
+        metrics.end_stage()
+        print(f"Finished year {year}.")
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if cache is not None:
+        cache.close()
 
 
 # =================================================================================================
 # COMBINE YEARLY FILES
 # =================================================================================================
-# append with list comprehension; that's much more efficient than appending right away
-full_registrants = pd.concat([pd.read_csv(os.path.join(OUTPUT_DIR, f'nsar_registrants_{year}.csv'))
-                                    for year in years])
-full_funds       = pd.concat([pd.read_csv(os.path.join(OUTPUT_DIR, f'nsar_funds_{year}.csv'))
-                                    for year in years])
-full_advisers    = pd.concat([pd.read_csv(os.path.join(OUTPUT_DIR, f'nsar_advisers_{year}.csv'))
-                                    for year in years])
-
-# save full output
-full_registrants.to_csv(os.path.join(OUTPUT_DIR, 'nsar_registrants.csv'), index=False)
-full_funds.to_csv(os.path.join(OUTPUT_DIR, 'nsar_funds.csv'), index=False)
-full_advisers.to_csv(os.path.join(OUTPUT_DIR, 'nsar_advisers.csv'), index=False)
+    # with REGISTRANTS_ONLY, there are only registrant files
+    tables = ['registrants'] if REGISTRANTS_ONLY else ['registrants', 'funds', 'advisers']
+    if N_SHARDS > 1:
+        # the coordinator combines the shards once all of them are parsed
+        write_manifest(output_dir, 'parse', shard, N_SHARDS, tables=tables,
+                       filings={year: len(filings[year]) for year in years})
+    # the parquet datasets are already combined (partitioned by year)
+    elif OUTPUT_FORMAT == 'csv':
+        metrics.begin_stage('combine')
+        # the yearly files are streamed into the full output, so memory does not grow with the corpus
+        for table in tables:
+            combine_tables([os.path.join(output_dir, f'nsar_{table}_{year}.csv') for year in years],
+                           os.path.join(output_dir, f'nsar_{table}.csv'),
+                           DEDUP_KEYS[table] if DEDUPLICATE else None)
+
+    # stages still open are ended by close
+    metrics.close()
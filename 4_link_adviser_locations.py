@@ -0,0 +1,47 @@
+'''
+File: 4_link_adviser_locations.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 4:12:50 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 4:12:50 pm
+-----
+Description: This code links the advisers of the parsed filings ('nsar_advisers.csv') to their
+             locations in the adviser panel ('adviser_panel.csv') and saves one table of
+             fund, adviser, and location.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import pandas as pd
+from f10_link_advisers import load_panel, link_advisers    # selfmade functions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# folder of the combined tables of the parse code
+PARSE_DIR = 'D:/path/subpath'
+# adviser panel of the adviser location code; adviser_panel.csv or the adviser_panel dataset folder
+PANEL = 'D:/path/subpath/adviser_panel.csv'
+# output path
+OUTPUT_DIR = 'D:/path/subpath'
+
+
+# =================================================================================================
+# LINK ADVISERS AND LOCATIONS
+# =================================================================================================
+# all values are read as strings; ids like '01' or '801-012345' stay unchanged
+advisers = pd.read_csv(os.path.join(PARSE_DIR, 'nsar_advisers.csv'), dtype=str)
+funds = pd.read_csv(os.path.join(PARSE_DIR, 'nsar_funds.csv'), dtype=str)
+panel = load_panel(PANEL)
+
+# match on CRD and SEC number, then on names; always with the panel month as of the filing
+links = link_advisers(advisers, funds, panel)
+links.to_csv(os.path.join(OUTPUT_DIR, 'nsar_adviser_locations.csv'), index=False)
+
+# track matches
+print(links['match'].value_counts(dropna=False))
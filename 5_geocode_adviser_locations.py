@@ -0,0 +1,52 @@
+'''
+File: 5_geocode_adviser_locations.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 11:52:08 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 11:52:08 pm
+-----
+Description: This code adds coordinates to the registrants ('nsar_registrants.csv') and to the
+             linked advisers ('nsar_adviser_locations.csv', created by the previous code:
+             '4_link_adviser_locations.py') with a local ZIP code gazetteer, and computes the
+             distance between every registrant and its advisers.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import pandas as pd
+from f18_geocode import load_gazetteer, locate_registrants, locate_links   # selfmade functions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# combined registrant table of the parse code
+REGISTRANTS = 'D:/path/subpath/nsar_registrants.csv'
+# linked table of the link code
+LINKS = 'D:/path/subpath/nsar_adviser_locations.csv'
+# GeoNames postal code file for the United States (US.txt in download.geonames.org/export/zip/US.zip);
+# other gazetteers work with their columns in GAZETTEER_COLUMNS of f18_geocode.py
+GAZETTEER = 'D:/path/subpath/US.txt'
+# output path
+OUTPUT_DIR = 'D:/path/subpath'
+
+
+# =================================================================================================
+# GEOCODE REGISTRANTS AND ADVISERS
+# =================================================================================================
+zips, cities = load_gazetteer(GAZETTEER)
+
+# all values are read as strings; ZIP codes like '02110' stay unchanged
+registrants = locate_registrants(pd.read_csv(REGISTRANTS, dtype=str), zips, cities)
+registrants.to_csv(os.path.join(OUTPUT_DIR, 'nsar_registrant_coordinates.csv'), index=False)
+
+links = locate_links(pd.read_csv(LINKS, dtype=str), registrants, zips, cities)
+links.to_csv(os.path.join(OUTPUT_DIR, 'nsar_adviser_distances.csv'), index=False)
+
+# track how the locations were found
+print(registrants['reg_geo'].value_counts(dropna=False))
+print(links['adv_geo'].value_counts(dropna=False))
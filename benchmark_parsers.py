@@ -0,0 +1,97 @@
+'''
+File: benchmark_parsers.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 5:20:44 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 5:20:44 pm
+-----
+Description: This code benchmarks the parsers and the index extraction on synthetic files and
+             compares the results with a stored baseline. It runs offline; the baseline is
+             specific to the machine, so store a new one (UPDATE_BASELINE) on a new machine.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import sys
+from f1_parse_filing import parse_file, parse_nsar_file, parse_ncen_file   # selfmade functions
+from f8_edgar_index import iter_index_rows
+from f11_synthetic_filings import generate
+from f12_benchmark import measure, load_baseline, save_baseline, regressions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# functions to be benchmarked; every one gets a single file
+FUNCTIONS = {
+    'parse_file': lambda data: parse_file('0000000000-00-000000.txt', data),
+    'parse_nsar_file': lambda data: parse_nsar_file('0000000000-00-000000.txt', data),
+    'parse_ncen_file': lambda data: parse_ncen_file('0000000000-00-000000.txt', data),
+    'iter_index_rows': lambda data: list(iter_index_rows(data)),
+}
+
+# benchmark cases: name -> (function, kind of file, number of files, options of the generator)
+CASES = {
+    'nsar_small':      ('parse_nsar_file', 'nsar', 500,
+                        {'n_funds': 1, 'n_advisers': 1, 'n_exhibits': 0, 'size': 20000}),
+    'nsar_typical':    ('parse_nsar_file', 'nsar', 300,
+                        {'n_funds': 10, 'n_advisers': 2, 'n_exhibits': 1, 'size': 60000}),
+    'nsar_large':      ('parse_nsar_file', 'nsar', 40,
+                        {'n_funds': 60, 'n_advisers': 4, 'n_exhibits': 8, 'size': 800000}),
+    'ncen_small':      ('parse_ncen_file', 'ncen', 500,
+                        {'n_funds': 1, 'n_advisers': 1, 'n_subadvisers': 0, 'size': 20000}),
+    'ncen_typical':    ('parse_ncen_file', 'ncen', 200,
+                        {'n_funds': 10, 'n_advisers': 1, 'n_subadvisers': 2, 'n_exhibits': 1, 'size': 150000}),
+    'ncen_large':      ('parse_ncen_file', 'ncen', 20,
+                        {'n_funds': 100, 'n_advisers': 2, 'n_subadvisers': 3, 'n_exhibits': 4, 'size': 3000000}),
+    'parse_file_nsar': ('parse_file', 'nsar', 300,
+                        {'n_funds': 10, 'n_advisers': 2, 'n_exhibits': 1, 'size': 60000}),
+    'parse_file_ncen': ('parse_file', 'ncen', 200,
+                        {'n_funds': 10, 'n_advisers': 1, 'n_subadvisers': 2, 'size': 150000}),
+    'form_index':      ('iter_index_rows', 'index', 2, {'n_rows': 200000}),
+}
+
+# number of timed runs per case (the fastest counts)
+REPEAT = 5
+# baseline results; created on the first run
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# store the results of this run as the new baseline
+UPDATE_BASELINE = False
+# a case regresses if it gets slower or uses more memory by more than this share
+TOLERANCE = 0.25
+
+
+# =================================================================================================
+# RUN BENCHMARKS
+# =================================================================================================
+results = {}
+print(f"{'case':<18}{'files':>7}{'MB':>9}{'files/sec':>12}{'MB/sec':>10}{'peak MB':>10}")
+for case, (function, kind, n, options) in CASES.items():
+    # the same seed gives the same files in every run
+    # filings and index files are read as bytes
+    inputs = [x.encode('utf-8') for x in generate(kind, n, seed=0, **options)]
+    results[case] = measure(FUNCTIONS[function], inputs, REPEAT)
+    r = results[case]
+    print(f"{case:<18}{r['files']:>7}{r['mb']:>9.1f}{r['files_per_sec']:>12.1f}{r['mb_per_sec']:>10.2f}"
+          f"{r['peak_mb']:>10.2f}")
+
+
+# =================================================================================================
+# COMPARE WITH BASELINE
+# =================================================================================================
+baseline = load_baseline(BASELINE)
+if UPDATE_BASELINE or not baseline:
+    save_baseline(results, BASELINE)
+    print(f"Baseline saved to {BASELINE}.")
+else:
+    messages = regressions(results, baseline, TOLERANCE)
+    for message in messages:
+        print(f"REGRESSION {message}")
+    if not messages:
+        print("No regressions.")
+    # a non-zero exit code lets scheduled runs fail on regressions
+    sys.exit(1 if messages else 0)
@@ -0,0 +1,230 @@
+'''
+File: f10_link_advisers.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 4:12:50 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 4:12:50 pm
+-----
+Description: Functions for linking the advisers of the parsed filings to their locations in the
+             adviser panel. N-CEN advisers are matched on CRD number, then on SEC file number;
+             N-SAR advisers (name and city only) on their normalized name within the same state.
+             Every match takes the panel month at or before the filing month (as-of), or the
+             first later month if the panel starts after the filing.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import re                           # Regular Expressions
+import difflib                      # Approximate name matching
+import pandas as pd
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# adviser information used for matching (columns of the wide adviser table)
+ADVISER_FIELDS = ['adv_name', 'adv_subadvisor', 'adv_sec', 'adv_crd', 'adv_city', 'adv_state', 'adv_zip']
+
+# columns of the adviser panel
+PANEL_FIELDS = ['crd', 'sec', 'name', 'city', 'state', 'zip', 'year_month']
+
+# columns of the linked table
+LINK_HEADER = (['file_name', 'cik', 'fdate', 'fund_id', 'fund', 'adviser_id'] + ADVISER_FIELDS
+               + ['match'] + PANEL_FIELDS)
+
+# legal forms and filler words dropped from adviser names before comparing them
+NAME_STOPWORDS = {'THE', 'AND', 'OF', 'INC', 'INCORPORATED', 'CORP', 'CORPORATION', 'CO', 'COMPANY',
+                  'LLC', 'L', 'P', 'LP', 'LLP', 'LTD', 'LIMITED', 'PLC', 'SA', 'AG', 'NA', 'N'}
+
+# minimum similarity (difflib ratio) of two normalized names within a block
+NAME_CUTOFF = 0.9
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def normalize_name(name):
+    """
+    Returns the adviser name in upper case, without punctuation, legal forms, and filler words,
+    e.g., 'The Vanguard Group, Inc.' -> 'VANGUARD GROUP'.
+    Arguments: name - adviser name (may be missing).
+    """
+    if not isinstance(name, str):
+        return ''
+    words = re.sub(r'[^A-Z0-9 ]', ' ', name.upper().replace('&', ' AND ')).split()
+    return ' '.join(w for w in words if w not in NAME_STOPWORDS)
+
+def normalize_sec(sec):
+    """
+    Returns the SEC file number without leading zeros in its parts, e.g., '801-012345' -> '801-12345'.
+    Arguments: sec - SEC file number (may be missing).
+    """
+    if not isinstance(sec, str) or not re.fullmatch(r'\s*\d+-\d+\s*', sec):
+        return None
+    return '-'.join(str(int(part)) for part in sec.strip().split('-'))
+
+def normalize_crd(crd):
+    """
+    Returns the CRD number as string without leading zeros, or None if it is missing or not a
+    number, e.g., '000105958' -> '105958'.
+    Arguments: crd - CRD number as string or number.
+    """
+    try:
+        crd = int(float(crd))
+    except (TypeError, ValueError):
+        return None
+    return str(crd) if crd > 0 else None
+
+def wide_advisers(advisers):
+    """
+    Turns the long adviser table into one row per filing, fund, and adviser with a column for
+    every kind of adviser information (ADVISER_FIELDS).
+    Arguments: advisers - data frame with the columns of ADVISER_HEADER (read as strings).
+    """
+    keys = ['file_name', 'cik', 'fdate', 'fund_id', 'adviser_id']
+    wide = (advisers.drop_duplicates(keys + ['adviser_info'])
+                    .set_index(keys + ['adviser_info'])['value'].unstack('adviser_info'))
+    wide = wide.reindex(columns=ADVISER_FIELDS).reset_index()
+    wide.columns.name = None
+    return wide
+
+def filing_month(fdate):
+    """
+    Returns the months since year 0 of filing dates, e.g., '20190215' -> 2019*12+2.
+    Arguments: fdate - series of filing dates as YYYYMMDD strings.
+    """
+    fdate = pd.to_numeric(fdate, errors='coerce')
+    return (fdate // 10000) * 12 + (fdate // 100) % 100
+
+def panel_month(year_month):
+    """
+    Returns the months since year 0 of the panel timestamps, e.g., '19-02' -> 2019*12+2.
+    Arguments: year_month - series of 'YY-MM' strings.
+    """
+    parts = year_month.astype(str).str.split('-', expand=True)
+    return (2000 + parts[0].astype(int)) * 12 + parts[1].astype(int)
+
+def load_panel(panel_path):
+    """
+    Loads the adviser panel, either adviser_panel.csv or the adviser_panel Parquet dataset,
+    and adds the normalized keys and the month.
+    Arguments: panel_path - path of the csv file or the folder of the dataset.
+    """
+    if os.path.isdir(panel_path):
+        panel = pd.read_parquet(panel_path)
+    else:
+        panel = pd.read_csv(panel_path, dtype=str)
+    panel = panel[PANEL_FIELDS].astype(object).reset_index(drop=True)
+    panel['year_month'] = panel['year_month'].astype(str)
+    panel['month'] = panel_month(panel['year_month'])
+    panel['crd_key'] = panel['crd'].map(normalize_crd)
+    panel['sec_key'] = panel['sec'].map(normalize_sec)
+    panel['name_key'] = panel['name'].map(normalize_name)
+    return panel
+
+def asof_match(left, panel, key):
+    """
+    Matches every row of left to a panel row with the same key: the latest panel month at or
+    before the filing month, otherwise the first later month. Returns a series row -> panel row.
+    Arguments: left - data frame with the columns 'month' and key, panel - panel from load_panel,
+               key - name of the key column in both.
+    """
+    left = left[['month', key]].dropna().reset_index().rename(columns={'index': 'row'})
+    right = panel[['month', key]].dropna().reset_index().rename(columns={'index': 'panel_row'})
+    if left.empty or right.empty:
+        return pd.Series(dtype=object)
+    # merge_asof needs both sides sorted by month
+    left['month'] = left['month'].astype('int64')
+    right['month'] = right['month'].astype('int64')
+    left = left.sort_values('month')
+    right = right.sort_values('month')
+    matched = pd.merge_asof(left, right, on='month', by=key, direction='backward')
+    missing = matched['panel_row'].isna()
+    if missing.any():
+        later = pd.merge_asof(left[missing.values], right, on='month', by=key, direction='forward')
+        matched.loc[missing.values, 'panel_row'] = later['panel_row'].values
+    matched = matched.dropna(subset=['panel_row'])
+    return pd.Series(matched['panel_row'].astype('int64').values, index=matched['row'].values)
+
+def name_index(panel):
+    """
+    Returns the indexes for matching names: normalized name and state -> CRD number and, as
+    blocks for approximate matching, state and first word -> normalized names. The most recent
+    month counts if a name appears with several CRD numbers.
+    Arguments: panel - panel from load_panel.
+    """
+    names = (panel.dropna(subset=['crd_key'])
+                  .loc[lambda p: p['name_key'] != '']
+                  .sort_values('month')
+                  .drop_duplicates(['name_key', 'state'], keep='last'))
+    states = names['state'].fillna('')
+    exact = {(n, s): crd for n, s, crd in zip(names['name_key'], states, names['crd_key'])}
+    blocks = {}
+    for n, s in exact:
+        blocks.setdefault((s, n.split()[0]), []).append(n)
+    return exact, blocks
+
+def match_name(name, state, exact, blocks, cutoff=NAME_CUTOFF):
+    """
+    Returns (CRD number, 'name' or 'fuzzy') of the panel adviser with the same normalized name
+    in the same state or, failing that, the most similar name of its block; (None, None) if none.
+    Only names sharing state and first word are ever compared, never all pairs.
+    Arguments: name - normalized name, state - state of the adviser, exact and blocks - indexes
+               from name_index, cutoff - minimum similarity.
+    """
+    if not name:
+        return None, None
+    if (name, state) in exact:
+        return exact[(name, state)], 'name'
+    close = difflib.get_close_matches(name, blocks.get((state, name.split()[0]), []), n=1, cutoff=cutoff)
+    if close:
+        return exact[(close[0], state)], 'fuzzy'
+    return None, None
+
+def link_advisers(advisers, funds, panel):
+    """
+    Links every adviser of the parsed filings to a panel row and returns the linked table
+    (LINK_HEADER); advisers without a match keep empty panel columns and match.
+    Arguments: advisers - long adviser table (ADVISER_HEADER), funds - fund table (FUND_HEADER),
+               panel - panel from load_panel.
+    """
+    links = wide_advisers(advisers)
+    links['month'] = filing_month(links['fdate'])
+    links['crd_key'] = links['adv_crd'].map(normalize_crd)
+    links['sec_key'] = links['adv_sec'].map(normalize_sec)
+    panel_row = pd.Series(index=links.index, dtype=object)
+    match = pd.Series(index=links.index, dtype=object)
+
+    # identifiers (N-CEN)
+    for key, label in [('crd_key', 'crd'), ('sec_key', 'sec')]:
+        todo = links[panel_row.isna()]
+        found = asof_match(todo, panel, key)
+        panel_row[found.index] = found
+        match[found.index] = label
+
+    # names within the state (N-SAR); every distinct name is looked up once
+    todo = links[panel_row.isna() & links['adv_name'].notna()].copy()
+    if not todo.empty:
+        exact, blocks = name_index(panel)
+        keys = list(zip(todo['adv_name'].map(normalize_name), todo['adv_state'].fillna('')))
+        resolved = {key: match_name(key[0], key[1], exact, blocks) for key in set(keys)}
+        todo['crd_key'] = [resolved[key][0] for key in keys]
+        todo['name_match'] = [resolved[key][1] for key in keys]
+        found = asof_match(todo, panel, 'crd_key')
+        panel_row[found.index] = found
+        match[found.index] = todo.loc[found.index, 'name_match']
+
+    # attach panel rows
+    located = panel.loc[panel_row.dropna().astype('int64'), PANEL_FIELDS]
+    located.index = panel_row.dropna().index
+    links = links.join(located)
+    links['match'] = match
+
+    # fund names
+    funds = funds[['file_name', 'fund_id', 'fund']].drop_duplicates(['file_name', 'fund_id'])
+    links = links.merge(funds, on=['file_name', 'fund_id'], how='left')
+    return links[LINK_HEADER]
@@ -0,0 +1,207 @@
+'''
+File: f11_synthetic_filings.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 4:51:08 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 4:51:08 pm
+-----
+Description: Functions for generating synthetic EDGAR submissions (N-SAR, N-CEN) and form.idx
+             files that look like the real ones to the parsers. The number of funds, advisers,
+             exhibits, and the file size can be varied; the same seed gives the same files.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import random
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# words for names of registrants, funds, and advisers
+NAME_WORDS = ['AMERICAN', 'GLOBAL', 'CAPITAL', 'INCOME', 'GROWTH', 'VALUE', 'MUNICIPAL', 'BOND',
+              'EQUITY', 'STRATEGIC', 'PACIFIC', 'ATLANTIC', 'SELECT', 'CORE', 'DIVIDEND', 'INDEX']
+CITIES = [('NEW YORK', 'NY', '10017'), ('BOSTON', 'MA', '02110'), ('CHICAGO', 'IL', '60606'),
+          ('SAN FRANCISCO', 'CA', '94105'), ('DENVER', 'CO', '80202'), ('KANSAS CITY', 'MO', '64105')]
+
+# form types of the other lines of a form.idx file
+OTHER_FORMS = ['10-K', '10-Q', '8-K', '4', '3', '13F-HR', 'SC 13G', 'SC 13G/A', 'N-CSR', '497', 'S-8']
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def random_name(rng, suffix):
+    """
+    Returns a random name like 'GLOBAL INCOME FUND'.
+    Arguments: rng - random.Random, suffix - last word of the name.
+    """
+    return ' '.join(rng.sample(NAME_WORDS, rng.randint(1, 3)) + [suffix])
+
+def sec_header(rng, form_type, n_documents):
+    """
+    Returns the SEC header of a submission: accession number, form type, dates, and the filer.
+    Arguments: rng - random.Random, form_type - e.g., 'NSAR-B', n_documents - number of documents.
+    """
+    cik = rng.randint(1000, 1900000)
+    year = rng.randint(2001, 2020)
+    accession = f'{rng.randint(10**9, 2 * 10**9):010d}-{year % 100:02d}-{rng.randint(1, 999999):06d}'
+    city, state, zip_code = rng.choice(CITIES)
+    return (f'<SEC-DOCUMENT>{accession}.txt : {year}0301\n'
+            f'<SEC-HEADER>{accession}.hdr.sgml : {year}0301\n'
+            f'ACCESSION NUMBER:\t\t{accession}\n'
+            f'CONFORMED SUBMISSION TYPE:\t{form_type}\n'
+            f'PUBLIC DOCUMENT COUNT:\t\t{n_documents}\n'
+            f'CONFORMED PERIOD OF REPORT:\t{year - 1}1231\n'
+            f'FILED AS OF DATE:\t\t{year}0301\n'
+            f'DATE AS OF CHANGE:\t\t{year}0301\n'
+            f'EFFECTIVENESS DATE:\t\t{year}0301\n\n'
+            f'FILER:\n\n'
+            f'\tCOMPANY DATA:\t\n'
+            f'\t\tCOMPANY CONFORMED NAME:\t\t\t{random_name(rng, "TRUST")}\n'
+            f'\t\tCENTRAL INDEX KEY:\t\t\t{cik:010d}\n'
+            f'\t\tIRS NUMBER:\t\t\t\t{rng.randint(10**8, 10**9 - 1)}\n'
+            f'\t\tSTATE OF INCORPORATION:\t\t\t{state}\n'
+            f'\t\tFISCAL YEAR END:\t\t\t1231\n\n'
+            f'\tFILING VALUES:\n'
+            f'\t\tFORM TYPE:\t\t{form_type}\n'
+            f'\t\tSEC ACT:\t\t1940 Act\n'
+            f'\t\tSEC FILE NUMBER:\t811-{rng.randint(1000, 99999):05d}\n\n'
+            f'\tBUSINESS ADDRESS:\t\n'
+            f'\t\tSTREET 1:\t\t{rng.randint(1, 999)} MAIN STREET\n'
+            f'\t\tCITY:\t\t\t{city}\n'
+            f'\t\tSTATE:\t\t\t{state}\n'
+            f'\t\tZIP:\t\t\t{zip_code}\n'
+            f'\t\tBUSINESS PHONE:\t\t{rng.randint(200, 999)}5550100\n'
+            f'</SEC-HEADER>\n')
+
+def exhibit(rng, number, size):
+    """
+    Returns an exhibit document (EX-99) of roughly the given size in bytes.
+    Arguments: rng - random.Random, number - sequence number, size - bytes of text.
+    """
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(NAME_WORDS).lower()
+        words.append(word)
+        length += len(word) + 1
+    lines = [' '.join(words[i:i+12]) for i in range(0, len(words), 12)]
+    return (f'<DOCUMENT>\n<TYPE>EX-99.77Q1\n<SEQUENCE>{number}\n<FILENAME>ex{number}.txt\n'
+            f'<TEXT>\n' + '\n'.join(lines) + '\n</TEXT>\n</DOCUMENT>\n')
+
+def nsar_filing(rng, n_funds=10, n_advisers=2, n_exhibits=1, size=60000):
+    """
+    Returns a synthetic N-SAR submission: the answer document with fund (007) and adviser (008)
+    items among the other items, followed by exhibits. The filler items and exhibits are sized
+    so that the submission has roughly 'size' bytes (at least what the funds need).
+    Arguments: rng - random.Random, n_funds - number of series, n_advisers - advisers per series,
+               n_exhibits - number of exhibits, size - approximate bytes of the submission.
+    """
+    lines = ['<DOCUMENT>', '<TYPE>NSAR-B', '<SEQUENCE>1', '<FILENAME>answer.fil', '<TEXT>',
+             f'000 B000000 {rng.randint(1, 12):02d}/31/{rng.randint(2000, 2018)}',
+             '000 C000000 0000012345', '000 D000000 N', '000 E000000 F',
+             '001 A000000 ' + random_name(rng, 'TRUST')]
+    for fund in range(1, n_funds + 1):
+        lines.append(f'007 C02{fund:02d}00 {random_name(rng, "FUND")}')
+        lines.append(f'007 C03{fund:02d}00 N')
+    for fund in range(1, n_funds + 1):
+        for adviser in range(1, n_advisers + 1):
+            city, state, zip_code = rng.choice(CITIES)
+            for item, value in [('A00', random_name(rng, 'ADVISORS LLC')),
+                                ('B00', 'A' if adviser == 1 else 'S'),
+                                ('C00', f'801-{rng.randint(1000, 99999)}'),
+                                ('D01', city), ('D02', state), ('D03', zip_code)]:
+                lines.append(f'008 {item}{fund:02d}{adviser:02d} {value}')
+    body = '\n'.join(lines)
+    # other items of the form fill the answer document up to its share of the size
+    filler = []
+    length = 0
+    target = (size - len(body)) // (n_exhibits + 1)
+    while length < target:
+        filler.append(f'{rng.randint(10, 133):03d} {rng.choice("ABCDEFG")}0{rng.randint(0, 99999):05d} '
+                      f'{rng.randint(0, 10**7)}')
+        length += len(filler[-1]) + 1
+    answer = body + '\n' + '\n'.join(filler) + '\n</TEXT>\n</DOCUMENT>\n'
+    exhibits = ''.join(exhibit(rng, i + 2, target) for i in range(n_exhibits))
+    return sec_header(rng, 'NSAR-B', n_exhibits + 1) + answer + exhibits + '</SEC-DOCUMENT>\n'
+
+def ncen_filing(rng, n_funds=10, n_advisers=1, n_subadvisers=1, n_exhibits=0, size=0):
+    """
+    Returns a synthetic N-CEN submission: the primary XML with one fund block per series, each
+    with advisers and sub-advisers, followed by exhibits. Other elements of the fund blocks and
+    exhibits are sized so that the submission has roughly 'size' bytes.
+    Arguments: rng - random.Random, n_funds - number of series, n_advisers - advisers per series,
+               n_subadvisers - sub-advisers per series, n_exhibits - number of exhibits,
+               size - approximate bytes of the submission.
+    """
+    blocks = []
+    for fund in range(n_funds):
+        block = [f'<managementInvestmentQuestion>\n'
+                 f'<mgmtInvFundName>{random_name(rng, "FUND")}</mgmtInvFundName>\n'
+                 f'<mgmtInvSeriesId>S0000{rng.randint(10000, 99999)}</mgmtInvSeriesId>\n<investmentAdvisers>\n']
+        for kind, count in [('investmentAdviser', n_advisers), ('subAdviser', n_subadvisers)]:
+            if kind == 'subAdviser':
+                block.append('</investmentAdvisers>\n<subAdvisers>\n')
+            for _ in range(count):
+                city, state, zip_code = rng.choice(CITIES)
+                block.append(f'<{kind}>\n<{kind}Name>{random_name(rng, "ADVISORS LLC")}</{kind}Name>\n'
+                             f'<{kind}FileNo>801-{rng.randint(1000, 99999)}</{kind}FileNo>\n'
+                             f'<{kind}CrdNo>{rng.randint(1000, 300000):09d}</{kind}CrdNo>\n'
+                             f'<{kind}Lei>N/A</{kind}Lei>\n'
+                             f'<{kind}StateCountry {kind}State="US-{state}" {kind}Country="US"/>\n'
+                             f'</{kind}>\n')
+        block.append('</subAdvisers>\n')
+        blocks.append(block)
+    fixed = sum(len(p) for block in blocks for p in block)
+    # other answers of the fund blocks fill the primary document up to its share of the size
+    share = max(0, size - fixed - 2000) // (n_exhibits + 1)
+    other = '<isFundTypeIndex>N</isFundTypeIndex>\n'
+    documents = ['<DOCUMENT>\n<TYPE>N-CEN\n<SEQUENCE>1\n<FILENAME>primary_doc.xml\n<TEXT>\n<XML>\n'
+                 '<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<edgarSubmission xmlns="http://www.sec.gov/edgar/ncen" '
+                 'xmlns:com="http://www.sec.gov/edgar/common">\n'
+                 '<headerData><submissionType>N-CEN</submissionType></headerData>\n'
+                 '<formData>\n<managementInvestmentQuestionSeriesInfo>\n']
+    for block in blocks:
+        documents += block
+        documents.append(other * (share // max(1, n_funds) // len(other))
+                         + '</managementInvestmentQuestion>\n')
+    documents.append('</managementInvestmentQuestionSeriesInfo>\n</formData>\n</edgarSubmission>\n'
+                     '</XML>\n</TEXT>\n</DOCUMENT>\n')
+    documents += [exhibit(rng, i + 2, share) for i in range(n_exhibits)]
+    return sec_header(rng, 'N-CEN', n_exhibits + 1) + ''.join(documents) + '</SEC-DOCUMENT>\n'
+
+def form_index(rng, n_rows, share=0.005):
+    """
+    Returns a synthetic form.idx file; about 'share' of the rows are N-SAR or N-CEN filings.
+    Arguments: rng - random.Random, n_rows - number of filings, share - share of N-SAR/N-CEN rows.
+    """
+    lines = ['Description:           Master Index of EDGAR Dissemination Feed by Form Type',
+             'Last Data Received:    March 31, 2019', 'Comments:              webmaster@sec.gov',
+             'Anonymous FTP:         ftp://ftp.sec.gov/edgar/', ' ', ' ', ' ', ' ',
+             f'{"Form Type":<12}{"Company Name":<62}{"CIK":<12}{"Date Filed":<12}File Name',
+             '-' * 141]
+    for i in range(n_rows):
+        if rng.random() < share:
+            form_type = rng.choice(['NSAR-A', 'NSAR-B', 'N-CEN'])
+        else:
+            form_type = rng.choice(OTHER_FORMS)
+        cik = rng.randint(1000, 1900000)
+        lines.append(f'{form_type:<12}{random_name(rng, "INC"):<62}{cik:<12}'
+                     f'2019-{rng.randint(1, 3):02d}-15  edgar/data/{cik}/0000{cik:06d}-19-{i:06d}.txt')
+    return '\n'.join(lines) + '\n'
+
+def generate(kind, n, seed=0, **options):
+    """
+    Returns n synthetic submissions (or form.idx files) of a kind; the same seed gives the
+    same files.
+    Arguments: kind - 'nsar', 'ncen', or 'index', n - number of files, seed - random seed,
+               options - arguments of nsar_filing, ncen_filing, or form_index.
+    """
+    rng = random.Random(seed)
+    make = {'nsar': nsar_filing, 'ncen': ncen_filing, 'index': form_index}[kind]
+    return [make(rng, **options) for _ in range(n)]
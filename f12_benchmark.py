@@ -0,0 +1,90 @@
+'''
+File: f12_benchmark.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 5:20:44 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 5:20:44 pm
+-----
+Description: Functions for benchmarking the parsers on synthetic files: throughput (files and MB
+             per second, best of several runs), peak memory (tracemalloc, separate run), and the
+             comparison with stored baseline results.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import json
+import time
+import tracemalloc                  # Peak memory of Python allocations
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def measure(function, inputs, repeat=3):
+    """
+    Runs a function on all inputs and returns files/sec and MB/sec of the fastest of 'repeat'
+    runs and the peak memory of an extra run. The inputs are created before, so only the memory
+    allocated by the function counts.
+    Arguments: function - function of a single input, inputs - list of str or bytes,
+               repeat - number of timed runs.
+    """
+    size = sum(len(x.encode('utf-8')) if isinstance(x, str) else len(x) for x in inputs)
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for x in inputs:
+            function(x)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # tracing slows the function down, so memory is measured in a separate run
+    tracemalloc.start()
+    for x in inputs:
+        function(x)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'files': len(inputs), 'mb': round(size / 1e6, 3), 'seconds': round(seconds, 4),
+            'files_per_sec': round(len(inputs) / seconds, 1),
+            'mb_per_sec': round(size / 1e6 / seconds, 2), 'peak_mb': round(peak / 1e6, 2)}
+
+def load_baseline(baseline_path):
+    """
+    Returns the stored baseline results by case name, or an empty dict if there are none.
+    Arguments: baseline_path - path of the json file.
+    """
+    if not os.path.exists(baseline_path):
+        return {}
+    with open(baseline_path, 'r') as f:
+        return json.load(f)
+
+def save_baseline(results, baseline_path):
+    """
+    Stores results as the new baseline.
+    Arguments: results - dict case name -> result of measure, baseline_path - path of the json file.
+    """
+    with open(baseline_path, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+def regressions(results, baseline, tolerance=0.2):
+    """
+    Returns a message for every case that got slower or uses more memory than its baseline
+    by more than 'tolerance' (share). Cases without baseline are skipped.
+    Arguments: results - dict case name -> result of measure, baseline - same for the baseline,
+               tolerance - allowed relative change, e.g., 0.2 for 20%.
+    """
+    messages = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        base = baseline[case]
+        if result['mb_per_sec'] < base['mb_per_sec'] * (1 - tolerance):
+            messages.append(f"{case}: {result['mb_per_sec']} MB/sec, "
+                            f"baseline {base['mb_per_sec']} MB/sec")
+        # small absolute slack, tracemalloc peaks of a few kB fluctuate
+        if result['peak_mb'] > base['peak_mb'] * (1 + tolerance) + 0.1:
+            messages.append(f"{case}: peak {result['peak_mb']} MB, baseline {base['peak_mb']} MB")
+    return messages
@@ -0,0 +1,171 @@
+'''
+File: f13_metrics.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 5:58:31 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 5:58:31 pm
+-----
+Description: Metrics of the pipeline scripts: wall and CPU time per stage, counters (files, bytes,
+             requests, retries, errors by type), time per function, and the slowest files. They
+             are appended as JSON lines to a metrics file, one line per stage, error, and run
+             summary. Stages can optionally be profiled with cProfile.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import re                           # Regular Expressions
+import json
+import time
+import heapq                        # Slowest files
+import cProfile                     # Optional profiling
+import datetime
+from collections import Counter
+from contextlib import contextmanager
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+class Metrics:
+    """
+    Collects the metrics of a run and writes them as JSON lines; without a path nothing is
+    written, e.g., in worker processes whose metrics are merged into the parent (snapshot/merge).
+    Arguments: path - metrics file (appended), run - name of the run, e.g., 'parse',
+               slowest - number of slowest files kept, profile - profile every stage with cProfile
+               and save the statistics as <path>.<run>.<stage>.prof (view with pstats or snakeviz).
+    """
+    def __init__(self, path=None, run='', slowest=20, profile=False):
+        self.path = path
+        self.run = run
+        self.n_slowest = slowest
+        self.profile = profile
+        self.counters = Counter()
+        self.timings = {}
+        self.slowest = []
+        self.stages = []
+        self.started = (time.perf_counter(), time.process_time())
+
+    def count(self, name, n=1):
+        """
+        Increases a counter, e.g., 'files', 'bytes_parsed', or 'errors.ValueError'.
+        """
+        self.counters[name] += n
+
+    def time(self, name, seconds):
+        """
+        Adds a call of a function that took the given seconds.
+        """
+        calls_seconds = self.timings.setdefault(name, [0, 0.0])
+        calls_seconds[0] += 1
+        calls_seconds[1] += seconds
+
+    def item(self, name, seconds, size):
+        """
+        Remembers a file (filing, URL) if it is among the slowest so far.
+        """
+        if len(self.slowest) < self.n_slowest:
+            heapq.heappush(self.slowest, (seconds, name, size))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, name, size))
+
+    def error(self, kind, message, item=None):
+        """
+        Counts an error by kind and writes it, so it is not lost with the console output.
+        """
+        self.count(f'errors.{kind}')
+        self.write('error', kind=kind, message=message, item=item)
+
+    def begin_stage(self, name):
+        """
+        Starts a stage; counters and timings of the stage are reported on its own line.
+        """
+        profiler = cProfile.Profile() if self.profile else None
+        self.stages.append((name, self.counters, self.timings, profiler,
+                            time.perf_counter(), time.process_time()))
+        self.counters, self.timings = Counter(), {}
+        if profiler is not None:
+            profiler.enable()
+
+    def end_stage(self):
+        """
+        Ends the current stage, writes its line, and adds its counters and timings to the run.
+        """
+        name, counters, timings, profiler, wall, cpu = self.stages.pop()
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        if profiler is not None:
+            profiler.disable()
+            if self.path:
+                stage = re.sub(r'[^\w-]', '_', name)
+                profiler.dump_stats(f'{self.path}.{self.run}.{stage}.prof')
+        self.write('stage', stage=name, wall=round(wall, 3), cpu=round(cpu, 3),
+                   counters=dict(self.counters), timings=self.rounded(self.timings),
+                   per_sec={k: round(v / wall, 2) for k, v in self.counters.items() if wall > 0})
+        counters.update(self.counters)
+        for function, (calls, seconds) in self.timings.items():
+            calls_seconds = timings.setdefault(function, [0, 0.0])
+            calls_seconds[0] += calls
+            calls_seconds[1] += seconds
+        self.counters, self.timings = counters, timings
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager for begin_stage and end_stage.
+        """
+        self.begin_stage(name)
+        try:
+            yield self
+        finally:
+            self.end_stage()
+
+    def snapshot(self):
+        """
+        Returns counters, timings, and slowest files, e.g., to send them from a worker process.
+        """
+        return {'counters': dict(self.counters), 'timings': self.timings, 'slowest': self.slowest}
+
+    def merge(self, snapshot):
+        """
+        Adds the snapshot of another Metrics object, e.g., of a worker process.
+        """
+        self.counters.update(snapshot['counters'])
+        for function, (calls, seconds) in snapshot['timings'].items():
+            calls_seconds = self.timings.setdefault(function, [0, 0.0])
+            calls_seconds[0] += calls
+            calls_seconds[1] += seconds
+        for seconds, name, size in snapshot['slowest']:
+            self.item(name, seconds, size)
+
+    def rounded(self, timings):
+        """
+        Returns the timings as {function: {'calls': n, 'seconds': s}} for the metrics file.
+        """
+        return {k: {'calls': calls, 'seconds': round(seconds, 3)} for k, (calls, seconds) in timings.items()}
+
+    def write(self, event, **fields):
+        """
+        Appends a line {'time', 'run', 'event', ...fields} to the metrics file.
+        """
+        if not self.path:
+            return
+        line = {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'run': self.run,
+                'event': event, **fields}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(line) + '\n')
+
+    def close(self):
+        """
+        Ends open stages and writes the summary of the run, including the slowest files.
+        """
+        while self.stages:
+            self.end_stage()
+        wall = time.perf_counter() - self.started[0]
+        self.write('summary', wall=round(wall, 3), cpu=round(time.process_time() - self.started[1], 3),
+                   counters=dict(self.counters), timings=self.rounded(self.timings),
+                   per_sec={k: round(v / wall, 2) for k, v in self.counters.items() if wall > 0},
+                   slowest=[{'item': name, 'seconds': round(seconds, 3), 'bytes': size}
+                            for seconds, name, size in sorted(self.slowest, reverse=True)])
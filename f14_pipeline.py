@@ -0,0 +1,253 @@
+'''
+File: f14_pipeline.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 7:05:18 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 7:05:18 pm
+-----
+Description: Functions for running the pipeline as stages with declared inputs and outputs.
+             A stage is skipped if its code, its inputs, and its outputs did not change since it
+             last succeeded (fingerprints are kept in a JSON state file). Stages that do not
+             depend on each other run at the same time.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import ast                          # Reading settings and imports of the scripts
+import sys
+import json
+import hashlib                      # Fingerprints
+import subprocess                   # Running the scripts
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+class Stage:
+    """
+    A stage of the pipeline: a callable with the files it reads and the files it writes.
+    Arguments: name - name of the stage, run - callable without arguments, inputs - paths of files
+               or folders read by the stage, outputs - paths of files or folders written by the
+               stage, code - source files whose changes make the stage run again,
+               after - names of stages that have to finish first, in addition to those whose
+               outputs are inputs of this stage.
+    """
+    def __init__(self, name, run, inputs=(), outputs=(), code=(), after=()):
+        self.name = name
+        self.run = run
+        self.inputs = [os.path.abspath(p) for p in inputs]
+        self.outputs = [os.path.abspath(p) for p in outputs]
+        self.code = [os.path.abspath(p) for p in code]
+        self.after = list(after)
+
+def script_settings(script_path):
+    """
+    Returns the settings of a script, i.e., its module-level assignments of upper-case names
+    with literal values, without running the script.
+    Arguments: script_path - path of the script.
+    """
+    with open(script_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    settings = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name.isupper():
+                try:
+                    settings[name] = ast.literal_eval(node.value)
+                except ValueError:
+                    # computed settings, e.g., list comprehensions
+                    continue
+    return settings
+
+def local_modules(script_path):
+    """
+    Returns the script and the modules of its folder it imports, directly or indirectly.
+    Arguments: script_path - path of the script.
+    """
+    folder = os.path.dirname(os.path.abspath(script_path))
+    todo, found = [os.path.abspath(script_path)], []
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.append(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            elif isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(folder, name.split('.')[0] + '.py')
+                if os.path.exists(module):
+                    todo.append(module)
+    return sorted(found)
+
+def script(script_path, log_path=None):
+    """
+    Returns a callable that runs a script in a separate Python process from its own folder and
+    raises an error if the script fails.
+    Arguments: script_path - path of the script, log_path - optional file for the output of the
+               script (default: the console).
+    """
+    script_path = os.path.abspath(script_path)
+
+    def run():
+        log = open(log_path, 'a') if log_path else None
+        try:
+            subprocess.run([sys.executable, script_path], cwd=os.path.dirname(script_path),
+                           stdout=log, stderr=subprocess.STDOUT if log else None, check=True)
+        finally:
+            if log is not None:
+                log.close()
+    return run
+
+def fingerprint(paths):
+    """
+    Returns a fingerprint of files and folders from their names, sizes, and modification times;
+    folders are walked recursively. Missing paths are part of the fingerprint as well.
+    Arguments: paths - paths of files or folders.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        if os.path.isdir(path):
+            for folder, folders, files in os.walk(path):
+                folders.sort()
+                for name in sorted(files):
+                    info = os.stat(os.path.join(folder, name))
+                    digest.update(f'\n{os.path.relpath(os.path.join(folder, name), path)}'
+                                  f'\t{info.st_size}\t{info.st_mtime_ns}'.encode())
+        elif os.path.exists(path):
+            info = os.stat(path)
+            digest.update(f'\t{info.st_size}\t{info.st_mtime_ns}'.encode())
+        else:
+            digest.update(b'\tmissing')
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def code_fingerprint(paths):
+    """
+    Returns a fingerprint of source files from their contents, so that saving a file without
+    changes does not make its stage run again.
+    Arguments: paths - paths of the source files.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def load_state(state_path):
+    """
+    Returns the state of the pipeline: stage name -> fingerprints of its last successful run.
+    Arguments: state_path - path of the JSON state file.
+    """
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+def save_state(state_path, state):
+    """
+    Writes the state of the pipeline; the file is replaced only once it is complete.
+    Arguments: state_path - path of the JSON state file, state - state from load_state.
+    """
+    with open(state_path + '.part', 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(state_path + '.part', state_path)
+
+def dependencies(stages):
+    """
+    Returns stage name -> names of the stages it waits for: those whose outputs contain one of
+    its inputs and those listed in after.
+    Arguments: stages - list of Stage.
+    """
+    def inside(path, output):
+        return path == output or path.startswith(output.rstrip(os.sep) + os.sep)
+
+    return {stage.name: {other.name for other in stages if other is not stage
+                         and any(inside(i, o) for i in stage.inputs for o in other.outputs)}
+                        | set(stage.after)
+            for stage in stages}
+
+def is_current(stage, state):
+    """
+    Returns the fingerprints of a stage and whether they equal those of its last successful run,
+    i.e., whether the stage can be skipped.
+    Arguments: stage - Stage, state - state from load_state.
+    """
+    prints = {'code': code_fingerprint(stage.code), 'inputs': fingerprint(stage.inputs),
+              'outputs': fingerprint(stage.outputs)}
+    current = state.get(stage.name) == prints and all(os.path.exists(p) for p in stage.outputs)
+    return prints, current
+
+def run_pipeline(stages, state_path, force=(), max_parallel=2):
+    """
+    Runs the stages in the order of their dependencies and skips those that are current; a stage
+    runs as soon as the stages it depends on are done, so independent stages run concurrently.
+    Stages that depend on a failed stage are not run. Returns stage name -> 'ran', 'skipped',
+    'failed', or 'blocked'.
+    Arguments: stages - list of Stage, state_path - path of the JSON state file, force - names
+               of stages that run even if they are current (e.g., to fetch new filings),
+               max_parallel - most stages running at the same time.
+    """
+    names = [stage.name for stage in stages]
+    waits_for = dependencies(stages)
+    unknown = [name for deps in waits_for.values() for name in deps if name not in names]
+    if unknown:
+        raise ValueError(f'Unknown stages in after: {unknown}')
+    by_name = {stage.name: stage for stage in stages}
+    state = load_state(state_path)
+    status = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_parallel) as executor:
+        while len(status) < len(stages):
+            for name in names:
+                if name in status or name in running.values():
+                    continue
+                if any(status.get(dep) in ('failed', 'blocked') for dep in waits_for[name]):
+                    status[name] = 'blocked'
+                    print(f'Stage {name} is blocked by a failed stage.')
+                    continue
+                if not all(status.get(dep) in ('ran', 'skipped') for dep in waits_for[name]):
+                    continue
+                _, current = is_current(by_name[name], state)
+                if current and name not in force:
+                    status[name] = 'skipped'
+                    print(f'Stage {name} is current, skipping.')
+                    continue
+                print(f'Running stage {name}.')
+                running[executor.submit(by_name[name].run)] = name
+
+            if not running:
+                if len(status) < len(stages):
+                    raise ValueError(f'Stages wait for each other: {sorted(set(names) - set(status))}')
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    status[name] = 'failed'
+                    print(f'Stage {name} failed: {future.exception()}')
+                    # its outputs may be half written, so it runs again next time
+                    if state.pop(name, None) is not None:
+                        save_state(state_path, state)
+                    continue
+                status[name] = 'ran'
+                # fingerprints with the outputs as written
+                prints, _ = is_current(by_name[name], {})
+                state[name] = prints
+                save_state(state_path, state)
+                print(f'Finished stage {name}.')
+    return status
@@ -0,0 +1,146 @@
+'''
+File: f15_compact_rows.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 9:12:37 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 9:12:37 pm
+-----
+Description: A compact in-memory form of the parsed tables, e.g., the long adviser table. The
+             filing keys (file_name, cik, fdate) are stored once per filing, every other column
+             is dictionary encoded, i.e., every distinct value is kept once and rows only hold
+             integer codes. The rows convert into categorical data frames and Arrow tables
+             (Parquet files) without creating a string per row.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import sys
+import csv
+from array import array             # Integer codes
+import numpy as np
+import pandas as pd
+import pyarrow as pa                # Columnar tables
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# leading columns of the parsed tables that are the same for all rows of a filing
+FILING_KEYS = ['file_name', 'cik', 'fdate']
+
+# type of the integer codes (array typecode and numpy type)
+CODE_TYPE = 'i'
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+class CompactRows:
+    """
+    Rows of a parsed table as integer codes: one code per row for its filing and one per column
+    for its value. Distinct values are kept in dictionaries in the order they first appear.
+    Arguments: header - column names, n_keys - number of leading columns that are the same for
+               all rows of a filing (default: FILING_KEYS), rows - optional rows to be added.
+    """
+    def __init__(self, header, n_keys=len(FILING_KEYS), rows=None):
+        self.header = list(header)
+        self.n_keys = n_keys
+        # filing keys -> code; dicts keep the order of insertion, so list(keys) are the values
+        self.keys = {}
+        self.filings = array(CODE_TYPE)
+        self.dictionaries = [{} for _ in self.header[n_keys:]]
+        self.codes = [array(CODE_TYPE) for _ in self.header[n_keys:]]
+        if rows is not None:
+            self.extend(rows)
+
+    def extend(self, rows):
+        """
+        Adds rows, e.g., the adviser rows returned by parse_nsar_file or parse_ncen_file.
+        """
+        n_keys, keys, filings = self.n_keys, self.keys, self.filings
+        columns = list(zip(self.dictionaries, self.codes))
+        for row in rows:
+            key = tuple(row[:n_keys])
+            filings.append(keys.setdefault(key, len(keys)))
+            for value, (dictionary, codes) in zip(row[n_keys:], columns):
+                codes.append(dictionary.setdefault(value, len(dictionary)))
+
+    def append(self, row):
+        """
+        Adds a single row.
+        """
+        self.extend([row])
+
+    def __len__(self):
+        return len(self.filings)
+
+    def __iter__(self):
+        """
+        Yields the rows as lists of values again, e.g., for a csv writer.
+        """
+        keys = list(self.keys)
+        values = [list(dictionary) for dictionary in self.dictionaries]
+        for i, filing in enumerate(self.filings):
+            yield list(keys[filing]) + [v[codes[i]] for v, codes in zip(values, self.codes)]
+
+    def columns(self):
+        """
+        Yields (column name, codes, distinct values) of every column; the filing keys are
+        recoded per column from the filing codes, so that every column has its own dictionary.
+        """
+        filings = np.frombuffer(self.filings, dtype=CODE_TYPE)
+        for j, name in enumerate(self.header[:self.n_keys]):
+            dictionary = {}
+            recode = np.array([dictionary.setdefault(key[j], len(dictionary)) for key in self.keys],
+                              dtype=CODE_TYPE)
+            yield name, recode[filings], list(dictionary)
+        for name, dictionary, codes in zip(self.header[self.n_keys:], self.dictionaries, self.codes):
+            yield name, np.frombuffer(codes, dtype=CODE_TYPE), list(dictionary)
+
+    def to_pandas(self):
+        """
+        Returns the rows as a data frame with categorical columns; the codes are not copied
+        into strings. A missing value (None) is not a category but code -1.
+        """
+        columns = {}
+        for name, codes, values in self.columns():
+            if None in values:
+                missing = values.index(None)
+                codes = np.where(codes == missing, -1, codes - (codes > missing))
+                values = values[:missing] + values[missing+1:]
+            columns[name] = pd.Categorical.from_codes(codes, values)
+        return pd.DataFrame(columns)
+
+    def to_arrow(self):
+        """
+        Returns the rows as an Arrow table with dictionary-encoded string columns, e.g., for
+        pq.write_table or write_partition (see f6_columnar.py); values like the integer fund and
+        adviser IDs of N-CEN rows become strings, as in the csv files.
+        """
+        columns = {}
+        for name, codes, values in self.columns():
+            values = pa.array([None if v is None else str(v) for v in values], pa.string())
+            columns[name] = pa.DictionaryArray.from_arrays(pa.array(codes), values)
+        return pa.table(columns)
+
+    def nbytes(self):
+        """
+        Returns the approximate memory of the codes and the distinct values in bytes.
+        """
+        codes = sum(c.itemsize * len(c) for c in [self.filings] + self.codes)
+        values = sum(sys.getsizeof(v) for d in self.dictionaries for v in d)
+        keys = sum(sys.getsizeof(v) for key in self.keys for v in key)
+        return codes + values + keys
+
+def read_compact(csv_path, n_keys=len(FILING_KEYS)):
+    """
+    Reads a csv file of the parse code, e.g., 'nsar_advisers.csv', row by row into CompactRows,
+    so the file never exists as strings in memory.
+    Arguments: csv_path - path of the csv file, n_keys - number of leading filing key columns.
+    """
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        return CompactRows(next(reader), n_keys, reader)
@@ -0,0 +1,167 @@
+'''
+File: f16_shards.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 9:48:20 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 9:48:20 pm
+-----
+Description: Functions for splitting the download and the parsing across several workers, e.g.,
+             the machines of a small cluster. Every filing belongs to exactly one of N shards by
+             a hash of its EDGAR path, so the workers need no coordination to agree on their
+             filings. A shard is a separate tree (folder, catalog, yearly tables) with a JSON
+             manifest per step; the coordinator checks the manifests for completeness and merges
+             the catalogs and the tables of all shards.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import json
+import hashlib                      # Stable hashes for the shards
+import datetime
+from f4_catalog import open_catalog, pending_filings, downloaded_filings   # selfmade functions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# name of the folder of a shard within the output folder
+SHARD_DIR = 'shard-{shard:03d}-of-{n_shards:03d}'
+
+# manifests of the steps within the folder of a shard
+MANIFEST = 'manifest_{step}.json'
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def shard_of(fname, n_shards):
+    """
+    Returns the shard of a filing. The hash is the same on every machine and in every Python
+    process (unlike hash()), and it only depends on the EDGAR path of the filing.
+    Arguments: fname - EDGAR path of the filing, n_shards - number of shards.
+    """
+    digest = hashlib.blake2b(fname.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % n_shards
+
+def shard_dir(base_dir, shard, n_shards):
+    """
+    Returns the folder of a shard, e.g., BASE_DIR/shard-002-of-004.
+    Arguments: base_dir - folder of all shards, shard - number of the shard (from 0),
+               n_shards - number of shards.
+    """
+    return os.path.join(base_dir, SHARD_DIR.format(shard=shard, n_shards=n_shards))
+
+def shard_path(path, shard, n_shards):
+    """
+    Returns the path of a file of a shard next to the path of the unsharded file, e.g.,
+    catalog.sqlite -> catalog.shard-002-of-004.sqlite.
+    Arguments: path - path of the unsharded file, shard - number of the shard (from 0),
+               n_shards - number of shards.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.{SHARD_DIR.format(shard=shard, n_shards=n_shards)}{extension}"
+
+def write_manifest(folder, step, shard, n_shards, **fields):
+    """
+    Writes the manifest of a finished step of a shard; the file is replaced only once it is
+    complete, so a manifest always describes a finished run.
+    Arguments: folder - folder of the shard, step - 'download' or 'parse', shard - number of the
+               shard, n_shards - number of shards, fields - further entries, e.g., counts.
+    """
+    path = os.path.join(folder, MANIFEST.format(step=step))
+    manifest = {'step': step, 'shard': shard, 'n_shards': n_shards,
+                'finished': datetime.datetime.now().isoformat(timespec='seconds'), **fields}
+    with open(path + '.part', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.part', path)
+
+def read_manifest(folder, step):
+    """
+    Returns the manifest of a step of a shard, None if the step has not finished yet.
+    Arguments: folder - folder of the shard, step - 'download' or 'parse'.
+    """
+    path = os.path.join(folder, MANIFEST.format(step=step))
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def catalog_counts(con):
+    """
+    Returns the number of filings of a catalog by state, e.g., {'done': 120, 'failed': 2}.
+    Arguments: con - catalog connection.
+    """
+    return dict(con.execute('SELECT state, COUNT(*) FROM filings GROUP BY state').fetchall())
+
+def check_shards(fnames, file_dir, output_dir, catalog_path, n_shards, max_attempts):
+    """
+    Checks that all shards finished their download and parse, that every filing was assigned
+    to exactly its shard, and that no filing is left to be tried. Returns a list of problems
+    (empty if the shards are complete), shard -> downloaded filings by year (see
+    downloaded_filings), and shard -> number of filings by state.
+    Arguments: fnames - EDGAR paths of all filings, e.g., the fname column of the filing list,
+               file_dir - folder of the downloaded shards, output_dir - folder of the parsed
+               shards, catalog_path - path of the unsharded catalog,
+               n_shards - number of shards, max_attempts - filings that failed this many times
+               are given up (MAX_ATTEMPTS of the download code).
+    """
+    expected = [set() for _ in range(n_shards)]
+    for fname in fnames:
+        expected[shard_of(fname, n_shards)].add(fname)
+    problems, filings, counts = [], {}, {}
+
+    for shard in range(n_shards):
+        folders = {'download': shard_dir(file_dir, shard, n_shards),
+                   'parse': shard_dir(output_dir, shard, n_shards)}
+        name = SHARD_DIR.format(shard=shard, n_shards=n_shards)
+        for step, folder in folders.items():
+            manifest = read_manifest(folder, step)
+            if manifest is None:
+                problems.append(f'{name}: {step} has not finished.')
+            elif manifest['n_shards'] != n_shards or manifest['shard'] != shard:
+                problems.append(f'{name}: {step} ran as shard {manifest["shard"]} of {manifest["n_shards"]}.')
+        path = shard_path(catalog_path, shard, n_shards)
+        if not os.path.exists(path):
+            problems.append(f'{name}: catalog {path} is missing.')
+            continue
+
+        con = open_catalog(path)
+        known = {fname for fname, in con.execute('SELECT fname FROM filings')}
+        counts[shard] = catalog_counts(con)
+        todo = len(pending_filings(con, max_attempts))
+        filings[shard] = downloaded_filings(con)
+        con.close()
+        if expected[shard] - known:
+            problems.append(f'{name}: {len(expected[shard] - known)} filings of the list are not in the catalog.')
+        if {shard_of(fname, n_shards) for fname in known} - {shard}:
+            problems.append(f'{name}: the catalog holds filings of other shards.')
+        if todo:
+            problems.append(f'{name}: {todo} filings are still to be downloaded.')
+
+        # the parse has to have seen the filings that are downloaded now
+        manifest = read_manifest(folders['parse'], 'parse')
+        if manifest is not None:
+            parsed = manifest['filings']
+            downloaded = {year: len(names) for year, names in filings[shard].items()}
+            if parsed != downloaded:
+                problems.append(f'{name}: the parse is older than the download.')
+    return problems, filings, counts
+
+def merge_catalogs(catalog_path, shard_paths):
+    """
+    Writes the rows of the catalogs of all shards into the unsharded catalog; rows of filings
+    that are already in the catalog are replaced.
+    Arguments: catalog_path - path of the unsharded catalog, shard_paths - paths of the catalogs
+               of the shards.
+    """
+    con = open_catalog(catalog_path)
+    for path in shard_paths:
+        con.execute('ATTACH DATABASE ? AS shard', (path,))
+        con.execute('INSERT OR REPLACE INTO filings SELECT * FROM shard.filings')
+        con.commit()
+        con.execute('DETACH DATABASE shard')
+    con.close()
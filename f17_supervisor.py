@@ -0,0 +1,282 @@
+'''
+File: f17_supervisor.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 10:57:44 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 10:57:44 pm
+-----
+Description: Functions for parsing the filings of a year under supervision. Every filing is parsed
+             in a worker process with a time budget; a worker that exceeds it is stopped and
+             replaced, and workers are replaced after a number of filings, so neither a stuck
+             filing nor growing memory can hold up the run. Filings that fail, time out, crash
+             their worker, are parsed only in part, or are slow are written to a quarantine list
+             (JSON lines) with reason, size, and time; the list can be parsed again on its own.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import csv              # CSV documents
+import json             # Quarantine list
+import time
+import datetime
+import multiprocessing                              # Worker processes
+from multiprocessing.connection import wait
+from f1_parse_filing import parse_file              # selfmade functions
+from f2_parse_years import open_filing, list_filings, record_filing, TABLES
+from f5_filing_store import load_index
+from f13_metrics import Metrics
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# name of the quarantine list within the output folder
+QUARANTINE = 'quarantine.jsonl'
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def supervised_worker(conn, file_dir, year, storage):
+    """
+    Worker process: parses the filings it receives until it receives None. For every filing, it
+    first sends its size once it is open, then (result, error, read seconds, parse seconds,
+    CPU seconds); result is the tuple returned by parse_file or None if parsing failed, a filing
+    parsed only in part has both.
+    Arguments: conn - end of the pipe to the supervisor, file_dir - folder containing the yearly
+               folders or packs of filings, year - string year, storage - 'files' or 'pack'.
+    """
+    while True:
+        file_name = conn.recv()
+        if file_name is None:
+            break
+        result, error = None, None
+        start, cpu = time.perf_counter(), time.process_time()
+        read = start
+        try:
+            with open_filing(file_dir, year, file_name, storage) as data:
+                read = time.perf_counter()
+                conn.send(len(data))
+                partial = []
+                result = parse_file(file_name, data, partial)
+            if result is None:
+                raise ValueError('neither an N-SAR nor an N-CEN filing')
+            error = '; '.join(partial) or None
+        except Exception as inst:
+            result, error = None, f'{type(inst).__name__}: {inst}'
+        conn.send((result, error, read - start, time.perf_counter() - read, time.process_time() - cpu))
+    conn.close()
+
+class Worker:
+    """
+    A supervised worker process and the filing it is parsing.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings, year - string
+               year, storage - 'files' or 'pack'.
+    """
+    def __init__(self, file_dir, year, storage):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=supervised_worker, args=(child, file_dir, year, storage),
+                                               daemon=True)
+        self.process.start()
+        child.close()
+        # (position, file name, start) of the current filing, its size once known
+        self.task = None
+        self.size = None
+        self.done = 0
+
+    def send(self, position, file_name):
+        """
+        Hands a filing to the worker.
+        """
+        self.conn.send(file_name)
+        self.task = (position, file_name, time.perf_counter())
+        self.size = None
+
+    def stop(self, kill=False):
+        """
+        Ends the worker after its current filing or, with kill=True, right away.
+        """
+        if kill:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+def load_quarantine(quarantine_path):
+    """
+    Returns the entries of a quarantine list, empty if there is none.
+    Arguments: quarantine_path - path of the quarantine list.
+    """
+    if not os.path.exists(quarantine_path):
+        return []
+    with open(quarantine_path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_quarantine(quarantine_path, year, entries):
+    """
+    Replaces the entries of a year in a quarantine list; entries of other years are kept.
+    Arguments: quarantine_path - path of the quarantine list, year - string year,
+               entries - new entries of the year.
+    """
+    entries = [e for e in load_quarantine(quarantine_path) if e['year'] != year] + entries
+    with open(quarantine_path + '.part', 'w') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+    os.replace(quarantine_path + '.part', quarantine_path)
+
+def quarantined_filings(quarantine_path):
+    """
+    Returns the filings of a quarantine list by year, e.g., {'2019': ['0001234567-19-000001.txt']},
+    to parse them again.
+    Arguments: quarantine_path - path of the quarantine list.
+    """
+    filings = {}
+    for entry in load_quarantine(quarantine_path):
+        if entry['file_name'] not in filings.setdefault(entry['year'], []):
+            filings[entry['year']].append(entry['file_name'])
+    return filings
+
+def parse_year_supervised(file_dir, output_dir, year, file_names=None, storage='files', metrics=None,
+                          n_workers=1, time_budget=60, slow_seconds=10, files_per_worker=1000,
+                          quarantine_path=None):
+    """
+    Parses all filings of a year in supervised worker processes and writes the yearly csv files
+    with the same rows in the same order as parse_year. A filing that takes longer than
+    time_budget seconds is given up: its worker is stopped and replaced. Failed, timed out, and
+    crashed filings are left out of the tables; they, the filings parsed only in part, and the
+    slow filings (the rows of both are kept) are returned and written to the quarantine list.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings,
+               output_dir - folder for the csv files, year - string name of the yearly folder,
+               file_names - filings to be parsed (default: all filings of the year),
+               storage - 'files' or 'pack', metrics - optional Metrics, errors are written to it,
+               n_workers - number of worker processes, time_budget - seconds per filing,
+               slow_seconds - filings that take longer are quarantined as 'slow',
+               files_per_worker - filings after which a worker is replaced,
+               quarantine_path - optional quarantine list; the entries of the year are replaced.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if file_names is None:
+        file_names = list_filings(file_dir, year, storage)
+    elif storage == 'pack':
+        # read the pack sequentially
+        index = load_index(file_dir, year)
+        file_names = sorted(file_names, key=lambda f: index.get(f, (-1, 0)))
+
+    # create empty CSV files with headers, these will be filled
+    csv_files = [open(os.path.join(output_dir, f'nsar_{table}_{year}.csv'), 'w', newline='',
+                      encoding='utf-8') for table in TABLES]
+    writers = [csv.writer(f) for f in csv_files]
+    for writer, header in zip(writers, TABLES.values()):
+        writer.writerow(header)
+    writer_registrants, writer_funds, writer_advisers = writers
+
+    # results that arrive early wait until the filings before them are written
+    results, next_position = {}, 0
+    quarantine = []
+    tasks = enumerate(file_names)
+
+    def finish(position, result):
+        nonlocal next_position
+        results[position] = result
+        while next_position in results:
+            result = results.pop(next_position)
+            if result is not None:
+                registrant_info, fund_info, adviser_info = result
+                writer_registrants.writerow(registrant_info)
+                writer_funds.writerows(fund_info)
+                writer_advisers.writerows(adviser_info)
+            next_position += 1
+
+    def quarantined(file_name, reason, size, seconds, cpu=None, message=None):
+        metrics.count(f'quarantine.{reason}')
+        quarantine.append({'year': year, 'file_name': file_name, 'reason': reason, 'message': message,
+                           'bytes': size, 'seconds': round(seconds, 3),
+                           'cpu': None if cpu is None else round(cpu, 3),
+                           'time': datetime.datetime.now().isoformat(timespec='seconds')})
+        if reason != 'slow':
+            error = f'In parse_file: {os.path.join(file_dir, year, file_name)}, {reason}: {message}'
+            print(error)
+            metrics.write('error', message=error)
+
+    def assign(worker):
+        for position, file_name in tasks:
+            worker.send(position, file_name)
+            return
+
+    workers = [Worker(file_dir, year, storage) for _ in range(min(n_workers, len(file_names)))]
+    for worker in workers:
+        assign(worker)
+
+    while any(worker.task is not None for worker in workers):
+        busy = [worker for worker in workers if worker.task is not None]
+        deadline = min(worker.task[2] for worker in busy) + time_budget
+        ready = wait([worker.conn for worker in busy], timeout=max(deadline - time.perf_counter(), 0))
+
+        for i, worker in enumerate(workers):
+            if worker.task is None:
+                continue
+            position, file_name, start = worker.task
+            elapsed = time.perf_counter() - start
+            if worker.conn in ready:
+                try:
+                    message = worker.conn.recv()
+                except EOFError:
+                    # the worker died, e.g., out of memory
+                    worker.stop(kill=True)
+                    quarantined(file_name, 'crashed', worker.size, elapsed,
+                                message=f'exit code {worker.process.exitcode}')
+                    finish(position, None)
+                    workers[i] = worker = Worker(file_dir, year, storage)
+                    assign(worker)
+                    continue
+                if isinstance(message, int):
+                    # the filing is open, its result follows
+                    worker.size = message
+                    continue
+                result, error, read_seconds, parse_seconds, cpu = message
+                if result is None:
+                    metrics.count(f'errors.{error.split(":")[0]}')
+                    quarantined(file_name, 'error', worker.size, read_seconds + parse_seconds, cpu, error)
+                else:
+                    record_filing(metrics, os.path.join(file_dir, year, file_name), result[0][4],
+                                  worker.size, 0, read_seconds, read_seconds + parse_seconds)
+                    # the rows of a filing parsed in part are kept
+                    if error is not None:
+                        metrics.count('partial_filings')
+                        quarantined(file_name, 'partial', worker.size, read_seconds + parse_seconds, cpu, error)
+                    elif read_seconds + parse_seconds > slow_seconds:
+                        quarantined(file_name, 'slow', worker.size, read_seconds + parse_seconds, cpu)
+                finish(position, result)
+                worker.task = None
+                worker.done += 1
+                # a fresh process returns all memory the parser may have accumulated
+                if worker.done >= files_per_worker:
+                    worker.stop()
+                    workers[i] = worker = Worker(file_dir, year, storage)
+                    metrics.count('workers_recycled')
+                assign(worker)
+            elif elapsed > time_budget:
+                worker.stop(kill=True)
+                quarantined(file_name, 'timeout', worker.size, elapsed,
+                            message=f'stopped after {time_budget} seconds')
+                finish(position, None)
+                workers[i] = worker = Worker(file_dir, year, storage)
+                assign(worker)
+
+    for worker in workers:
+        worker.stop()
+    # we are done, close files
+    for f in csv_files:
+        f.close()
+
+    if quarantine_path is not None:
+        save_quarantine(quarantine_path, year, quarantine)
+    return quarantine
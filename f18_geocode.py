@@ -0,0 +1,149 @@
+'''
+File: f18_geocode.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 11:36:15 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 11:36:15 pm
+-----
+Description: Functions for geocoding registrants and advisers offline with a local ZIP code
+             gazetteer (by default the GeoNames postal code file US.txt) and for computing the
+             distance between registrant and adviser. A location is found by its five-digit ZIP
+             code or, failing that, by city and state. All steps work on whole columns: keys are
+             normalized once per distinct value, looked up with indexed series, and distances
+             are computed with NumPy.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import re                           # Regular Expressions
+import numpy as np
+import pandas as pd
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# columns of the GeoNames postal code file (download.geonames.org/export/zip/US.zip): tab separated,
+# without header; only zip, city, state, lat, and lon are used
+GAZETTEER_COLUMNS = ['country', 'zip', 'city', 'state_name', 'state', 'county', 'county_code',
+                     'community', 'community_code', 'lat', 'lon', 'accuracy']
+
+# abbreviations of the first word of city names, e.g., 'ST. LOUIS' -> 'SAINT LOUIS'
+CITY_ABBREVIATIONS = {'ST': 'SAINT', 'STE': 'SAINTE', 'FT': 'FORT', 'MT': 'MOUNT', 'PT': 'PORT'}
+
+# mean radius of the earth
+EARTH_RADIUS_KM = 6371.0088
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def normalize_zip(zips):
+    """
+    Returns five-digit ZIP codes; ZIP+4 codes are cut, leading zeros lost in csv files or
+    spreadsheets are restored (e.g., '2110' -> '02110'), everything else becomes missing.
+    Arguments: zips - series of ZIP codes (may be missing).
+    """
+    digits = zips.astype('string').str.replace(r'\D', '', regex=True)
+    length = digits.str.len()
+    digits = digits.mask(length == 4, digits.str.zfill(5)).mask(length == 8, digits.str.zfill(9))
+    return digits.str[:5].where(digits.str.len().isin([5, 9]))
+
+def normalize_city_name(city):
+    """
+    Returns a city name in upper case, without punctuation, and with the first word spelled out,
+    e.g., 'St. Louis' -> 'SAINT LOUIS'.
+    Arguments: city - city name.
+    """
+    words = re.sub(r'[^A-Z0-9 ]', ' ', city.upper()).split()
+    if words:
+        words[0] = CITY_ABBREVIATIONS.get(words[0], words[0])
+    return ' '.join(words)
+
+def city_keys(cities, states):
+    """
+    Returns the keys 'CITY|STATE' for looking up city and state; every distinct city name is
+    normalized only once.
+    Arguments: cities - series of city names, states - series of two-letter state codes.
+    """
+    cities = cities.astype('string')
+    names = {city: normalize_city_name(city) for city in cities.dropna().unique()}
+    # N-CEN writes states as 'US-NY'
+    states = states.astype('string').str.strip().str.upper().str.replace(r'^US-', '', regex=True)
+    return cities.map(names).astype('string') + '|' + states
+
+def load_gazetteer(gazetteer_path, columns=GAZETTEER_COLUMNS):
+    """
+    Loads the gazetteer into two indexed tables with the columns lat and lon: one by five-digit
+    ZIP code and one by city and state ('CITY|STATE', the center of its ZIP codes).
+    Arguments: gazetteer_path - path of the gazetteer, columns - its columns (see GAZETTEER_COLUMNS).
+    """
+    places = pd.read_csv(gazetteer_path, sep='\t', header=None, names=columns, dtype=str,
+                         usecols=['zip', 'city', 'state', 'lat', 'lon'], keep_default_na=False)
+    places['lat'] = pd.to_numeric(places['lat'], errors='coerce')
+    places['lon'] = pd.to_numeric(places['lon'], errors='coerce')
+    places = places.dropna(subset=['lat', 'lon'])
+    places['zip'] = normalize_zip(places['zip'])
+    zips = places.dropna(subset=['zip']).drop_duplicates('zip').set_index('zip')[['lat', 'lon']]
+    places['key'] = city_keys(places['city'], places['state'])
+    cities = places.dropna(subset=['key']).groupby('key')[['lat', 'lon']].mean()
+    return zips, cities
+
+def geocode(zips, cities, zip_codes, city_names, states):
+    """
+    Returns lat, lon, and geo ('zip' or 'city', how the location was found; missing if it was
+    not) for every row, in the order of the rows.
+    Arguments: zips and cities - tables from load_gazetteer, zip_codes - series of ZIP codes,
+               city_names - series of city names, states - series of two-letter state codes.
+    """
+    keys = normalize_zip(zip_codes)
+    located = pd.DataFrame({'lat': keys.map(zips['lat']).astype(float).values,
+                            'lon': keys.map(zips['lon']).astype(float).values}, index=zip_codes.index)
+    located['geo'] = np.where(located['lat'].notna(), 'zip', None)
+
+    # city and state for the rows without a known ZIP code
+    missing = located['lat'].isna()
+    if missing.any():
+        keys = city_keys(city_names[missing], states[missing])
+        located.loc[missing, 'lat'] = keys.map(cities['lat']).astype(float).values
+        located.loc[missing, 'lon'] = keys.map(cities['lon']).astype(float).values
+        located.loc[missing & located['lat'].notna(), 'geo'] = 'city'
+    return located
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """
+    Returns the great-circle distances in kilometers (haversine formula) between two sets of
+    points, element by element; missing coordinates give missing distances.
+    Arguments: lat1, lon1, lat2, lon2 - arrays or series of coordinates in degrees.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def locate_registrants(registrants, zips, cities):
+    """
+    Adds reg_lat, reg_lon, and reg_geo to the registrant table.
+    Arguments: registrants - registrant table (REGISTRANT_HEADER), zips and cities - tables from
+               load_gazetteer.
+    """
+    located = geocode(zips, cities, registrants['reg_zip'], registrants['reg_city'], registrants['reg_state'])
+    return registrants.assign(reg_lat=located['lat'], reg_lon=located['lon'], reg_geo=located['geo'])
+
+def locate_links(links, registrants, zips, cities):
+    """
+    Adds the coordinates of adviser (adv_lat, adv_lon, adv_geo) and registrant (reg_lat, reg_lon,
+    reg_geo) and their distance (distance_km) to the linked adviser table. The adviser is located
+    by the panel address if it was linked, otherwise by the address in the filing.
+    Arguments: links - linked table of the link code (LINK_HEADER), registrants - registrant
+               table from locate_registrants, zips and cities - tables from load_gazetteer.
+    """
+    located = geocode(zips, cities, links['zip'].fillna(links['adv_zip']),
+                      links['city'].fillna(links['adv_city']), links['state'].fillna(links['adv_state']))
+    links = links.assign(adv_lat=located['lat'], adv_lon=located['lon'], adv_geo=located['geo'])
+    registrants = registrants[['file_name', 'reg_lat', 'reg_lon', 'reg_geo']].drop_duplicates('file_name')
+    links = links.merge(registrants, on='file_name', how='left')
+    links['distance_km'] = distance_km(links['reg_lat'], links['reg_lon'], links['adv_lat'], links['adv_lon'])
+    return links
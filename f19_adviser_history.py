@@ -0,0 +1,146 @@
+'''
+File: f19_adviser_history.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 12:14:37 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 12:14:37 am
+-----
+Description: Functions for keeping the adviser panel as a history of validity intervals: every
+             CRD number has one row per stretch of consecutive months in which its SEC number,
+             name, and address stay the same (valid_from to valid_to, both included, as 'YY-MM').
+             Months are added one after the other, so the history is updated incrementally, and
+             the row valid in a month is looked up by CRD or SEC number.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import bisect                       # Sorted lookups
+import pandas as pd
+from f10_link_advisers import normalize_crd, normalize_sec    # selfmade functions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# information of an adviser that opens a new interval when it changes
+HISTORY_FIELDS = ['sec', 'name', 'city', 'state', 'zip']
+HISTORY_COLUMNS = ['crd'] + HISTORY_FIELDS + ['valid_from', 'valid_to']
+
+# normalization of the keys of lookups
+KEY_NORMALIZERS = {'crd': normalize_crd, 'sec': normalize_sec}
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def load_history(history_path):
+    """
+    Loads the history, empty if there is none.
+    Arguments: history_path - path of the csv file.
+    """
+    if not os.path.exists(history_path):
+        return pd.DataFrame(columns=HISTORY_COLUMNS, dtype=object)
+    # all values are read as strings; ZIP codes like '02110' stay unchanged
+    return pd.read_csv(history_path, dtype=str)[HISTORY_COLUMNS]
+
+def save_history(history, history_path):
+    """
+    Writes the history sorted by CRD number and month.
+    Arguments: history - history table (HISTORY_COLUMNS), history_path - path of the csv file.
+    """
+    history = history.sort_values(['crd', 'valid_from'], kind='stable')
+    history.to_csv(history_path + '.part', index=False)
+    os.replace(history_path + '.part', history_path)
+
+def last_month(history):
+    """
+    Returns the last month added to the history ('YY-MM'), None if it is empty.
+    Arguments: history - history table.
+    """
+    return None if history.empty else history['valid_to'].max()
+
+def add_month(history, panel, year_month):
+    """
+    Adds the advisers of a month to the history and returns it. An adviser that is unchanged
+    since the last month extends its interval, every other adviser opens a new one. Advisers
+    missing in a month end their interval; if they return, they start a new one.
+    Arguments: history - history table, panel - advisers of the month (columns crd, sec, name,
+               city, state, zip; if a CRD number appears twice, the last row counts),
+               year_month - string, e.g., '20-07', later than all months of the history.
+    """
+    # 'YY-MM' strings sort like the months
+    last = last_month(history)
+    if last is not None and year_month <= last:
+        raise ValueError(f'Month {year_month} is not after the last month of the history ({last}).')
+
+    panel = panel[['crd'] + HISTORY_FIELDS].copy()
+    panel['crd'] = panel['crd'].map(normalize_crd)
+    panel[HISTORY_FIELDS] = panel[HISTORY_FIELDS].astype('string')
+    panel = panel.dropna(subset=['crd']).drop_duplicates('crd', keep='last')
+
+    # only the intervals that reach the last month can be extended
+    current = history['valid_to'] == last
+    previous = history.loc[current, ['crd'] + HISTORY_FIELDS].set_index('crd')
+    new = panel.set_index('crd')
+    common = new.index.intersection(previous.index)
+    unchanged = (new.loc[common].fillna('') == previous.loc[common].fillna('')).all(axis=1)
+    unchanged = pd.Index(unchanged.index[unchanged.values])
+
+    history = history.copy()
+    extended = history.index[current][unchanged.get_indexer(previous.index) >= 0]
+    history.loc[extended, 'valid_to'] = year_month
+    opened = panel[unchanged.get_indexer(panel['crd']) < 0].assign(valid_from=year_month, valid_to=year_month)
+    return pd.concat([history, opened], ignore_index=True)[HISTORY_COLUMNS]
+
+def history_asof(history, values, year_months, key='crd'):
+    """
+    Returns the history rows valid in the given months for many lookups at once, one row per
+    lookup in its order (empty if none is valid). An SEC number held by several advisers in the
+    same month gives the adviser with the latest interval.
+    Arguments: history - history table, values - series of CRD or SEC numbers,
+               year_months - series of months ('YY-MM'), key - 'crd' or 'sec'.
+    """
+    normalize = KEY_NORMALIZERS[key]
+    left = pd.DataFrame({'key': pd.Series(values).map(normalize).values,
+                         'month': pd.Series(year_months).values})
+    right = history.assign(key=history[key].map(normalize))
+    matched = left.reset_index().merge(right.dropna(subset=['key']), on='key')
+    matched = matched[(matched['valid_from'] <= matched['month']) & (matched['month'] <= matched['valid_to'])]
+    matched = matched.sort_values('valid_from', kind='stable').drop_duplicates('index', keep='last')
+    return matched.set_index('index')[HISTORY_COLUMNS].reindex(left.index)
+
+def history_index(history, key='crd'):
+    """
+    Returns an index for single lookups with history_lookup: normalized key -> (start months,
+    rows), both sorted by start month.
+    Arguments: history - history table, key - 'crd' or 'sec'.
+    """
+    normalize = KEY_NORMALIZERS[key]
+    index = {}
+    rows = history.sort_values('valid_from', kind='stable')
+    for row in rows[HISTORY_COLUMNS].itertuples(index=False):
+        value = normalize(getattr(row, key))
+        if value is not None:
+            starts, entries = index.setdefault(value, ([], []))
+            starts.append(row.valid_from)
+            entries.append(row)
+    return index
+
+def history_lookup(index, value, year_month, key='crd'):
+    """
+    Returns the history row (named tuple) of an adviser valid in a month, None if there is none.
+    Arguments: index - index from history_index, value - CRD or SEC number,
+               year_month - month ('YY-MM'), key - key of the index ('crd' or 'sec').
+    """
+    starts, entries = index.get(KEY_NORMALIZERS[key](value), ([], []))
+    # intervals of a CRD number never overlap; of an SEC number, the latest one is tried first
+    for i in reversed(range(bisect.bisect_right(starts, year_month))):
+        if year_month <= entries[i].valid_to:
+            return entries[i]
+        if key == 'crd':
+            break
+    return None
@@ -9,60 +9,264 @@ Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
 Last Modified: Wednesday, 22nd September 2021 9:53:03 pm
 -----
 Description: Functions for parsing and preprocessing of downloaded N-SAR and N-CEN filings.
+             The filings are parsed as bytes (e.g., a memory map of the file); only the extracted
+             values are decoded.
 '''
 # =================================================================================================
 # PACKAGES
 # =================================================================================================
 import re                           # Regular Expressions
+from xml.parsers import expat       # Incremental XML parsing
+
+
+# =================================================================================================
+# OUTPUT TABLES
+# =================================================================================================
+# headers of the parsed tables; the tables can be merged on cik-fdate-fund_id
+# adviser info is in long format, i.e., 'adviser_info' specifies the information contained in 'value'
+REGISTRANT_HEADER = ['file_name', 'cik', 'fdate', 'rdate', 'ftype', 'accession', 'reg_name',
+                     'reg_state', 'reg_zip', 'reg_city']
+FUND_HEADER = ['file_name', 'cik', 'fdate', 'fund_id', 'fund']
+ADVISER_HEADER = ['file_name', 'cik', 'fdate', 'fund_id', 'adviser_id', 'adviser_info', 'value']
+
+# tags that end the header of a filing; everything the registrant table needs comes before them
+HEADER_END = (b'</SEC-HEADER>', b'</IMS-HEADER>', b'<DOCUMENT>')
+
+# registrant information in the header and the label it gets in the registrant table
+HEADER_FIELDS = {
+    'ftype':     re.compile(rb'(?sm)CONFORMED SUBMISSION TYPE:\s+(.*?)\s*$'),
+    'accession': re.compile(rb'(?sm)ACCESSION NUMBER:\s+(\S+)\s*$'),
+    'cik':       re.compile(rb'(?sm)CENTRAL INDEX KEY:\s+(\d+)\s*$'),
+    'fdate':     re.compile(rb'(?sm)FILED AS OF DATE:\s+(\d+)\s*$'),
+    'rdate':     re.compile(rb'(?sm)CONFORMED PERIOD OF REPORT:\s+(\d+)\s*$'),
+    'reg_name':  re.compile(rb'(?sm)COMPANY CONFORMED NAME:\s+(.*?)\s*$'),
+    'reg_state': re.compile(rb'(?sm)STATE:\s+(\S+)\s*$'),
+    'reg_zip':   re.compile(rb'(?sm)ZIP:\s+(\S+)\s*$'),
+    'reg_city':  re.compile(rb'(?sm)CITY:\s+(.*?)\s*$'),
+}
+
+# encodings tried for the extracted values; legacy filings are often not utf-8
+VALUE_ENCODINGS = ('utf-8', 'cp1252')
+
+# version of the parser; increase it whenever a change alters the output rows, so that the parse
+# cache (see f7_parse_cache.py) parses all filings again
+PARSER_VERSION = '4'
+
+
+# =================================================================================================
+# NSAR ITEMS
+# =================================================================================================
+# all fund (007 C02) and adviser (008 A00, B00, D01-D03) lines of a body in a single scan
+# matches: (fund ID, fund name, '', '', '', '') or ('', '', item, fund id, adviser id, adviser info)
+NSAR_ITEMS = re.compile(rb'(?m)\n(?:007 C02(\d\d+)00[^\S\n]*(.*?)[^\S\n]*$'
+                        rb'|008 (A00|B00|D0[123])(\S+)(\d\d)(?=\s)[^\S\n]*(.*?)[^\S\n]*$)')
+
+# the original per-item patterns; an empty value makes them continue on the next line,
+# which the single scan above does not reproduce, so such bodies fall back to these
+NSAR_FUND = rb'(?sm)^007 C02(\d\d+)00\s*(.*?)\s*$'
+NSAR_ADVISER = rb'(?sm)^008 %b(\S+)(\d\d)\s+(.*?)\s*$'
+
+# adviser items and the label they get in the long adviser table (in output order)
+NSAR_ADVISER_ITEMS = {
+    b'A00': 'adv_name',
+    b'B00': 'adv_subadvisor', # sub-adviser or adviser (A/S)
+    b'D01': 'adv_city',
+    b'D02': 'adv_state',
+    b'D03': 'adv_zip',
+}
+
+
+# =================================================================================================
+# N-CEN ELEMENTS
+# =================================================================================================
+# closing tag of a fund block
+NCEN_FUND_END = b'</managementInvestmentQuestion>'
+
+# adviser records inside a fund block and whether they are advisers or sub-advisers (A/S)
+NCEN_ADVISER_TYPES = {
+    'investmentAdviser': 'A',
+    'subAdviser': 'S',
+}
+
+# elements and attributes of an adviser record and the label they get in the long adviser table
+NCEN_ADVISER_TAGS = {
+    'investmentAdviserName': 'adv_name',
+    'investmentAdviserFileNo': 'adv_sec',
+    'investmentAdviserCrdNo': 'adv_crd',
+    'subAdviserName': 'adv_name',
+    'subAdviserFileNo': 'adv_sec',
+    'subAdviserCrdNo': 'adv_crd',
+}
+NCEN_ADVISER_ATTRIBUTES = {
+    'investmentAdviserState': 'adv_state',
+    'subAdviserState': 'adv_state',
+}
+
+# adviser information in output order
+NCEN_ADVISER_FIELDS = ['adv_name', 'adv_sec', 'adv_crd', 'adv_state', 'adv_subadvisor']
 
 
 # =================================================================================================
 # FUNCTIONS
 # =================================================================================================
-def safe_findall(text, fmt):
+def decode_value(value):
+    """
+    Decodes a value extracted from a filing; utf-8 if possible, otherwise the first encoding of
+    VALUE_ENCODINGS that fits, and latin-1 (which always fits) as last resort.
+    Arguments: value - bytes of the value.
+    """
+    for encoding in VALUE_ENCODINGS:
+        try:
+            return value.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return value.decode('latin-1')
+
+def decode_rows(rows):
+    """
+    Decodes rows of extracted values (tuples of bytes) like decode_value, but with a single
+    decode of all values if they are utf-8, which is much faster than decoding them one by one.
+    Arguments: rows - list of tuples of bytes with the same length.
     """
-    Safe wrapper for re.findall that ensures the code keeps running when nothing found.
-    Arguments: text - string to be searched, fmt - regular expression.
+    if not rows:
+        return []
+    width = len(rows[0])
+    values = [value for row in rows for value in row]
+    try:
+        decoded = b'\x1f'.join(values).decode('utf-8').split('\x1f')
+    except UnicodeDecodeError:
+        decoded = None
+    # the separator could be part of a value
+    if decoded is None or len(decoded) != len(values):
+        decoded = [decode_value(value) for value in values]
+    return [decoded[i:i+width] for i in range(0, len(decoded), width)]
+
+def find_value(text, pattern):
+    """
+    Returns the decoded first group of the first match of a bytes pattern, or '' if there is none.
+    Arguments: text - bytes to be searched, pattern - compiled regular expression.
     """
-    out = re.findall(fmt, text)
-    if len(out) == 0:
-        out = [""]
-    return out
+    match = pattern.search(text)
+    return decode_value(match.group(1)) if match else ''
 
-def parse_file(file_name, data):
+def parse_file(file_name, data, errors=None):
     """
     This function identifies the filing type and redirects to the correct parsing method.
-    Arguments: data - string file containing complete SEC filing.
+    Arguments: data - bytes (or memory map) of the complete SEC filing, errors - optional list;
+               problems that only cost part of the filing (e.g., broken N-CEN XML) are appended.
     """
-    # extract filing type
-    ftype = safe_findall(data, r'(?sm)CONFORMED SUBMISSION TYPE:\s+(.*?)\s*$')[0]
+    # extract filing type; it is part of the header, so the exhibits are not searched
+    ftype = find_value(data[:header_end(data)], HEADER_FIELDS['ftype'])
     # redirect to relevant parsing function
     if ftype.startswith("N-CEN"):
-        return parse_ncen_file(file_name, data)
+        return parse_ncen_file(file_name, data, errors)
     if ftype.startswith("NSAR"):
         return parse_nsar_file(file_name, data)
     return None
 
+def split_documents(data):
+    """
+    Splits a filing into the bodies enclosed by <DOCUMENT> tags, same as
+    re.findall(rb'(?s)<DOCUMENT>(.*?)</DOCUMENT>') but without running the regex engine.
+    Arguments: data - bytes (or memory map) of the complete SEC filing.
+    """
+    bodies = []
+    pos = data.find(b'<DOCUMENT>')
+    while pos != -1:
+        end = data.find(b'</DOCUMENT>', pos+10)
+        if end == -1:
+            break
+        bodies.append(data[pos+10:end])
+        pos = data.find(b'<DOCUMENT>', end+11)
+    # keep the behavior of the regular expression, i.e., a single empty body when nothing found
+    if not bodies:
+        bodies = [b'']
+    return bodies
+
+def split_header(data):
+    """
+    Returns the <SEC-HEADER> (or <IMS-HEADER>) block of a filing, same as
+    re.findall(rb'(?s)<(?:SEC|IMS)-HEADER>(.*)</(?:SEC|IMS)-HEADER>') but without the greedy scan.
+    Arguments: data - bytes (or memory map) of the complete SEC filing.
+    """
+    starts = [e for e in (data.find(b'<SEC-HEADER>'), data.find(b'<IMS-HEADER>')) if e != -1]
+    if not starts:
+        return b""
+    start = min(starts) + 12
+    end = max(data.rfind(b'</SEC-HEADER>'), data.rfind(b'</IMS-HEADER>'))
+    if end < start:
+        return b""
+    return data[start:end]
+
+def header_end(data):
+    """
+    Returns the position where the header of a filing ends at the latest: the first <DOCUMENT>
+    tag or, without documents, the end of the filing.
+    Arguments: data - bytes of the complete SEC filing (or its beginning).
+    """
+    end = data.find(b'<DOCUMENT>')
+    return len(data) if end == -1 else end
+
+def parse_header(file_name, header):
+    """
+    Extracts the registrant information from the header block of a filing; only the values
+    are decoded.
+    Arguments: file_name - name of the filing, header - bytes returned by split_header.
+    """
+    values = {label: find_value(header, pattern) for label, pattern in HEADER_FIELDS.items()}
+    return [file_name] + [values[label] for label in REGISTRANT_HEADER[1:]]
+
+def parse_registrant(file_name, head):
+    """
+    Extracts only the registrant information of an N-SAR or N-CEN filing from its beginning, e.g.,
+    as read by f2_parse_years.read_header; the bodies are never needed. Returns None for other
+    filing types, like parse_file.
+    Arguments: file_name - name of the filing, head - bytes with (at least) the header of the filing.
+    """
+    registrant_info = parse_header(file_name, split_header(head))
+    if registrant_info[4].startswith(("N-CEN", "NSAR")):
+        return registrant_info
+    return None
+
+def tokenize_nsar_body(body):
+    """
+    Walks an NSAR body once and routes every fund and adviser line into its record list.
+    Returns the same matches (as bytes) as separate re.findall calls for each item would.
+    Arguments: body - bytes of a single <DOCUMENT> of an NSAR filing.
+    """
+    funds = []
+    advisers = {item: [] for item in NSAR_ADVISER_ITEMS}
+
+    # the scan only sees lines after a line break, so check the very first line separately
+    quirks = body.startswith((b'007 C02', b'008 '))
+    for fund_id, fund_name, item, cur_fund_id, cur_adviser_id, cur_value in NSAR_ITEMS.findall(body):
+        if item:
+            quirks = quirks or cur_value == b''
+            advisers[item].append((cur_fund_id, cur_adviser_id, cur_value))
+        else:
+            quirks = quirks or fund_name == b''
+            funds.append((fund_id, fund_name))
+
+    # rare case: an item without value on its line; use the per-item regular expressions
+    if quirks:
+        funds = re.findall(NSAR_FUND, body)
+        advisers = {item: re.findall(NSAR_ADVISER % item, body) for item in NSAR_ADVISER_ITEMS}
+
+    return funds, advisers
+
 def parse_nsar_file(file_name, data):
     """
     This function extracts general information, funds, and advisers from NSAR filings.
-    Arguments: data - string file containing complete SEC filing.
+    Arguments: data - bytes (or memory map) of the complete SEC filing.
     """
     # first separate header and bodies in html format
-    header = safe_findall(data, r'(?s)<(?:SEC|IMS)-HEADER>(.*)</(?:SEC|IMS)-HEADER>')[0]
+    header = split_header(data)
     # note: there may be multiple bodies, when the filing includes additional exhibits
-    bodies = safe_findall(data, r'(?s)<DOCUMENT>(.*?)</DOCUMENT>')
-
-    # extract values we care about from header:
-    ftype       = safe_findall(header, r'(?sm)CONFORMED SUBMISSION TYPE:\s+(.*?)\s*$')[0]
-    accession   = safe_findall(header, r'(?sm)ACCESSION NUMBER:\s+(\S+)\s*$')[0]
-    cik         = safe_findall(header, r'(?sm)CENTRAL INDEX KEY:\s+(\d+)\s*$')[0]
-    fdate       = safe_findall(header, r'(?sm)FILED AS OF DATE:\s+(\d+)\s*$')[0]
-    rdate       = safe_findall(header, r'(?sm)CONFORMED PERIOD OF REPORT:\s+(\d+)\s*$')[0]
-    reg_name    = safe_findall(header, r'(?sm)COMPANY CONFORMED NAME:\s+(.*?)\s*$')[0]
-    reg_state   = safe_findall(header, r'(?sm)STATE:\s+(\S+)\s*$')[0]
-    reg_zip     = safe_findall(header, r'(?sm)ZIP:\s+(\S+)\s*$')[0]
-    reg_city    = safe_findall(header, r'(?sm)CITY:\s+(.*?)\s*$')[0]
+    bodies = split_documents(data)
+
+    # extract values we care about from header
+    registrant_info = parse_header(file_name, header)
+    cik, fdate = registrant_info[1], registrant_info[2]
 
     # will be filled in loop
     adviser_info = []
@@ -71,116 +275,168 @@ def parse_nsar_file(file_name, data):
     # loop through bodies
     for body in bodies:
         # sequence of current body
-        sequence = safe_findall(body, r'(?sm)<SEQUENCE>(.*?)$')[0]
+        start = body.find(b'<SEQUENCE>')
+        if start == -1:
+            sequence = ''
+        else:
+            end = body.find(b'\n', start)
+            sequence = decode_value(body[start+10:] if end == -1 else body[start+10:end])
+            # line breaks may be \r\n, the bytes are not translated like a text file
+            sequence = sequence[:-1] if sequence.endswith('\r') else sequence
+
+        # walk the body once and sort the relevant items into funds and advisers
+        funds, advisers = tokenize_nsar_body(body)
 
         # funds; each fund has an ID, which will be used to match advisers
         # if there are no funds in the reporting, adviser info defaults to fund ID '01'
-        # matches: (fund ID, fund name)
-        funds = safe_findall(body, r'(?sm)^007 C02(\d\d+)00\s*(.*?)\s*$')
-        if funds == ['']:
-            funds = [['01', '']]
+        if not funds:
+            funds = [(b'01', b'')]
 
         # add sequence identifier to current fund number as it is only unique within a sequence
-        funds = [(f'{f[0]}-S{sequence}', f[1]) for f in funds]
-
-        # adviser information
-        # reported for each fund, thus, keep track of fund ID
-        # also need to keep track of adviser id to match all characteristics
-        # matches: (fund id, adviser id, adviser info)
-        adviser_names       = safe_findall(body, r'(?sm)^008 A00(\S+)(\d\d)\s+(.*?)\s*$')
-        adviser_subadvisor  = safe_findall(body, r'(?sm)^008 B00(\S+)(\d\d)\s+(.*?)\s*$') # sub-adviser or adviser (A/S)
-        adviser_cities      = safe_findall(body, r'(?sm)^008 D01(\S+)(\d\d)\s+(.*?)\s*$')
-        adviser_states      = safe_findall(body, r'(?sm)^008 D02(\S+)(\d\d)\s+(.*?)\s*$')
-        adviser_zips        = safe_findall(body, r'(?sm)^008 D03(\S+)(\d\d)\s+(.*?)\s*$')
-
-        # combine adviser info
-        advisers = [adviser_names, adviser_subadvisor, adviser_cities, adviser_states, adviser_zips]
-        advisers = zip(advisers, ['adv_name', 'adv_subadvisor', 'adv_city', 'adv_state', 'adv_zip'])
-        for info, name in advisers:
-            if info != ['']:
-                for cur_fund_id, cur_adviser_id, cur_value in info:
-                    adviser_info += [[file_name, cik, fdate, f'{cur_fund_id}-S{sequence}',
-                                      cur_adviser_id, name, cur_value]]
-
-        # combine fund info
-        fund_info += [[file_name, cik, fdate]+list(e) for e in funds if e != ['']]
-
-    # combine registrant info
-    registrant_info = [file_name, cik, fdate, rdate, ftype, accession, reg_name,
-                       reg_state, reg_zip, reg_city]
+        fund_info += [[file_name, cik, fdate, f'{f[0]}-S{sequence}', f[1]] for f in decode_rows(funds)]
+
+        # combine adviser info; keeps the order (adv_name, adv_subadvisor, adv_city, ...)
+        for item, name in NSAR_ADVISER_ITEMS.items():
+            for cur_fund_id, cur_adviser_id, cur_value in decode_rows(advisers[item]):
+                adviser_info += [[file_name, cik, fdate, f'{cur_fund_id}-S{sequence}',
+                                  cur_adviser_id, name, cur_value]]
 
     return registrant_info, fund_info, adviser_info
 
-def parse_ncen_file(file_name, data):
+def iter_ncen_funds(data, chunk_size=65536, errors=None):
+    """
+    Streams the XML document of an N-CEN filing through an expat parser and yields one
+    (fund name, advisers) tuple per <managementInvestmentQuestion>. Advisers are dicts with the
+    fields of NCEN_ADVISER_FIELDS, investment advisers first and sub-advisers second. No element
+    tree is built, so memory does not grow with the number of series. If the XML is broken
+    (e.g., truncated or with an unescaped '&'), the funds completed before the error are kept,
+    the fund in progress is dropped, and the error is appended to errors.
+    Arguments: data - bytes (or memory map) of the complete SEC filing; expat decodes the XML
+               according to its declaration, chunk_size - bytes fed to the parser at once,
+               errors - optional list for the error message.
+    """
+    # the primary document is the first one and its XML is wrapped in <XML> tags
+    start = data.find(b'<XML>', max(data.find(b'<DOCUMENT>'), 0))
+    if start == -1:
+        return
+    end = data.find(b'</XML>', start)
+    if end == -1:
+        end = len(data)
+    # the XML declaration has to be the very first thing the parser sees
+    start += 5
+    while start < end and data[start:start+1].isspace():
+        start += 1
+
+    # finished funds, emptied after every chunk
+    funds = []
+    # current fund ([name, advisers, sub-advisers]), adviser, and text element
+    fund = adviser = field = None
+    text = []
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+
+    def close_fund():
+        nonlocal fund, adviser
+        if fund is not None:
+            funds.append((fund[0] or '', fund[1] + fund[2]))
+        fund = adviser = None
+
+    def start_element(name, attributes):
+        nonlocal fund, adviser, field, text
+        if ':' in name:
+            name = name.rpartition(':')[2]
+        if name == 'managementInvestmentQuestion':
+            close_fund()
+            fund = [None, [], []]
+        elif fund is None:
+            return
+        elif name in NCEN_ADVISER_TYPES:
+            adviser = dict.fromkeys(NCEN_ADVISER_FIELDS, '')
+            adviser['adv_subadvisor'] = NCEN_ADVISER_TYPES[name]
+            # closing tags are only needed within adviser records and text elements
+            parser.EndElementHandler = end_element
+        elif adviser is not None and name in NCEN_ADVISER_TAGS or name == 'mgmtInvFundName':
+            field = name
+            text = []
+            parser.CharacterDataHandler = text.append
+            parser.EndElementHandler = end_element
+        if adviser is not None and attributes:
+            for attribute, label in NCEN_ADVISER_ATTRIBUTES.items():
+                if attribute in attributes and adviser[label] == '':
+                    adviser[label] = attributes[attribute]
+
+    def end_element(name):
+        nonlocal adviser, field
+        if ':' in name:
+            name = name.rpartition(':')[2]
+        if name == field:
+            parser.CharacterDataHandler = None
+            field = None
+            if adviser is not None:
+                adviser[NCEN_ADVISER_TAGS[name]] = ''.join(text)
+            elif fund[0] is None:
+                # keep the first name if a fund reports several
+                fund[0] = ''.join(text)
+        elif name in NCEN_ADVISER_TYPES and adviser is not None:
+            fund[1 if adviser['adv_subadvisor'] == 'A' else 2].append(adviser)
+            adviser = None
+        if adviser is None and field is None:
+            parser.EndElementHandler = None
+
+    parser.StartElementHandler = start_element
+    pos = start
+    n_funds = 0
+    try:
+        while pos < end:
+            # cut chunks after closing fund tags, so that the fund is complete once the chunk is parsed
+            stop = data.find(NCEN_FUND_END, pos, min(pos+chunk_size+len(NCEN_FUND_END), end))
+            if stop == -1:
+                stop = min(pos+chunk_size, end)
+            else:
+                stop += len(NCEN_FUND_END)
+            parser.Parse(data[pos:stop], False)
+            if stop - pos >= len(NCEN_FUND_END) and data[stop-len(NCEN_FUND_END):stop] == NCEN_FUND_END:
+                close_fund()
+            pos = stop
+            n_funds += len(funds)
+            yield from funds
+            funds.clear()
+        parser.Parse(b'', True)
+    except expat.ExpatError as inst:
+        # funds closed before the error are complete; the one in progress may not be
+        fund = None
+        if errors is not None:
+            errors.append(f'ExpatError: {inst}; kept the first {n_funds + len(funds)} funds')
+    close_fund()
+    yield from funds
+
+def parse_ncen_file(file_name, data, errors=None):
     """
     This function extracts general information, funds, and advisers from N-CEN filings.
-    Arguments: data - string file containing complete SEC filing.
-    """
-    # first separate header and body in html format
-    header = safe_findall(data, r'(?s)<(?:SEC|IMS)-HEADER>(.*)</(?:SEC|IMS)-HEADER>')[0]
-    body = safe_findall(data, r'(?s)<DOCUMENT>(.*)')[0]
-
-    # now extract values we care about from header:
-    ftype       = safe_findall(header, r'(?sm)CONFORMED SUBMISSION TYPE:\s+(.*?)\s*$')[0]
-    accession   = safe_findall(header, r'(?sm)ACCESSION NUMBER:\s+(\S+)\s*$')[0]
-    cik         = safe_findall(header, r'(?sm)CENTRAL INDEX KEY:\s+(\d+)\s*$')[0]
-    fdate       = safe_findall(header, r'(?sm)FILED AS OF DATE:\s+(\d+)\s*$')[0]
-    rdate       = safe_findall(header, r'(?sm)CONFORMED PERIOD OF REPORT:\s+(\d+)\s*$')[0]
-    reg_name    = safe_findall(header, r'(?sm)COMPANY CONFORMED NAME:\s+(.*?)\s*$')[0]
-    reg_state   = safe_findall(header, r'(?sm)STATE:\s+(\S+)\s*$')[0]
-    reg_zip     = safe_findall(header, r'(?sm)ZIP:\s+(\S+)\s*$')[0]
-    reg_city    = safe_findall(header, r'(?sm)CITY:\s+(.*?)\s*$')[0]
-
-    # get fund information; advisers are part of the block
-    funds = safe_findall(body, r'(?s)<managementInvestmentQuestion>(.+?)</managementInvestmentQuestion>')
-    fund_names = [safe_findall(e, r'(?s)<mgmtInvFundName>(.+?)</mgmtInvFundName>')[0] for e in funds]
-
-    # get adviser information from the fund blocks
-    # note that each fund can have multiple advisers, so now we get a list of lists
-    advisers = [safe_findall(e, r'(?s)<investmentAdvisers>(.+?)</investmentAdvisers>')[0] for e in funds]
-    adviser_names = [safe_findall(e, r'(?s)<investmentAdviserName>(.+?)</investmentAdviserName>') for e in funds]
-    adviser_secs = [safe_findall(e, r'(?s)<investmentAdviserFileNo>(.+?)</investmentAdviserFileNo>') for e in funds]
-    adviser_crds = [safe_findall(e, r'(?s)<investmentAdviserCrdNo>(.+?)</investmentAdviserCrdNo>') for e in funds]
-    adviser_states = [safe_findall(e, r'(?s)investmentAdviserState="(.+?)"') for e in funds]
-
-    # do the same for subadvisers
-    subadvisers = [safe_findall(e, r'(?s)<subAdvisers>(.+?)</subAdvisers>')[0] for e in funds]
-    subadviser_names = [safe_findall(e, r'(?s)<subAdviserName>(.+?)</subAdviserName>') for e in funds]
-    subadviser_secs = [safe_findall(e, r'(?s)<subAdviserFileNo>(.+?)</subAdviserFileNo>') for e in funds]
-    subadviser_crds = [safe_findall(e, r'(?s)<subAdviserCrdNo>(.+?)</subAdviserCrdNo>') for e in funds]
-    subadviser_states = [safe_findall(e, r'(?s)subAdviserState="(.+?)"') for e in funds]
-
-    # flag subadvisers (use name here since this is always populated)
-    adviser_suba = [['A']*len(a)+['S']*len(s) for a, s in zip(adviser_names, subadviser_names)]
-
-    # combine them
-    adviser_names = [a+s for a, s in zip(adviser_names, subadviser_names)]
-    adviser_secs = [a+s for a, s in zip(adviser_secs, subadviser_secs)]
-    adviser_crds = [a+s for a, s in zip(adviser_crds, subadviser_crds)]
-    adviser_states = [a+s for a, s in zip(adviser_states, subadviser_states)]
-
-    # manually create fund IDs, as they are not automatically matched in the filing
-    fund_ids = list(range(0, len(funds)))
-
-    # combine adviser info
-    advisers = [adviser_names, adviser_secs, adviser_crds, adviser_states, adviser_suba]
-    advisers = zip(advisers, ['adv_name', 'adv_sec', 'adv_crd', 'adv_state', 'adv_subadvisor'])
-    adviser_info = []
-    for info, name in advisers:
-        # info is for all funds, so that's still a list of adviser lists
-        fund_id = 0
-        for sub_info in info:
-            # now we have all entries for the current fund
-            adviser_id = 0
-            for cur_value in sub_info:
+    Arguments: data - bytes (or memory map) of the complete SEC filing, errors - optional list
+               for broken XML, see iter_ncen_funds.
+    """
+    # first separate header in html format; the body is streamed below
+    header = split_header(data)
+
+    # now extract values we care about from header
+    registrant_info = parse_header(file_name, header)
+    cik, fdate = registrant_info[1], registrant_info[2]
+
+    # stream through the XML document; each fund comes with its advisers and sub-advisers
+    # fund IDs are created manually, as they are not automatically matched in the filing
+    fund_info = []
+    adviser_rows = {name: [] for name in NCEN_ADVISER_FIELDS}
+    for fund_id, (fund_name, advisers) in enumerate(iter_ncen_funds(data, errors=errors)):
+        fund_info += [[file_name, cik, fdate, fund_id, fund_name]]
+        for adviser_id, adviser in enumerate(advisers):
+            for name, cur_value in adviser.items():
                 # no need to add empty information (note: still incrementing adviser count)
                 if cur_value != '':
-                    adviser_info += [[file_name, cik, fdate, fund_id, adviser_id, name, cur_value]]
-                adviser_id += 1
-            fund_id += 1
+                    adviser_rows[name] += [[file_name, cik, fdate, fund_id, adviser_id, name, cur_value]]
 
-    # combine registrant and fund info
-    registrant_info = [file_name, cik, fdate, rdate, ftype, accession, reg_name, reg_state, reg_zip, reg_city]
-    fund_info = [[file_name, cik, fdate, f_id, f_name] for f_id, f_name in zip(fund_ids, fund_names)]
+    # combine adviser info; ordered by information, then fund, then adviser
+    adviser_info = [row for rows in adviser_rows.values() for row in rows]
 
     return registrant_info, fund_info, adviser_info
@@ -0,0 +1,591 @@
+'''
+File: f2_parse_years.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 10:12:41 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 10:12:41 am
+-----
+Description: Functions for parsing all downloaded filings of a year, either serially,
+             in a pool of worker processes that write to per-worker shards, or incrementally
+             with the parse cache (only new or changed filings are parsed). The registrant table
+             alone can be extracted from the headers of the filings without reading the bodies.
+             The yearly tables are combined by streaming them, with constant memory.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os               # Browse directories
+import csv              # CSV documents
+import heapq            # Merging sorted shards
+import time
+import shutil           # Copying files
+import sqlite3          # On-disk set of seen rows
+import hashlib          # Keys of seen rows
+import codecs           # Writing rows to a binary file
+import mmap             # Memory-mapped filings
+from contextlib import contextmanager
+from f1_parse_filing import (parse_file, parse_registrant, REGISTRANT_HEADER, FUND_HEADER, ADVISER_HEADER,
+                             HEADER_END)
+from f5_filing_store import load_index, read_filing, iter_filing_blocks
+from f7_parse_cache import content_hash, is_cached, store_result, load_result, output_is_current, record_output
+from f13_metrics import Metrics
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# output tables and their headers
+TABLES = {
+    'registrants': REGISTRANT_HEADER,
+    'funds': FUND_HEADER,
+    'advisers': ADVISER_HEADER,
+}
+
+# bytes read at once when only the header is needed, and the most that is read without
+# finding its end (headers of funds with thousands of series can be long)
+HEADER_BLOCK = 8192
+HEADER_LIMIT = 4 << 20
+
+# columns that identify a row when combined tables are de-duplicated
+DEDUP_KEYS = {
+    'registrants': ['file_name'],
+    'funds': ['file_name', 'fund_id'],
+    'advisers': ['file_name', 'fund_id', 'adviser_id', 'adviser_info'],
+}
+
+# bytes copied at once and rows per batch of the on-disk set when combining tables
+COPY_BUFFER = 1 << 20
+SEEN_BATCH = 10000
+# keys looked up in the on-disk set per query (below the SQLite limit of variables)
+SEEN_QUERY = 500
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+@contextmanager
+def open_filing(file_dir, year, file_name, storage):
+    """
+    Context manager that provides the bytes of the complete filing without decoding them: a
+    read-only memory map of the file, so the parser only touches the pages it scans, or the
+    decompressed bytes of a pack member. Nothing taken from the memory map may be used after
+    the with block, except for copies (slices are copies).
+    Arguments: file_dir - folder containing the yearly folders or packs of filings, year - string
+               year, file_name - name of the filing, storage - 'files' (one file per filing) or
+               'pack' (one compressed pack per year, see f5_filing_store.py).
+    """
+    if storage == 'pack':
+        yield read_filing(file_dir, year, file_name)
+        return
+    with open(os.path.join(file_dir, year, file_name), 'rb') as filing:
+        # empty files cannot be mapped
+        if os.fstat(filing.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(filing.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+def read_bytes(file_dir, year, file_name, storage):
+    """
+    Reads the complete filing as bytes, e.g., to compute its hash.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings, year - string
+               year, file_name - name of the filing, storage - 'files' or 'pack'.
+    """
+    if storage == 'pack':
+        return read_filing(file_dir, year, file_name)
+    with open(os.path.join(file_dir, year, file_name), 'rb') as filing:
+        return filing.read()
+
+def iter_blocks(file_dir, year, file_name, storage, block_size=HEADER_BLOCK):
+    """
+    Yields the bytes of a filing in blocks from its beginning.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings, year - string
+               year, file_name - name of the filing, storage - 'files' or 'pack',
+               block_size - bytes read at once.
+    """
+    if storage == 'pack':
+        yield from iter_filing_blocks(file_dir, year, file_name, block_size)
+        return
+    with open(os.path.join(file_dir, year, file_name), 'rb') as filing:
+        yield from iter(lambda: filing.read(block_size), b'')
+
+def read_header(file_dir, year, file_name, storage, limit=HEADER_LIMIT):
+    """
+    Reads a filing only up to the end of its header (see HEADER_END) and returns this beginning
+    as bytes. The exhibits of large filings are never read.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings, year - string
+               year, file_name - name of the filing, storage - 'files' or 'pack',
+               limit - most bytes read if the end of the header is not found.
+    """
+    longest = max(len(marker) for marker in HEADER_END)
+    head = bytearray()
+    for block in iter_blocks(file_dir, year, file_name, storage):
+        # only the new block (and what a marker can span) has to be searched
+        start = max(len(head) - longest, 0)
+        head += block
+        ends = [e for e in (head.find(marker, start) for marker in HEADER_END) if e != -1]
+        if ends:
+            end = min(ends)
+            del head[end + next(len(m) for m in HEADER_END if head.startswith(m, end)):]
+            break
+        if len(head) >= limit:
+            # do not cut a line in two
+            del head[head.rfind(b'\n')+1:]
+            break
+    return bytes(head)
+
+def list_filings(file_dir, year, storage):
+    """
+    Returns the names of all filings of a year; for packs in the order they are stored.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings,
+               year - string year, storage - 'files' or 'pack'.
+    """
+    if storage == 'pack':
+        return list(load_index(file_dir, year))
+    return os.listdir(os.path.join(file_dir, year))
+
+def record_filing(metrics, path, form_type, size, start, read, parsed):
+    """
+    Adds a parsed filing to the metrics: time for reading and for parsing (by form type),
+    number of files and bytes, and the slowest filings.
+    Arguments: metrics - Metrics (see f13_metrics.py), path - path of the filing, form_type - form
+               type, size - bytes, start, read, parsed - perf_counter before opening, after
+               opening, and after parsing.
+    """
+    metrics.time('open_filing', read - start)
+    metrics.time(f'parse_file[{form_type}]', parsed - read)
+    metrics.item(path, parsed - start, size)
+    metrics.count('files')
+    metrics.count('bytes_parsed', size)
+
+def parse_filings(file_dir, year, file_names, writers, storage='files', metrics=None):
+    """
+    Parses the given filings and writes the rows to the three csv writers.
+    Errors are collected and returned, so that a single bad filing does not stop the run; so are
+    the problems of filings that were parsed only in part (their rows are written).
+    Arguments: file_dir - folder containing the yearly folders or packs of filings, year - string
+               year, file_names - filings to be parsed, writers - csv writers for registrants,
+               funds, and advisers, storage - 'files' or 'pack', metrics - optional Metrics
+               (see f13_metrics.py) for files, bytes, time per function, and slowest filings.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    writer_registrants, writer_funds, writer_advisers = writers
+    errors = []
+    for file_name in file_names:
+
+        # full path to the current file
+        full_path = os.path.join(file_dir, year, file_name)
+
+        # try-except block to catch errors and keep the code running
+        try:
+            # map the complete filing into memory; it is parsed as bytes
+            start = time.perf_counter()
+            with open_filing(file_dir, year, file_name, storage) as data:
+                read = time.perf_counter()
+
+                # parse the file, extract everything we need
+                partial = []
+                result = parse_file(file_name, data, partial)
+                if result is None:
+                    raise ValueError('neither an N-SAR nor an N-CEN filing')
+                registrant_info, fund_info, adviser_info = result
+                record_filing(metrics, full_path, registrant_info[4], len(data), start, read,
+                              time.perf_counter())
+
+            # write lines
+            writer_registrants.writerow(registrant_info)
+            writer_funds.writerows(fund_info)
+            writer_advisers.writerows(adviser_info)
+            for problem in partial:
+                metrics.count('partial_filings')
+                errors.append(f'In parse_file: {full_path}, partial: {problem}')
+
+        except Exception as inst:
+            metrics.count(f'errors.{type(inst).__name__}')
+            errors.append(f'In parse_file: {full_path}, error: {str(inst)}')
+
+    return errors
+
+def parse_year(file_dir, output_dir, year, file_names=None, storage='files', metrics=None):
+    """
+    Parses all filings of a year in the current process and writes the yearly csv files.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings,
+               output_dir - folder for the csv files, year - string name of the yearly folder,
+               file_names - filings to be parsed (default: all filings of the year),
+               storage - 'files' or 'pack', metrics - optional Metrics, errors are written to it.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if file_names is None:
+        file_names = list_filings(file_dir, year, storage)
+    elif storage == 'pack':
+        # read the pack sequentially
+        index = load_index(file_dir, year)
+        file_names = sorted(file_names, key=lambda f: index.get(f, (-1, 0)))
+
+    # create empty CSV files with headers, these will be filled
+    csv_files = [open(os.path.join(output_dir, f'nsar_{table}_{year}.csv'), 'w', newline='',
+                      encoding='utf-8') for table in TABLES]
+    writers = [csv.writer(f) for f in csv_files]
+    for writer, header in zip(writers, TABLES.values()):
+        writer.writerow(header)
+
+    # loop over all SEC filings
+    errors = parse_filings(file_dir, year, file_names, writers, storage, metrics)
+    for error in errors:
+        print(error)
+        metrics.write('error', message=error)
+
+    # we are done, close files
+    for f in csv_files:
+        f.close()
+
+def parse_registrants(file_dir, output_dir, year, file_names=None, storage='files', metrics=None):
+    """
+    Extracts only the registrant table of a year from the headers of the filings and writes
+    nsar_registrants_<year>.csv; every filing is read only up to the end of its header. The rows
+    are the same as with parse_year, except for filings whose body cannot be parsed, which are
+    missing there.
+    Arguments: file_dir - folder containing the yearly folders or packs of filings,
+               output_dir - folder for the csv file, year - string name of the yearly folder,
+               file_names - filings to be parsed (default: all filings of the year),
+               storage - 'files' or 'pack', metrics - optional Metrics, errors are written to it.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if file_names is None:
+        file_names = list_filings(file_dir, year, storage)
+    elif storage == 'pack':
+        # read the pack sequentially
+        index = load_index(file_dir, year)
+        file_names = sorted(file_names, key=lambda f: index.get(f, (-1, 0)))
+
+    with open(os.path.join(output_dir, f'nsar_registrants_{year}.csv'), 'w', newline='',
+              encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(REGISTRANT_HEADER)
+        for file_name in file_names:
+            full_path = os.path.join(file_dir, year, file_name)
+            # try-except block to catch errors and keep the code running
+            try:
+                start = time.perf_counter()
+                head = read_header(file_dir, year, file_name, storage)
+                read = time.perf_counter()
+                registrant_info = parse_registrant(file_name, head)
+                if registrant_info is None:
+                    raise ValueError('neither an N-SAR nor an N-CEN filing')
+                metrics.time('read_header', read - start)
+                metrics.time('parse_registrant', time.perf_counter() - read)
+                metrics.count('files')
+                metrics.count('bytes_parsed', len(head))
+                writer.writerow(registrant_info)
+            except Exception as inst:
+                metrics.count(f'errors.{type(inst).__name__}')
+                error = f'In parse_registrant: {full_path}, error: {str(inst)}'
+                print(error)
+                metrics.write('error', message=error)
+
+def shard_name(table, year, worker):
+    """
+    Returns the file name of a worker's shard of a yearly table.
+    Arguments: table - name of the table, year - string year, worker - worker identifier.
+    """
+    return f'nsar_{table}_{year}.{worker}.part'
+
+def list_shards(output_dir, table, year):
+    """
+    Returns the file names of all worker shards of a yearly table.
+    Arguments: output_dir - folder for the csv files, table - name of the table, year - string year.
+    """
+    prefix = f'nsar_{table}_{year}.'
+    return [f for f in os.listdir(output_dir) if f.startswith(prefix) and f.endswith('.part')]
+
+def parse_chunk(task):
+    """
+    Worker function: parses a chunk of filings and appends the rows to the shards of the
+    current worker process. Returns the error messages and the metrics of the chunk.
+    Arguments: task - tuple (file_dir, output_dir, year, file_names, storage).
+    """
+    file_dir, output_dir, year, file_names, storage = task
+    csv_files = [open(os.path.join(output_dir, shard_name(table, year, os.getpid())), 'a', newline='',
+                      encoding='utf-8') for table in TABLES]
+    metrics = Metrics()
+    try:
+        errors = parse_filings(file_dir, year, file_names, [csv.writer(f) for f in csv_files], storage,
+                               metrics)
+        return errors, metrics.snapshot()
+    finally:
+        for f in csv_files:
+            f.close()
+
+def merge_shards(output_dir, year):
+    """
+    Merges the worker shards of a year into the yearly csv files and deletes the shards.
+    Every shard is sorted by file name, so the merged tables are sorted by file name as well;
+    rows of the same filing keep the order in which the parser returned them.
+    Arguments: output_dir - folder for the csv files, year - string name of the yearly folder.
+    """
+    for table, header in TABLES.items():
+        shards = list_shards(output_dir, table, year)
+        shard_files = [open(os.path.join(output_dir, f), 'r', newline='', encoding='utf-8') for f in shards]
+
+        with open(os.path.join(output_dir, f'nsar_{table}_{year}.csv'), 'w', newline='',
+                  encoding='utf-8') as csv_table:
+            writer = csv.writer(csv_table)
+            writer.writerow(header)
+            writer.writerows(heapq.merge(*[csv.reader(f) for f in shard_files], key=lambda row: row[0]))
+
+        for f, name in zip(shard_files, shards):
+            f.close()
+            os.remove(os.path.join(output_dir, name))
+
+def parse_year_parallel(pool, file_dir, output_dir, year, chunk_size, file_names=None, storage='files',
+                        metrics=None):
+    """
+    Parses all filings of a year in a pool of worker processes and writes the yearly csv files.
+    The tables contain the same rows as with parse_year; rows are sorted by file name instead of
+    the directory order, i.e., sort both by 'file_name' (stable) to compare them.
+    Arguments: pool - multiprocessing pool, file_dir - folder containing the yearly folders or
+               packs of filings, output_dir - folder for the csv files, year - string name of the
+               yearly folder, chunk_size - number of filings handed to a worker at once,
+               file_names - filings to be parsed (default: all filings of the year),
+               storage - 'files' or 'pack', metrics - optional Metrics; the metrics of the
+               workers are added to it.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if file_names is None:
+        file_names = list_filings(file_dir, year, storage)
+
+    # remove shards of an aborted run
+    for table in TABLES:
+        for f in list_shards(output_dir, table, year):
+            os.remove(os.path.join(output_dir, f))
+
+    # hand out the filings in sorted chunks; the pool's task queue is FIFO, so every worker
+    # receives its chunks in increasing order and its shards stay sorted by file name
+    file_names = sorted(file_names)
+    tasks = [(file_dir, output_dir, year, file_names[i:i+chunk_size], storage)
+             for i in range(0, len(file_names), chunk_size)]
+    for errors, snapshot in pool.imap_unordered(parse_chunk, tasks):
+        metrics.merge(snapshot)
+        for error in errors:
+            print(error)
+            metrics.write('error', message=error)
+
+    merge_shards(output_dir, year)
+
+def parse_results(task):
+    """
+    Worker function: parses a chunk of filings and returns (file name, result, error message)
+    for each of them; result is the tuple returned by parse_file or None if parsing failed, a
+    filing parsed only in part has both.
+    Also returns the metrics of the chunk.
+    Arguments: task - tuple (file_dir, year, file_names, storage).
+    """
+    file_dir, year, file_names, storage = task
+    metrics = Metrics()
+    results = []
+    for file_name in file_names:
+        # try-except block to catch errors and keep the code running
+        try:
+            start = time.perf_counter()
+            with open_filing(file_dir, year, file_name, storage) as data:
+                read = time.perf_counter()
+                partial = []
+                result = parse_file(file_name, data, partial)
+                if result is None:
+                    raise ValueError('neither an N-SAR nor an N-CEN filing')
+                registrant_info, fund_info, adviser_info = result
+                record_filing(metrics, os.path.join(file_dir, year, file_name), registrant_info[4],
+                              len(data), start, read, time.perf_counter())
+            metrics.count('partial_filings', len(partial))
+            results.append((file_name, (registrant_info, fund_info, adviser_info), '; '.join(partial) or None))
+        except Exception as inst:
+            metrics.count(f'errors.{type(inst).__name__}')
+            results.append((file_name, None, str(inst)))
+    return results, metrics.snapshot()
+
+def parse_year_incremental(cache, file_dir, output_dir, year, file_names=None, hashes=None,
+                           storage='files', pool=None, chunk_size=200, metrics=None):
+    """
+    Parses only the filings of a year that are not in the parse cache yet (new filings, changed
+    content, or a new parser version) and writes the yearly csv files from the cache. If the csv
+    files already contain exactly these filings, nothing is written. Returns True if the csv files
+    were written. Rows are sorted by file name, as with parse_year_parallel.
+    Arguments: cache - connection of the parse cache (see f7_parse_cache.py), file_dir - folder
+               containing the yearly folders or packs of filings, output_dir - folder for the csv
+               files, year - string name of the yearly folder, file_names - filings of the year
+               (default: all filings of the year), hashes - dict file name -> sha256, e.g., from
+               the download catalog (default: computed from the filings), storage - 'files' or
+               'pack', pool - optional multiprocessing pool for parsing, chunk_size - number of
+               filings handed to a worker at once, metrics - optional Metrics.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if file_names is None:
+        file_names = list_filings(file_dir, year, storage)
+    if hashes is None:
+        hashes = {f: content_hash(read_bytes(file_dir, year, f, storage)) for f in file_names}
+    else:
+        hashes = {f: hashes[f] for f in file_names}
+
+    csv_paths = [os.path.join(output_dir, f'nsar_{table}_{year}.csv') for table in TABLES]
+    if output_is_current(cache, year, hashes) and all(os.path.exists(p) for p in csv_paths):
+        print(f'Year {year} is unchanged.')
+        return False
+
+    # filings to be parsed; identical content is parsed once
+    missing = {}
+    for file_name in sorted(hashes):
+        if hashes[file_name] not in missing and not is_cached(cache, hashes[file_name]):
+            missing[hashes[file_name]] = file_name
+    file_names = list(missing.values())
+    if storage == 'pack':
+        # read the pack sequentially
+        index = load_index(file_dir, year)
+        file_names.sort(key=lambda f: index.get(f, (-1, 0)))
+
+    tasks = [(file_dir, year, file_names[i:i+chunk_size], storage)
+             for i in range(0, len(file_names), chunk_size)]
+    for results, snapshot in (map if pool is None else pool.imap_unordered)(parse_results, tasks):
+        metrics.merge(snapshot)
+        for file_name, result, error in results:
+            store_result(cache, hashes[file_name], result, error)
+            if result is not None and error is not None:
+                error = f'In parse_file: {os.path.join(file_dir, year, file_name)}, partial: {error}'
+                print(error)
+                metrics.write('error', message=error)
+        cache.commit()
+    print(f'Parsed {len(file_names)} of {len(hashes)} filings, the others are cached.')
+    metrics.count('files_cached', len(hashes) - len(file_names))
+
+    # write the yearly csv files from the cache
+    csv_files = [open(p, 'w', newline='', encoding='utf-8') for p in csv_paths]
+    writers = [csv.writer(f) for f in csv_files]
+    for writer, header in zip(writers, TABLES.values()):
+        writer.writerow(header)
+    writer_registrants, writer_funds, writer_advisers = writers
+    for file_name in sorted(hashes):
+        result, error = load_result(cache, hashes[file_name], file_name)
+        if result is None:
+            error = f'In parse_file: {os.path.join(file_dir, year, file_name)}, error: {error}'
+            print(error)
+            metrics.write('error', message=error)
+            continue
+        registrant_info, fund_info, adviser_info = result
+        writer_registrants.writerow(registrant_info)
+        writer_funds.writerows(fund_info)
+        writer_advisers.writerows(adviser_info)
+    for f in csv_files:
+        f.close()
+
+    record_output(cache, year, hashes)
+    return True
+
+def read_csv_header(csv_path):
+    """
+    Returns the column names of a csv file and its first line as bytes.
+    Arguments: csv_path - path of the csv file.
+    """
+    with open(csv_path, 'rb') as f:
+        line = f.readline()
+    return next(csv.reader([line.decode('utf-8', 'replace')]), []), line
+
+def copy_rows(csv_path, start, output):
+    """
+    Copies the rows of a csv file byte by byte, in blocks, to an open binary file.
+    Arguments: csv_path - path of the csv file, start - position of the first row,
+               output - binary file the rows are appended to.
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        shutil.copyfileobj(f, output, COPY_BUFFER)
+
+def iter_rows(csv_path, header):
+    """
+    Yields the rows of a csv file with the columns in the order of the given header; columns the
+    file does not have are empty.
+    Arguments: csv_path - path of the csv file, header - list of column names.
+    """
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        if columns == header:
+            yield from reader
+            return
+        positions = [columns.index(column) if column in columns else None for column in header]
+        for row in reader:
+            yield [row[i] if i is not None and i < len(row) else '' for i in positions]
+
+def unseen_rows(rows, positions, seen):
+    """
+    Yields only the rows whose key has not been seen before; the keys are kept in an on-disk
+    SQLite table instead of memory and are checked in batches.
+    Arguments: rows - iterable of rows, positions - positions of the key columns,
+               seen - SQLite connection with the table seen.
+    """
+    def new_rows(batch):
+        keys = [hashlib.blake2b('\x1f'.join(row[i] for i in positions).encode(), digest_size=16).digest()
+                for row in batch]
+        # keys of the batch that were seen in earlier batches
+        known = set()
+        for i in range(0, len(keys), SEEN_QUERY):
+            part = keys[i:i+SEEN_QUERY]
+            known.update(key for key, in seen.execute(
+                f'SELECT key FROM seen WHERE key IN ({",".join("?" * len(part))})', part))
+        new = []
+        for row, key in zip(batch, keys):
+            if key not in known:
+                # also skips duplicates within the batch
+                known.add(key)
+                new.append((key,))
+                yield row
+        seen.executemany('INSERT INTO seen VALUES (?)', new)
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEEN_BATCH:
+            yield from new_rows(batch)
+            batch = []
+    yield from new_rows(batch)
+
+def combine_tables(csv_paths, output_path, keys=None):
+    """
+    Combines csv files with the same columns into one file with constant memory: the rows are
+    copied byte by byte when a file has the same header as the first one and otherwise streamed
+    row by row. Values are written as they are, e.g., identifiers keep their leading zeros.
+    Arguments: csv_paths - paths of the csv files, e.g., the yearly tables, output_path - path of
+               the combined file, keys - optional key columns; only the first row of every key
+               is kept, using an on-disk set next to the output (deleted afterwards).
+    """
+    header, first_line = read_csv_header(csv_paths[0])
+    seen = None
+    if keys is not None:
+        positions = [header.index(column) for column in keys]
+        if os.path.exists(output_path + '.seen'):
+            os.remove(output_path + '.seen')
+        seen = sqlite3.connect(output_path + '.seen')
+        seen.execute('PRAGMA journal_mode = OFF')
+        seen.execute('PRAGMA synchronous = OFF')
+        seen.execute('CREATE TABLE seen (key BLOB PRIMARY KEY) WITHOUT ROWID')
+
+    try:
+        with open(output_path + '.part', 'wb') as output:
+            output.write(first_line)
+            # rows that are not copied are encoded like the csv files written by the parser (utf-8)
+            writer = csv.writer(codecs.getwriter('utf-8')(output))
+            for csv_path in csv_paths:
+                cur_header, cur_line = read_csv_header(csv_path)
+                if seen is None and cur_header == header:
+                    copy_rows(csv_path, len(cur_line), output)
+                    continue
+                rows = iter_rows(csv_path, header)
+                if seen is not None:
+                    rows = unseen_rows(rows, positions, seen)
+                writer.writerows(rows)
+    finally:
+        if seen is not None:
+            seen.close()
+            os.remove(output_path + '.seen')
+    os.replace(output_path + '.part', output_path)
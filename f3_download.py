@@ -0,0 +1,285 @@
+'''
+File: f3_download.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 11:03:17 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 11:03:17 am
+-----
+Description: Functions for downloading many EDGAR files concurrently while keeping a global
+             request rate, e.g., the 10 requests per second that EDGAR allows. Several processes
+             or machines can share one rate through a file (SharedTokenBucket).
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import time
+import uuid                                     # Owner tokens of lock files
+import asyncio                                  # Concurrent downloads
+import aiohttp                                  # Asynchronous HTTP requests
+from f13_metrics import Metrics                 # selfmade functions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# HTTP status codes worth another try; everything else is reported as failed right away
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# end of the first document of a submission; for N-CEN it is the primary XML form
+FIRST_DOCUMENT_END = b'</DOCUMENT>'
+
+# bytes read at once when a response is read only up to a marker
+CHUNK_SIZE = 65536
+
+# seconds between tries to get the lock of a shared rate file, and after which a lock is
+# considered left behind by a crashed worker
+LOCK_WAIT = 0.005
+LOCK_STALE = 10
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+class TokenBucket:
+    """
+    Token bucket shared by all downloads; every request takes one token and tokens refill at
+    a constant rate, so the request rate never exceeds 'rate' per second (after a burst of
+    at most 'capacity' requests).
+    Arguments: rate - tokens per second, capacity - maximum number of stored tokens.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Waits until a token is available and takes it.
+        """
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class SharedTokenBucket:
+    """
+    Request rate shared by all processes that use the same file, e.g., the workers of a sharded
+    download on several machines with a shared folder. The file holds the time of the next free
+    request slot; every request reserves a slot under a lock file and waits for it, so the
+    requests of all workers together stay below 'rate' per second. The lock file holds a token of
+    its owner and is only removed by the owner or, once it is stale, by a worker that finds the
+    same token in it, so no worker removes the live lock of another. The clocks of the machines
+    have to be synchronized (NTP).
+    Arguments: path - path of the rate file on storage shared by all workers, rate - requests per
+               second of all workers together.
+    """
+    def __init__(self, path, rate):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.rate = rate
+
+    def remove_lock(self, token):
+        """
+        Removes the lock file if it still holds token and returns whether it did. The lock is
+        moved aside first (only one worker can move it), so a lock that another worker took in
+        the meantime is recognized by its token and put back.
+        Arguments: token - token of the lock to remove.
+        """
+        aside = f'{self.lock_path}.{uuid.uuid4().hex}'
+        try:
+            os.rename(self.lock_path, aside)
+        except OSError:
+            return False
+        with open(aside, 'r') as f:
+            held = f.read()
+        if held != token:
+            try:
+                # fails if yet another worker has taken the lock already
+                os.link(aside, self.lock_path)
+            except OSError:
+                pass
+        os.remove(aside)
+        return held == token
+
+    def reserve(self):
+        """
+        Reserves the next free slot and returns its time, None if another worker holds the lock.
+        """
+        token = f'{os.getpid()} {uuid.uuid4().hex}'
+        try:
+            # creating the lock file either succeeds for exactly one worker or fails
+            lock = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                # the token is read before the age, so a lock taken in between looks fresh
+                with open(self.lock_path, 'r') as f:
+                    stale_token = f.read()
+                if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE:
+                    self.remove_lock(stale_token)
+            except OSError:
+                pass
+            return None
+        try:
+            os.write(lock, token.encode())
+            try:
+                with open(self.path, 'r') as f:
+                    next_slot = float(f.read())
+            except (FileNotFoundError, ValueError):
+                next_slot = 0.0
+            slot = max(time.time(), next_slot)
+            with open(self.path, 'w') as f:
+                f.write(repr(slot + 1 / self.rate))
+        finally:
+            os.close(lock)
+            self.remove_lock(token)
+        return slot
+
+    async def acquire(self):
+        """
+        Waits until the lock is free, reserves a slot, and waits until its time.
+        """
+        while True:
+            slot = self.reserve()
+            if slot is not None:
+                break
+            await asyncio.sleep(LOCK_WAIT)
+        delay = slot - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def read_until(resp, marker):
+    """
+    Reads a response only up to and including the first occurrence of marker and closes the
+    connection, so the rest of the file is not transferred; without the marker, the complete
+    response is returned.
+    Arguments: resp - aiohttp response, marker - bytes after which reading stops.
+    """
+    content = bytearray()
+    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+        # only the new chunk (and what the marker can span) has to be searched
+        start = max(len(content) - len(marker) + 1, 0)
+        content += chunk
+        end = content.find(marker, start)
+        if end != -1:
+            del content[end+len(marker):]
+            resp.close()
+            break
+    return bytes(content)
+
+async def fetch(session, bucket, url, retries, backoff, metrics=None, until=None):
+    """
+    Requests a single URL and retries with exponential backoff on rate limiting (429),
+    server errors (5xx), and connection errors. Returns (HTTP status, body, attempts); the body
+    is the bytes of the response as sent (not decoded), or None if the last response was not
+    successful.
+    Arguments: session - aiohttp session, bucket - shared TokenBucket, url - URL to request,
+               retries - number of retries, backoff - seconds to wait before the first retry,
+               metrics - optional Metrics (see f13_metrics.py) for requests and retries by reason,
+               until - optional marker; the body is only read up to it (see read_until).
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    for attempt in range(1, retries + 2):
+        await bucket.acquire()
+        metrics.count('requests')
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    content = await resp.read() if until is None else await read_until(resp, until)
+                    return resp.status, content, attempt
+                if resp.status not in RETRY_STATUS or attempt > retries:
+                    return resp.status, None, attempt
+                # respect the server's wish if it tells us how long to wait
+                wait = resp.headers.get('Retry-After', '')
+                wait = float(wait) if wait.isdigit() else backoff * 2**(attempt - 1)
+                metrics.count(f'retries.http_{resp.status}')
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as inst:
+            if attempt > retries:
+                raise
+            wait = backoff * 2**(attempt - 1)
+            metrics.count(f'retries.{type(inst).__name__}')
+        await asyncio.sleep(wait)
+
+def save_file(path, content):
+    """
+    Writes the file under a temporary name first, so that an interrupted download never
+    leaves a truncated file under the final name.
+    Arguments: path - output path, content - bytes to be written.
+    """
+    with open(path + '.part', 'wb') as outfile:
+        outfile.write(content)
+    os.replace(path + '.part', path)
+
+async def download_filings(tasks, user_agent, rate=10, max_in_flight=20, retries=5, backoff=1,
+                           timeout=60, progress_every=2000, record=None, save=save_file, metrics=None,
+                           first_document=None, bucket=None):
+    """
+    Downloads all (url, path) pairs and saves the response bytes as they are. A bounded number
+    of requests is in flight at any time, they share pooled keep-alive connections, and all of them
+    together stay below 'rate' requests per second (retries included). Failed downloads are printed
+    and not saved. Returns the number of saved and failed files.
+    Arguments: tasks - iterable of (url, path) pairs, user_agent - User-Agent header that EDGAR
+               requires (name and email), rate - requests per second, max_in_flight - concurrent
+               requests, retries - retries per file, backoff - seconds before the first retry,
+               timeout - seconds per request, progress_every - print progress every n files,
+               record - optional function record(url, http_status, attempts, content) called after
+               every file; content is None if the download failed, save - function save(path,
+               content) that stores a file (default: save_file), metrics - optional Metrics for
+               requests, retries, bytes, errors by type, and the slowest downloads,
+               first_document - optional set of URLs that are only downloaded up to the end of
+               their first document, e.g., the header and primary XML form of N-CEN filings,
+               bucket - optional rate shared with other processes (SharedTokenBucket); rate is
+               then ignored.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    first_document = first_document if first_document is not None else set()
+    bucket = bucket if bucket is not None else TokenBucket(rate)
+    tasks = iter(tasks)
+    count = {'saved': 0, 'failed': 0}
+
+    async def worker(session):
+        # the workers share one iterator, so each (url, path) is downloaded exactly once
+        for url, path in tasks:
+            status, attempts, content = None, retries + 1, None
+            # try-except block to catch errors and keep the code running
+            start = time.perf_counter()
+            try:
+                until = FIRST_DOCUMENT_END if url in first_document else None
+                status, content, attempts = await fetch(session, bucket, url, retries, backoff, metrics, until)
+                if content is None:
+                    raise ValueError(f'HTTP status {status}')
+                # write as output, i.e., save website; the bytes are not decoded and encoded again
+                save(path, content)
+                count['saved'] += 1
+                metrics.count('files')
+                metrics.count('bytes_downloaded', len(content))
+                metrics.item(url, time.perf_counter() - start, len(content))
+            except Exception as inst:
+                # print failed URL and error message, then continue with next file
+                print(url)
+                print(inst)
+                content = None
+                count['failed'] += 1
+                metrics.error(f'http_{status}' if status else type(inst).__name__, str(inst), url)
+            if record is not None:
+                record(url, status, attempts, content)
+
+            if (count['saved'] + count['failed']) % progress_every == 0:
+                print(f"{count['saved'] + count['failed']} files downloaded.")
+
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    async with aiohttp.ClientSession(connector=connector, headers={'User-Agent': user_agent},
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        await asyncio.gather(*[worker(session) for _ in range(max_in_flight)])
+
+    return count
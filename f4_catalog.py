@@ -0,0 +1,145 @@
+'''
+File: f4_catalog.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 11:48:05 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 11:48:05 am
+-----
+Description: Functions for the SQLite catalog of all filings from 'NSAR_directory.csv'. The catalog
+             keeps the download state of every filing, so the downloader and the parser can
+             decide what to skip, retry, or parse without listing the output folders.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import time
+import hashlib                      # Content hashes
+import sqlite3                      # Catalog database
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# one row per filing of the EDGAR index; state is 'pending', 'done', or 'failed'
+CATALOG_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS filings (
+    fname       TEXT PRIMARY KEY,
+    form_type   TEXT,
+    comp_name   TEXT,
+    cik         TEXT,
+    fdate       TEXT,
+    year        TEXT,
+    path        TEXT,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    size        INTEGER,
+    sha256      TEXT,
+    http_status INTEGER,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    updated     REAL
+);
+CREATE INDEX IF NOT EXISTS filings_state ON filings (state, year);
+'''
+
+# commit after this many recorded downloads, so an interrupted run loses little
+COMMIT_EVERY = 500
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def open_catalog(catalog_path):
+    """
+    Opens (and if necessary creates) the catalog database.
+    Arguments: catalog_path - path of the SQLite file.
+    """
+    con = sqlite3.connect(catalog_path)
+    con.executescript(CATALOG_SCHEMA)
+    return con
+
+def filing_path(output_dir, year, fname):
+    """
+    Returns the local path of a filing, i.e., OUTPUT_DIR/<year>/<file name>.
+    Arguments: output_dir - download folder, year - filing year, fname - EDGAR path of the filing.
+    """
+    return os.path.join(output_dir, str(year), fname.split("/")[-1])
+
+def add_index_rows(con, index_table, output_dir):
+    """
+    Adds the filings of the EDGAR index to the catalog; filings already in the catalog keep
+    their state. Returns the number of new filings.
+    Arguments: con - catalog connection, index_table - data frame with the columns of
+               'NSAR_directory.csv', output_dir - download folder.
+    """
+    before = con.total_changes
+    con.executemany(
+        'INSERT OR IGNORE INTO filings (fname, form_type, comp_name, cik, fdate, year, path) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((fname, form_type, comp_name, str(cik), fdate, fdate[:4],
+          filing_path(output_dir, fdate[:4], fname))
+         for form_type, comp_name, cik, fdate, fname
+         in index_table[['form_type', 'comp_name', 'cik', 'fdate', 'fname']].itertuples(index=False)))
+    con.commit()
+    return con.total_changes - before
+
+def adopt_existing_files(con):
+    """
+    One-time migration for downloads made before the catalog existed: pending filings whose file
+    is already on disk are marked as done, with their size and hash. Returns the number of files.
+    Arguments: con - catalog connection.
+    """
+    adopted = 0
+    for fname, path in con.execute("SELECT fname, path FROM filings WHERE state = 'pending'").fetchall():
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        # an empty file is what an interrupted download leaves behind
+        if content:
+            record_download(con, fname, 200, 0, content)
+            adopted += 1
+    con.commit()
+    return adopted
+
+def pending_filings(con, max_attempts):
+    """
+    Returns (fname, path, form type) of all filings that still need to be downloaded, i.e., that
+    are not done and have been tried fewer than max_attempts times.
+    Arguments: con - catalog connection, max_attempts - give up on a filing after so many requests.
+    """
+    return con.execute("SELECT fname, path, form_type FROM filings WHERE state != 'done' AND attempts < ?",
+                       (max_attempts,)).fetchall()
+
+def record_download(con, fname, http_status, attempts, content):
+    """
+    Records the result of a download; content is None if the download failed.
+    Arguments: con - catalog connection, fname - EDGAR path of the filing, http_status - status
+               of the last response (None if there was none), attempts - number of requests,
+               content - bytes as saved on disk.
+    """
+    if content is None:
+        con.execute("UPDATE filings SET state = 'failed', http_status = ?, attempts = attempts + ?, "
+                    "updated = ? WHERE fname = ?", (http_status, attempts, time.time(), fname))
+    else:
+        con.execute("UPDATE filings SET state = 'done', size = ?, sha256 = ?, http_status = ?, "
+                    "attempts = attempts + ?, updated = ? WHERE fname = ?",
+                    (len(content), hashlib.sha256(content).hexdigest(), http_status, attempts,
+                     time.time(), fname))
+    if con.total_changes % COMMIT_EVERY == 0:
+        con.commit()
+
+def downloaded_filings(con):
+    """
+    Returns the file names and hashes of all completely downloaded filings by year, e.g.,
+    {'2019': {'0001234567-19-000001.txt': '<sha256>', ...}}. Failed or interrupted downloads are
+    left out.
+    Arguments: con - catalog connection.
+    """
+    filings = {}
+    for year, path, sha256 in con.execute(
+            "SELECT year, path, sha256 FROM filings WHERE state = 'done' ORDER BY year"):
+        filings.setdefault(year, {})[os.path.basename(path)] = sha256
+    return filings
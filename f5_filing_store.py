@@ -0,0 +1,180 @@
+'''
+File: f5_filing_store.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 12:31:52 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 12:31:52 pm
+-----
+Description: Functions for storing the downloaded filings in one compressed pack file per year
+             instead of one text file per filing. Every filing is a separate gzip member of
+             '<year>.pack' (so the pack is a valid multi-member gzip file) and '<year>.pack.idx'
+             holds file name, offset, and length of every member for random access.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import zlib                         # gzip compression
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# compression level of the gzip members; 6 is the usual trade-off of speed and size
+COMPRESSION_LEVEL = 6
+
+# indexes and open pack files of the current process, keyed by pack path
+INDEXES = {}
+READERS = {}
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def pack_path(pack_dir, year):
+    """
+    Returns the path of the pack file of a year.
+    Arguments: pack_dir - folder containing the packs, year - filing year.
+    """
+    return os.path.join(pack_dir, f'{year}.pack')
+
+def pack_years(pack_dir):
+    """
+    Returns the years that have a pack file.
+    Arguments: pack_dir - folder containing the packs.
+    """
+    return sorted(f[:-5] for f in os.listdir(pack_dir) if f.endswith('.pack') and f[:-5].isdigit())
+
+def load_index(pack_dir, year):
+    """
+    Returns the index of a pack as dict file name -> (offset, length), in the order of the pack.
+    If a filing was added twice, the later copy counts. The index is cached per process.
+    Arguments: pack_dir - folder containing the packs, year - filing year.
+    """
+    path = pack_path(pack_dir, year)
+    if path not in INDEXES:
+        index = {}
+        if os.path.exists(path + '.idx'):
+            with open(path + '.idx', 'r', encoding='utf-8') as f:
+                for line in f:
+                    # a line without line break is left over from an interrupted append
+                    fields = line.rstrip('\n').split('\t')
+                    if not line.endswith('\n') or len(fields) != 3 or not fields[1].isdigit() \
+                            or not fields[2].isdigit():
+                        continue
+                    file_name, offset, length = fields
+                    index.pop(file_name, None)
+                    index[file_name] = (int(offset), int(length))
+        INDEXES[path] = index
+    return INDEXES[path]
+
+def trim_index(index_path, block_size=4096):
+    """
+    Cuts off a last line without line break, left over from an interrupted append, so that the
+    next entry starts on a line of its own.
+    Arguments: index_path - path of the index file, block_size - bytes searched at once.
+    """
+    if not os.path.exists(index_path):
+        return
+    with open(index_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        # the last line break, searched backwards in blocks
+        stop = end
+        while stop > 0:
+            start = max(stop - block_size, 0)
+            f.seek(start)
+            found = f.read(stop - start).rfind(b'\n')
+            if found != -1:
+                f.truncate(start + found + 1)
+                return
+            stop = start
+        f.truncate(0)
+
+def append_filing(pack_dir, year, file_name, content):
+    """
+    Compresses a filing and appends it to the pack of its year. The index entry is only
+    written after the data, so an interrupted append never points to a truncated member; the
+    partial entry of an interrupted append is cut off first.
+    Arguments: pack_dir - folder containing the packs, year - filing year,
+               file_name - name of the filing, content - bytes of the filing.
+    """
+    path = pack_path(pack_dir, year)
+    # wbits=31 writes a complete gzip member with header and checksum
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    member = compressor.compress(content) + compressor.flush()
+    with open(path, 'ab') as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(member)
+    trim_index(path + '.idx')
+    with open(path + '.idx', 'a', encoding='utf-8') as f:
+        f.write(f'{file_name}\t{offset}\t{len(member)}\n')
+    if path in INDEXES:
+        INDEXES[path].pop(file_name, None)
+        INDEXES[path][file_name] = (offset, len(member))
+
+def read_filing(pack_dir, year, file_name):
+    """
+    Returns the bytes of a single filing; the pack stays open for further reads.
+    Arguments: pack_dir - folder containing the packs, year - filing year, file_name - name of the filing.
+    """
+    path = pack_path(pack_dir, year)
+    offset, length = load_index(pack_dir, year)[file_name]
+    if path not in READERS:
+        READERS[path] = open(path, 'rb')
+    reader = READERS[path]
+    reader.seek(offset)
+    return zlib.decompress(reader.read(length), 31)
+
+def iter_filing_blocks(pack_dir, year, file_name, block_size=8192):
+    """
+    Yields the bytes of a single filing in decompressed blocks, so that a caller that only needs
+    its beginning (e.g., the header) can stop without decompressing the rest.
+    Arguments: pack_dir - folder containing the packs, year - filing year, file_name - name of the
+               filing, block_size - compressed bytes read at once.
+    """
+    path = pack_path(pack_dir, year)
+    offset, length = load_index(pack_dir, year)[file_name]
+    if path not in READERS:
+        READERS[path] = open(path, 'rb')
+    reader = READERS[path]
+    decompressor = zlib.decompressobj(31)
+    while length > 0 and not decompressor.eof:
+        # the reader is shared, so seek before every read
+        reader.seek(offset)
+        block = reader.read(min(block_size, length))
+        if not block:
+            break
+        offset += len(block)
+        length -= len(block)
+        yield decompressor.decompress(block)
+
+def iter_filings(pack_dir, year):
+    """
+    Yields (file name, bytes) of all filings of a pack in the order they are stored,
+    i.e., the pack is read sequentially from start to end.
+    Arguments: pack_dir - folder containing the packs, year - filing year.
+    """
+    for file_name in load_index(pack_dir, year):
+        yield file_name, read_filing(pack_dir, year, file_name)
+
+def pack_folder(file_dir, pack_dir, year):
+    """
+    Packs all filings of an existing yearly folder, e.g., OUTPUT_DIR/2019, into the pack of the year.
+    Filings already in the pack are skipped. The original files are not deleted.
+    Arguments: file_dir - folder containing the yearly folders of filings,
+               pack_dir - folder containing the packs, year - filing year.
+    """
+    index = load_index(pack_dir, year)
+    for file_name in sorted(os.listdir(os.path.join(file_dir, str(year)))):
+        if file_name in index or file_name.endswith('.part'):
+            continue
+        with open(os.path.join(file_dir, str(year), file_name), 'rb') as f:
+            append_filing(pack_dir, year, file_name, f.read())
@@ -0,0 +1,111 @@
+'''
+File: f6_columnar.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 1:20:09 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 1:20:09 pm
+-----
+Description: Functions for writing the parsed tables and the adviser panel as typed Parquet
+             datasets, partitioned by year (tables) or by year_month (adviser panel).
+             Read them with, e.g., pd.read_parquet(path, columns=[...], filters=[...]).
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import csv
+import pyarrow as pa                    # Columnar tables
+import pyarrow.csv as pa_csv            # Typed CSV reading
+import pyarrow.parquet as pq            # Parquet files
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# explicit types of the parsed tables; everything not listed is a string
+# dates are parsed from the EDGAR format YYYYMMDD, labels are dictionary encoded (categorical)
+LABEL = pa.dictionary(pa.int32(), pa.string())
+SCHEMAS = {
+    'registrants': {'cik': pa.int64(), 'fdate': pa.date32(), 'rdate': pa.date32(), 'ftype': LABEL},
+    'funds':       {'cik': pa.int64(), 'fdate': pa.date32()},
+    'advisers':    {'cik': pa.int64(), 'fdate': pa.date32(), 'adviser_info': LABEL},
+}
+
+# types of the adviser panel; year_month is the partition key
+PANEL_SCHEMA = pa.schema([('crd', pa.int64()), ('sec', pa.string()), ('name', pa.string()),
+                          ('city', pa.string()), ('state', pa.string()), ('zip', pa.string())])
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def read_typed_csv(csv_path, types):
+    """
+    Reads a csv file with the given column types; all other columns are read as strings,
+    empty values become nulls.
+    Arguments: csv_path - path of the csv file, types - dict column -> arrow type.
+    """
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    column_types = {}
+    for column in header:
+        column_type = types.get(column, pa.string())
+        # dates are read as timestamps with the EDGAR format and cast to dates below
+        column_types[column] = pa.timestamp('s') if column_type == pa.date32() else column_type
+    table = pa_csv.read_csv(csv_path, convert_options=pa_csv.ConvertOptions(
+        column_types=column_types, timestamp_parsers=['%Y%m%d'], strings_can_be_null=True))
+    for column, column_type in types.items():
+        if column_type == pa.date32() and column in header:
+            i = table.schema.get_field_index(column)
+            table = table.set_column(i, column, table.column(column).cast(pa.date32()))
+    return table
+
+def write_partition(table, dataset_dir, key, value, part='part-0'):
+    """
+    Writes a table as a file of the partition key=value of a Parquet dataset; an earlier version
+    of the same file is replaced. The file is written under a temporary name first, so an
+    interrupted write is not taken as complete.
+    Arguments: table - arrow table, dataset_dir - folder of the dataset, key - partition column,
+               value - partition value, part - name of the file within the partition.
+    """
+    partition_dir = os.path.join(dataset_dir, f'{key}={value}')
+    os.makedirs(partition_dir, exist_ok=True)
+    # hidden, so readers of the dataset skip it
+    temporary = os.path.join(partition_dir, f'.{part}.parquet.part')
+    pq.write_table(table, temporary)
+    os.replace(temporary, os.path.join(partition_dir, f'{part}.parquet'))
+
+def write_year_parquet(output_dir, year, tables=None, dataset_dir=None, part='part-0'):
+    """
+    Converts the yearly csv files of the parsed tables into the year=<year> partitions of the
+    datasets OUTPUT_DIR/nsar_registrants, nsar_funds, and nsar_advisers.
+    Arguments: output_dir - folder of the csv files and datasets, year - string year,
+               tables - names of the tables to convert (default: all), dataset_dir - folder of
+               the datasets if it is not output_dir, e.g., for the shards, part - name of the
+               file within the partition, e.g., one per shard.
+    """
+    dataset_dir = dataset_dir if dataset_dir is not None else output_dir
+    for table, types in SCHEMAS.items():
+        if tables is not None and table not in tables:
+            continue
+        data = read_typed_csv(os.path.join(output_dir, f'nsar_{table}_{year}.csv'), types)
+        write_partition(data, os.path.join(dataset_dir, f'nsar_{table}'), 'year', year, part)
+
+def write_panel_parquet(panel, dataset_dir, year_month, part):
+    """
+    Writes one monthly adviser file into the year_month=<year_month> partition of the
+    adviser panel dataset; several versions of the same month are separate files.
+    Arguments: panel - data frame with the columns crd, sec, name, city, state, zip,
+               dataset_dir - folder of the dataset, year_month - string, e.g., '20-07',
+               part - name of the file within the partition, e.g., 'ia070120'.
+    """
+    panel = panel.copy()
+    panel.columns = PANEL_SCHEMA.names
+    panel['crd'] = panel['crd'].astype('Int64')
+    for column in PANEL_SCHEMA.names[1:]:
+        panel[column] = panel[column].astype('string')
+    table = pa.Table.from_pandas(panel, schema=PANEL_SCHEMA, preserve_index=False)
+    write_partition(table, dataset_dir, 'year_month', year_month, part)
@@ -0,0 +1,121 @@
+'''
+File: f7_parse_cache.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 2:02:26 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 2:02:26 pm
+-----
+Description: Functions for the SQLite cache of parse results. Results are keyed by the sha256 of
+             the filing and PARSER_VERSION, so a filing is only parsed again if its content or
+             the parser changed. The cache also remembers which filings each yearly output holds.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import json                         # Serialized rows
+import hashlib                      # Content hashes
+import sqlite3                      # Cache database
+from f1_parse_filing import PARSER_VERSION
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# results: parsed rows without the file name (the same content may come under another name)
+# outputs: filings (and their hash) contained in the current yearly csv files
+CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    sha256          TEXT NOT NULL,
+    parser_version  TEXT NOT NULL,
+    rows            TEXT,
+    error           TEXT,
+    PRIMARY KEY (sha256, parser_version)
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    year            TEXT NOT NULL,
+    file_name       TEXT NOT NULL,
+    sha256          TEXT NOT NULL,
+    parser_version  TEXT NOT NULL,
+    PRIMARY KEY (year, file_name)
+);
+'''
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def open_cache(cache_path):
+    """
+    Opens (and if necessary creates) the cache and drops the results of other parser versions.
+    Arguments: cache_path - path of the SQLite file.
+    """
+    con = sqlite3.connect(cache_path)
+    con.executescript(CACHE_SCHEMA)
+    con.execute('DELETE FROM results WHERE parser_version != ?', (PARSER_VERSION,))
+    con.commit()
+    return con
+
+def content_hash(content):
+    """
+    Returns the sha256 of the bytes of a filing, the same hash the download catalog records.
+    Arguments: content - bytes of the filing.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+def is_cached(con, sha256):
+    """
+    Returns True if the filing with this hash was parsed by the current parser version.
+    Arguments: con - cache connection, sha256 - hash of the filing.
+    """
+    return con.execute('SELECT 1 FROM results WHERE sha256 = ? AND parser_version = ?',
+                       (sha256, PARSER_VERSION)).fetchone() is not None
+
+def store_result(con, sha256, result, error=None):
+    """
+    Stores the parse result of a filing; the file name (first column) is dropped from all rows.
+    Arguments: con - cache connection, sha256 - hash of the filing, result - tuple (registrant_info,
+               fund_info, adviser_info) as returned by parse_file, error - message if parsing failed
+               (or was partial).
+    """
+    rows = None
+    if result is not None:
+        registrant_info, fund_info, adviser_info = result
+        rows = json.dumps([registrant_info[1:], [e[1:] for e in fund_info], [e[1:] for e in adviser_info]])
+    con.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (sha256, PARSER_VERSION, rows, error))
+
+def load_result(con, sha256, file_name):
+    """
+    Returns the cached (registrant_info, fund_info, adviser_info) of a filing, with the file name
+    added back, or the error message if parsing failed.
+    Arguments: con - cache connection, sha256 - hash of the filing, file_name - name of the filing.
+    """
+    rows, error = con.execute('SELECT rows, error FROM results WHERE sha256 = ? AND parser_version = ?',
+                              (sha256, PARSER_VERSION)).fetchone()
+    if rows is None:
+        return None, error
+    registrant_info, fund_info, adviser_info = json.loads(rows)
+    return ([file_name] + registrant_info, [[file_name] + e for e in fund_info],
+            [[file_name] + e for e in adviser_info]), None
+
+def output_is_current(con, year, hashes):
+    """
+    Returns True if the yearly csv files contain exactly these filings, with the same content,
+    parsed by the current parser version.
+    Arguments: con - cache connection, year - string year, hashes - dict file name -> sha256.
+    """
+    previous = {file_name: (sha256, version) for file_name, sha256, version in con.execute(
+        'SELECT file_name, sha256, parser_version FROM outputs WHERE year = ?', (year,))}
+    return previous == {file_name: (sha256, PARSER_VERSION) for file_name, sha256 in hashes.items()}
+
+def record_output(con, year, hashes):
+    """
+    Remembers the filings contained in the yearly csv files.
+    Arguments: con - cache connection, year - string year, hashes - dict file name -> sha256.
+    """
+    con.execute('DELETE FROM outputs WHERE year = ?', (year,))
+    con.executemany('INSERT INTO outputs VALUES (?, ?, ?, ?)',
+                    ((year, f, h, PARSER_VERSION) for f, h in hashes.items()))
+    con.commit()
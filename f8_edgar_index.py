@@ -0,0 +1,403 @@
+'''
+File: f8_edgar_index.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 2:41:37 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 2:41:37 pm
+-----
+Description: Functions for extracting the N-SAR and N-CEN rows from EDGAR form.idx files.
+             The form type is the first column, so the relevant lines are found with a single
+             scan over the raw bytes and only those (well below 1% of all lines) are sliced
+             into columns and decoded. The incremental refresh only requests index files that
+             may have changed (conditional requests, daily indexes of the current quarter) and
+             appends the new rows to the directory. Optionally, the compressed full indexes are
+             downloaded and decompressed and filtered while they arrive, so only the header and
+             the relevant rows are saved.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import re                           # Regular Expressions
+import csv                          # CSV documents
+import json                         # Refresh state
+import time
+import zlib                         # Compressed index files
+import datetime
+from email.utils import formatdate    # HTTP dates
+import requests
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# columns of 'NSAR_directory.csv' and the headers of the index files they come from
+INDEX_COLUMNS = {
+    'form_type': 'Form Type',
+    'comp_name': 'Company Name',
+    'cik': 'CIK',
+    'fdate': 'Date Filed',
+    'fname': 'File Name',
+}
+
+# form types to be kept (prefixes)
+FORM_TYPES = ('NSAR', 'N-CEN')
+
+# start of the line with the column headers; the data starts after the dashed line below it
+HEADER = b'\nForm Type'
+
+# EDGAR index files; full indexes are per quarter, daily indexes per business day
+FULL_INDEX_URL = 'https://www.sec.gov/Archives/edgar/full-index/{yr}/{qtr}/form.idx'
+FULL_INDEX_GZ_URL = 'https://www.sec.gov/Archives/edgar/full-index/{yr}/{qtr}/form.gz'
+DAILY_INDEX_URL = 'https://www.sec.gov/Archives/edgar/daily-index/{yr}/{qtr}/form.{day}.idx'
+
+# local names of the index files
+FULL_INDEX_NAME = 'form-index-{yr}-{qtr}.txt'
+DAILY_INDEX_NAME = 'form-daily-{day}.txt'
+
+# a missing daily index is requested again for this many days, it may not be published yet
+DAILY_GRACE_DAYS = 3
+
+# bytes read at once from a response
+CHUNK_SIZE = 10240
+
+# seconds to wait for the connection and for every chunk of a response
+TIMEOUT = 60
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def column_offsets(header):
+    """
+    Returns the start of every column; the index files do not use a column separator, a column
+    always starts at the position of its header.
+    Arguments: header - header line of the index file.
+    """
+    return [header.find(name) for name in INDEX_COLUMNS.values()]
+
+def form_pattern(form_types=FORM_TYPES):
+    """
+    Returns a bytes pattern matching the complete lines that start with one of the form types.
+    Arguments: form_types - prefixes of the form types to be kept.
+    """
+    prefixes = b'|'.join(re.escape(f.encode('ascii')) for f in form_types)
+    return re.compile(rb'(?m)^(?:' + prefixes + rb')[^\n]*')
+
+def header_bounds(content):
+    """
+    Returns the start and end of the header line and the start of the data, i.e., of the line
+    after the dashed line below the header; data start is 0 if the header is not complete.
+    Arguments: content - bytes of (the beginning of) a form.idx file.
+    """
+    # the header line (line 8 of the full indexes) and the dashed line below it
+    header_start = content.find(HEADER) + 1
+    header_end = content.find(b'\n', header_start) + 1
+    data_start = content.find(b'\n', header_end) + 1
+    if header_start == 0 or header_end == 0:
+        return 0, 0, 0
+    return header_start, header_end, data_start
+
+def iter_index_rows(content, pattern=None):
+    """
+    Yields the stripped columns [form_type, comp_name, cik, fdate, fname] of all lines of an
+    index file whose form type starts with one of FORM_TYPES. Other lines are never split.
+    Arguments: content - bytes of a form.idx file, pattern - compiled pattern from form_pattern.
+    """
+    if pattern is None:
+        pattern = form_pattern()
+    header_start, header_end, data_start = header_bounds(content)
+    if data_start == 0:
+        return
+    bounds = column_offsets(content[header_start:header_end].decode('utf-8', 'replace'))
+    bounds = list(zip(bounds, bounds[1:] + [None]))
+    for match in pattern.finditer(content, data_start):
+        # the offsets count characters, so the line is decoded before it is sliced
+        line = match.group().decode('utf-8', 'replace')
+        row = [line[a:b].strip() for a, b in bounds]
+        # daily indexes write the date as YYYYMMDD, full indexes as YYYY-MM-DD
+        if len(row[3]) == 8 and row[3].isdigit():
+            row[3] = f'{row[3][:4]}-{row[3][4:6]}-{row[3][6:]}'
+        yield row
+
+def filter_index(chunks, compressed=False, pattern=None):
+    """
+    Yields the parts of an index file that are worth saving, while the file arrives: everything
+    up to the dashed line below the header and then only the lines of the relevant filings.
+    The result is a valid index file for iter_index_rows. Chunks of a gzip file (form.gz) are
+    decompressed on the fly; a truncated gzip file raises an error.
+    Arguments: chunks - iterable of bytes, e.g., of a streamed response, compressed - whether
+               the chunks are gzip-compressed, pattern - compiled pattern from form_pattern.
+    """
+    if pattern is None:
+        pattern = form_pattern()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+    head, rest = b'', b''
+
+    def filtered(lines):
+        matches = pattern.findall(lines)
+        return b'\n'.join(matches) + b'\n' if matches else b''
+
+    for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        # only complete lines are filtered; the rest waits for the next chunk
+        lines = rest + chunk
+        end = lines.rfind(b'\n') + 1
+        lines, rest = lines[:end], lines[end:]
+        if head is not None:
+            head += lines
+            data_start = header_bounds(head)[2]
+            if data_start == 0:
+                continue
+            yield head[:data_start]
+            lines, head = head[data_start:], None
+        yield filtered(lines)
+
+    if decompressor is not None:
+        rest += decompressor.flush()
+        if not decompressor.eof:
+            raise ValueError('Compressed index file is truncated.')
+    if head is not None:
+        # no header: nothing to filter
+        yield head + rest
+    else:
+        yield filtered(rest)
+
+def write_directory(index_paths, output_path, form_types=FORM_TYPES):
+    """
+    Writes the rows of the relevant filings of all index files to a single csv file, in the order
+    of the index files. The file is written under a temporary name first, so that an interrupted
+    run never leaves a truncated directory. Returns the number of rows.
+    Arguments: index_paths - paths of the form.idx files, output_path - path of the csv file,
+               form_types - prefixes of the form types to be kept.
+    """
+    pattern = form_pattern(form_types)
+    n_rows = 0
+    with open(output_path + '.part', 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(INDEX_COLUMNS)
+        for path in index_paths:
+            with open(path, 'rb') as f:
+                rows = list(iter_index_rows(f.read(), pattern))
+            writer.writerows(rows)
+            n_rows += len(rows)
+            print(f'File {os.path.basename(path)} successfully parsed ({len(rows)} filings).')
+    os.replace(output_path + '.part', output_path)
+    return n_rows
+
+def quarter_of(day):
+    """
+    Returns year and quarter (e.g., 'QTR3') of a date.
+    Arguments: day - datetime.date.
+    """
+    return day.year, f'QTR{(day.month - 1) // 3 + 1}'
+
+def quarter_start(yr, qtr):
+    """
+    Returns the first day of a quarter.
+    Arguments: yr - year, qtr - quarter, e.g., 'QTR3'.
+    """
+    return datetime.date(yr, 3 * int(qtr[-1]) - 2, 1)
+
+def quarter_end(yr, qtr):
+    """
+    Returns the last day of a quarter.
+    Arguments: yr - year, qtr - quarter, e.g., 'QTR3'.
+    """
+    if qtr == 'QTR4':
+        return datetime.date(yr, 12, 31)
+    return quarter_start(yr, f'QTR{int(qtr[-1]) + 1}') - datetime.timedelta(days=1)
+
+def index_files(file_dir):
+    """
+    Returns the paths of all local index files in chronological order: the full index of every
+    quarter and, for quarters without a full index yet, the daily indexes.
+    Arguments: file_dir - folder of the index files.
+    """
+    files = os.listdir(file_dir)
+    full = {f[11:-4] for f in files if f.startswith('form-index-') and f.endswith('.txt')}
+    keyed = [((f[11:15], f[16:20], ''), f) for f in files
+             if f.startswith('form-index-') and f.endswith('.txt')]
+    for f in files:
+        if f.startswith('form-daily-') and f.endswith('.txt'):
+            day = datetime.date(int(f[11:15]), int(f[15:17]), int(f[17:19]))
+            yr, qtr = quarter_of(day)
+            if f'{yr}-{qtr}' not in full:
+                keyed.append(((str(yr), qtr, f[11:19]), f))
+    return [os.path.join(file_dir, f) for key, f in sorted(keyed)]
+
+def load_state(state_path):
+    """
+    Returns the refresh state, i.e., the validators of the full indexes and the daily indexes
+    already requested.
+    Arguments: state_path - path of the json file.
+    """
+    if not os.path.exists(state_path):
+        return {'full': {}, 'daily': {}}
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(state, state_path):
+    """
+    Saves the refresh state under a temporary name first, like the index files.
+    Arguments: state - refresh state, state_path - path of the json file.
+    """
+    with open(state_path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(state_path + '.part', state_path)
+
+def fetch_index(session, url, path, entry=None, filtered=False, metrics=None):
+    """
+    Requests an index file and saves it. With the ETag and Last-Modified of an earlier response,
+    the request is conditional and EDGAR answers 304 (no body) if the file did not change.
+    Returns the HTTP status and the new entry with the validators of the response.
+    Arguments: session - requests session, url - URL of the index file, path - local path,
+               entry - validators of the saved file, dict with 'etag' and 'last_modified',
+               filtered - only save the header and the rows of the relevant filings (see
+               filter_index); a compressed file (.gz) is decompressed as well,
+               metrics - optional Metrics (see f13_metrics.py) for index files and bytes.
+    """
+    headers = {}
+    if entry and os.path.exists(path):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    r = session.get(url, headers=headers, stream=True, timeout=TIMEOUT)
+    if r.status_code != 200:
+        r.close()
+        if r.status_code == 304:
+            # the validators of the response replace the ones the request was made with
+            entry = {'etag': r.headers.get('ETag', entry.get('etag')),
+                     'last_modified': r.headers.get('Last-Modified', entry.get('last_modified'))}
+        return r.status_code, entry
+
+    def counted(chunks):
+        for chunk in chunks:
+            if metrics is not None:
+                metrics.count('bytes_downloaded', len(chunk))
+            yield chunk
+
+    chunks = counted(r.iter_content(chunk_size=CHUNK_SIZE))
+    if filtered:
+        chunks = filter_index(chunks, compressed=url.endswith('.gz'))
+    with open(path + '.part', 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            if metrics is not None:
+                metrics.count('bytes_written', len(chunk))
+    os.replace(path + '.part', path)
+    if metrics is not None:
+        metrics.count('index_files')
+    return 200, {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+
+def refresh_index(file_dir, years, quarters, user_agent, daily=True, today=None, pause=0.1,
+                  compressed=False, metrics=None):
+    """
+    Updates the local index files and returns the paths of the files that changed. A quarter is
+    requested if its full index is missing, was fetched before the quarter ended, or was saved
+    without a state (conditional request; without a state, on the modification time of the
+    file). With daily=True, the current quarter is covered by its daily indexes instead, each of
+    which is requested only once. The state is kept in FILE_DIR/index_state.json.
+    Arguments: file_dir - folder of the index files, years - years to be searched,
+               quarters - quarters to be searched, user_agent - User-Agent header that EDGAR
+               requires, daily - use the daily indexes for the current quarter,
+               today - current date (default: today), pause - seconds between requests,
+               compressed - request the compressed full indexes and save only the header and the
+               rows of the relevant filings of all index files (see filter_index),
+               metrics - optional Metrics (see f13_metrics.py) for index files and bytes.
+    """
+    today = today or datetime.date.today()
+    state_path = os.path.join(file_dir, 'index_state.json')
+    state = load_state(state_path)
+    session = requests.Session()
+    session.headers['User-Agent'] = user_agent
+    changed = []
+
+    for yr in years:
+        for qtr in quarters:
+            if quarter_start(yr, qtr) > today:
+                continue
+            current = (yr, qtr) == quarter_of(today)
+
+            if daily and current:
+                day = quarter_start(yr, qtr)
+                while day <= today:
+                    key = day.strftime('%Y%m%d')
+                    if day.weekday() < 5 and key not in state['daily']:
+                        path = os.path.join(file_dir, DAILY_INDEX_NAME.format(day=key))
+                        url = DAILY_INDEX_URL.format(yr=yr, qtr=qtr, day=key)
+                        status, _ = fetch_index(session, url, path, filtered=compressed, metrics=metrics)
+                        if status == 200:
+                            changed.append(path)
+                        # holidays have no daily index; recent days may just not be published yet
+                        if status == 200 or (status == 404 and (today - day).days > DAILY_GRACE_DAYS):
+                            state['daily'][key] = status
+                        time.sleep(pause)
+                    day += datetime.timedelta(days=1)
+                continue
+
+            name = FULL_INDEX_NAME.format(yr=yr, qtr=qtr)
+            path = os.path.join(file_dir, name)
+            entry = state['full'].get(name)
+            if os.path.exists(path):
+                # an index fetched after the end of its quarter does not change anymore
+                if entry is not None and entry['fetched'] > quarter_end(yr, qtr).isoformat():
+                    continue
+                # a file saved before the refresh state existed may be from before the end of its
+                # quarter; it is requested once if it changed since it was saved
+                if entry is None:
+                    modified = formatdate(os.path.getmtime(path), usegmt=True)
+                    entry = {'etag': None, 'last_modified': modified}
+            url = (FULL_INDEX_GZ_URL if compressed else FULL_INDEX_URL).format(yr=yr, qtr=qtr)
+            status, entry = fetch_index(session, url, path, entry, filtered=compressed, metrics=metrics)
+            if status in (200, 304):
+                # remember when the file was known to be up to date
+                state['full'][name] = dict(entry, fetched=today.isoformat())
+            if status == 200:
+                changed.append(path)
+            elif status != 304:
+                print(f'Index file for {yr}, {qtr}: HTTP status {status}.')
+            time.sleep(pause)
+
+    save_state(state, state_path)
+    return changed
+
+def append_directory(index_paths, directory_path, delta_path, form_types=FORM_TYPES):
+    """
+    Appends the rows of the relevant filings of the given index files that are not in the
+    directory yet and writes them to a separate delta file as well, e.g., for the downloader.
+    Returns the number of new rows.
+    Arguments: index_paths - paths of the changed index files, directory_path - path of
+               'NSAR_directory.csv', delta_path - path of the delta csv file,
+               form_types - prefixes of the form types to be kept.
+    """
+    pattern = form_pattern(form_types)
+    known = set()
+    if os.path.exists(directory_path):
+        with open(directory_path, 'r', newline='', encoding='utf-8') as f:
+            known = {row[-1] for row in csv.reader(f)}
+    new_rows = []
+    for path in index_paths:
+        with open(path, 'rb') as f:
+            for row in iter_index_rows(f.read(), pattern):
+                if row[-1] not in known:
+                    known.add(row[-1])
+                    new_rows.append(row)
+
+    new_directory = not os.path.exists(directory_path)
+    with open(directory_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new_directory:
+            writer.writerow(INDEX_COLUMNS)
+        writer.writerows(new_rows)
+    with open(delta_path + '.part', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(INDEX_COLUMNS)
+        writer.writerows(new_rows)
+    os.replace(delta_path + '.part', delta_path)
+    return len(new_rows)
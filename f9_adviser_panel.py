@@ -0,0 +1,98 @@
+'''
+File: f9_adviser_panel.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 3:36:14 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 3:36:14 pm
+-----
+Description: Functions for ingesting the monthly adviser files of the SEC: the zip files are
+             streamed to disk and only the needed columns of the workbooks are read, row by row,
+             with the read-only mode of openpyxl.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import shutil                                   # Copying files
+from zipfile import ZipFile                     # Unwrapping Zip Files
+import requests                                 # HTTP requests
+from openpyxl import load_workbook              # Excel workbooks
+import pandas as pd
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# columns of the adviser files that are kept (crd, sec, name, city, state, zip)
+PANEL_COLUMNS = ['Organization CRD#', 'SEC#', 'Primary Business Name',
+                 'Main Office City', 'Main Office State', 'Main Office Postal Code']
+
+# bytes per chunk of a streamed download
+CHUNK_SIZE = 1 << 20
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+def download_file(url, path, headers=None):
+    """
+    Streams a file to disk in chunks, so it is never held in memory as a whole. The file is
+    written under a temporary name first, so an interrupted download is not taken as complete.
+    Arguments: url - URL of the file, path - output path, headers - optional HTTP headers.
+    """
+    with requests.get(url, headers=headers, stream=True) as resp:
+        resp.raise_for_status()
+        with open(path + '.part', 'wb') as f:
+            for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+    os.replace(path + '.part', path)
+
+def workbook_names(zip_path):
+    """
+    Returns the names of the workbooks (.xlsx) of a zip file on disk as extract_workbooks writes
+    them, i.e., without the folders inside the zip file.
+    Arguments: zip_path - path of the zip file.
+    """
+    with ZipFile(zip_path) as f:
+        return [os.path.basename(name) for name in f.namelist() if name.endswith('.xlsx')]
+
+def extract_workbooks(zip_path, output_dir):
+    """
+    Extracts only the workbooks (.xlsx) of a zip file on disk directly into output_dir and
+    returns their names. Folders inside the zip file, including absolute paths and '..', are
+    dropped, so nothing is written outside output_dir. Every workbook is written under a
+    temporary name first, so an interrupted extraction is not taken as complete.
+    Arguments: zip_path - path of the zip file, output_dir - folder for the workbooks.
+    """
+    names = []
+    with ZipFile(zip_path) as f:
+        for member in f.namelist():
+            name = os.path.basename(member)
+            if not name.endswith('.xlsx'):
+                continue
+            path = os.path.join(output_dir, name)
+            with f.open(member) as workbook, open(path + '.part', 'wb') as output:
+                shutil.copyfileobj(workbook, output, CHUNK_SIZE)
+            os.replace(path + '.part', path)
+            names.append(name)
+    return names
+
+def read_workbook_columns(xlsx_path, columns=PANEL_COLUMNS):
+    """
+    Reads the given columns of the first sheet of a workbook into a data frame. The workbook is
+    read in read-only mode, i.e., row by row without loading all cells and their styles.
+    Arguments: xlsx_path - path of the workbook, columns - names of the columns in the first row.
+    """
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows))
+        positions = [header.index(column) for column in columns]
+        data = [[row[i] if i < len(row) else None for i in positions]
+                for row in rows if any(cell is not None for cell in row)]
+    finally:
+        workbook.close()
+    return pd.DataFrame(data, columns=columns)
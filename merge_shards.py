@@ -0,0 +1,81 @@
+'''
+File: merge_shards.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 10:21:06 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 10:21:06 pm
+-----
+Description: This code is the coordinator of a sharded download and parse (N_SHARDS in
+             '2_1_download_nsar_filings.py' and '3_parse_nsar_filings.py'). It checks that every
+             shard downloaded and parsed all of its filings, merges the catalogs of the shards
+             into the catalog, and combines the yearly tables of the shards into the same output
+             as an unsharded parse.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import pandas as pd
+from f2_parse_years import combine_tables, DEDUP_KEYS   # selfmade functions
+from f6_columnar import write_year_parquet
+from f16_shards import shard_dir, shard_path, check_shards, merge_catalogs, read_manifest
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# the settings of the download and the parse code
+FILING_LIST = 'D:/path/subpath/NSAR_directory.csv'
+# folder of the downloaded shards (OUTPUT_DIR of the download code)
+FILE_DIR = 'D:/path/subpath'
+# folder of the parsed shards and of the combined tables (OUTPUT_DIR of the parse code)
+OUTPUT_DIR = 'D:/path/subpath'
+# catalog; the shards have theirs next to it
+CATALOG = 'D:/path/subpath/catalog.sqlite'
+N_SHARDS = 4
+# filings that failed this many times are given up, they do not keep a shard incomplete
+MAX_ATTEMPTS = 20
+
+# 'csv' or 'parquet', see the parse code
+OUTPUT_FORMAT = 'csv'
+DEDUPLICATE = False
+
+
+# =================================================================================================
+# CHECK SHARDS
+# =================================================================================================
+filing_list = pd.read_csv(FILING_LIST, dtype=str, usecols=['fname'])
+problems, filings, counts = check_shards(filing_list['fname'].unique(), FILE_DIR, OUTPUT_DIR, CATALOG,
+                                         N_SHARDS, MAX_ATTEMPTS)
+for shard, shard_counts in counts.items():
+    print(f"Shard {shard}: {shard_counts}")
+if problems:
+    raise ValueError('The shards are incomplete:\n' + '\n'.join(problems))
+
+
+# =================================================================================================
+# MERGE CATALOGS AND TABLES
+# =================================================================================================
+merge_catalogs(CATALOG, [shard_path(CATALOG, shard, N_SHARDS) for shard in range(N_SHARDS)])
+
+# all shards parse the same tables
+tables = read_manifest(shard_dir(OUTPUT_DIR, 0, N_SHARDS), 'parse')['tables']
+years = sorted({year for shard_filings in filings.values() for year in shard_filings})
+
+if OUTPUT_FORMAT == 'csv':
+    # in the order of years, within a year in the order of shards
+    for table in tables:
+        combine_tables([os.path.join(shard_dir(OUTPUT_DIR, shard, N_SHARDS), f'nsar_{table}_{year}.csv')
+                        for year in years for shard in range(N_SHARDS) if year in filings[shard]],
+                       os.path.join(OUTPUT_DIR, f'nsar_{table}.csv'),
+                       DEDUP_KEYS[table] if DEDUPLICATE else None)
+else:
+    # every shard is a file of the partitions of the datasets
+    for shard in range(N_SHARDS):
+        for year in filings[shard]:
+            write_year_parquet(shard_dir(OUTPUT_DIR, shard, N_SHARDS), year, tables, OUTPUT_DIR,
+                               f'part-{shard}')
+print(f"{N_SHARDS} shards merged.")
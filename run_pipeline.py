@@ -0,0 +1,96 @@
+'''
+File: run_pipeline.py
+Project: Extract Location
+
+File Created: Saturday, 17th October 2026 7:31:40 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Saturday, 17th October 2026 7:31:40 pm
+-----
+Description: This code runs the numbered scripts as one pipeline. Every script is a stage whose
+             inputs and outputs are taken from the settings of the script; a stage only runs if
+             its code, inputs, or outputs changed since its last successful run, and the adviser
+             panel is downloaded while the filings are indexed, downloaded, and parsed.
+             Stages that fetch data from EDGAR have no local inputs, so they only run again
+             when they are listed in FORCE.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+from f14_pipeline import Stage, script, script_settings, local_modules, run_pipeline   # selfmade functions
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# fingerprints of the last successful run of every stage
+STATE = 'D:/path/subpath/pipeline_state.json'
+# folder for the output of every stage (<stage>.log); None prints it to the console
+LOG_DIR = None
+
+# stages that run even if they are current, e.g., ['index', 'download'] to fetch new filings
+FORCE = []
+# most stages running at the same time
+MAX_PARALLEL = 2
+
+
+# =================================================================================================
+# STAGES
+# =================================================================================================
+# folder of the scripts
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def stage(name, script_name, inputs, outputs):
+    """
+    Returns the stage that runs one of the numbered scripts of this folder.
+    Arguments: name - name of the stage, script_name - file name of the script,
+               inputs - paths read by the script, outputs - paths written by the script.
+    """
+    path = os.path.join(CODE_DIR, script_name)
+    log_path = os.path.join(LOG_DIR, f'{name}.log') if LOG_DIR else None
+    return Stage(name, script(path, log_path), inputs, outputs, local_modules(path))
+
+index = script_settings(os.path.join(CODE_DIR, '1_download_and_combine_edgar_index_files.py'))
+download = script_settings(os.path.join(CODE_DIR, '2_1_download_nsar_filings.py'))
+panel = script_settings(os.path.join(CODE_DIR, '2_2_download_adviser_locations.py'))
+parse = script_settings(os.path.join(CODE_DIR, '3_parse_nsar_filings.py'))
+link = script_settings(os.path.join(CODE_DIR, '4_link_adviser_locations.py'))
+geocode = script_settings(os.path.join(CODE_DIR, '5_geocode_adviser_locations.py'))
+
+# the combined tables of the parse code (only the registrants with REGISTRANTS_ONLY)
+parse_tables = ['registrants'] if parse['REGISTRANTS_ONLY'] else ['registrants', 'funds', 'advisers']
+if parse['OUTPUT_FORMAT'] == 'csv':
+    parse_outputs = [os.path.join(parse['OUTPUT_DIR'], f'nsar_{t}.csv') for t in parse_tables]
+else:
+    parse_outputs = [os.path.join(parse['OUTPUT_DIR'], f'nsar_{t}') for t in parse_tables]
+
+STAGES = [
+    stage('index', '1_download_and_combine_edgar_index_files.py', [],
+          [os.path.join(index['FILE_DIR'], 'NSAR_directory.csv')]),
+    # the catalog records every downloaded filing, so it stands for the downloaded files
+    stage('download', '2_1_download_nsar_filings.py', [download['FILING_LIST']], [download['CATALOG']]),
+    stage('adviser panel', '2_2_download_adviser_locations.py', [],
+          [os.path.join(panel['OUTPUT_DIR'], 'adviser_panel.csv' if panel['OUTPUT_FORMAT'] == 'csv'
+                        else 'adviser_panel')]
+          + ([os.path.join(panel['OUTPUT_DIR'], 'adviser_history.csv')] if panel['HISTORY'] else [])),
+    stage('parse', '3_parse_nsar_filings.py', [parse['CATALOG']], parse_outputs),
+    stage('link', '4_link_adviser_locations.py',
+          [os.path.join(link['PARSE_DIR'], f'nsar_{t}.csv') for t in ['advisers', 'funds']] + [link['PANEL']],
+          [os.path.join(link['OUTPUT_DIR'], 'nsar_adviser_locations.csv')]),
+    stage('geocode', '5_geocode_adviser_locations.py',
+          [geocode['REGISTRANTS'], geocode['LINKS'], geocode['GAZETTEER']],
+          [os.path.join(geocode['OUTPUT_DIR'], f) for f in ['nsar_registrant_coordinates.csv',
+                                                             'nsar_adviser_distances.csv']]),
+]
+
+
+# =================================================================================================
+# RUN
+# =================================================================================================
+if __name__ == '__main__':
+    if LOG_DIR:
+        os.makedirs(LOG_DIR, exist_ok=True)
+    status = run_pipeline(STAGES, STATE, FORCE, MAX_PARALLEL)
+    print(status)
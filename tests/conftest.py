@@ -0,0 +1,20 @@
+'''
+File: conftest.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 9:12:40 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 9:12:40 am
+-----
+Description: Settings of the tests (run with 'python -m pytest tests' from the code folder): the
+             selfmade functions are imported from the code folder.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,86 @@
+'''
+File: edgar_stub.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 9:41:26 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 9:41:26 am
+-----
+Description: Local stand-in for the EDGAR archive for testing the downloads: serves fixture filings
+             under /Archives/edgar/data/<cik>/<file name>, delays every response, answers with
+             scripted errors (e.g., 429 with Retry-After or 503) before a filing is served, and
+             404 for everything it does not know. Every request is recorded with its time.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from aiohttp import web
+
+
+# =================================================================================================
+# FUNCTIONS
+# =================================================================================================
+class EdgarStub:
+    """
+    Fixture filings and the faults of the stand-in server.
+    Arguments: filings - dict path (e.g., '/Archives/edgar/data/1/a.txt') -> bytes, delay - seconds
+               before every response, faults - dict path -> list of HTTP statuses answered before
+               the filing (one per request; a path without filing gets them forever, the last one
+               repeated), retry_after - value of the Retry-After header of 429 responses.
+    """
+    def __init__(self, filings, delay=0, faults=None, retry_after=None):
+        self.filings = filings
+        self.delay = delay
+        self.faults = faults if faults is not None else {}
+        self.retry_after = retry_after
+        # (perf_counter, path, status) of every request and the User-Agent headers
+        self.requests = []
+        self.user_agents = set()
+
+    def times(self, path=None):
+        """
+        Returns the times of all requests or of the requests of a path.
+        """
+        return [t for t, p, _ in self.requests if path is None or p == path]
+
+    async def handle(self, request):
+        path = request.path
+        arrived = time.perf_counter()
+        self.user_agents.add(request.headers.get('User-Agent'))
+        attempt = len(self.times(path))
+        faults = self.faults.get(path, [])
+        if attempt < len(faults) or (faults and path not in self.filings):
+            status = faults[min(attempt, len(faults) - 1)]
+        else:
+            status = 200 if path in self.filings else 404
+        self.requests.append((arrived, path, status))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if status == 200:
+            return web.Response(body=self.filings[path])
+        headers = {'Retry-After': str(self.retry_after)} if status == 429 and self.retry_after is not None else {}
+        return web.Response(status=status, headers=headers, text=f'status {status}')
+
+@asynccontextmanager
+async def serve(stub):
+    """
+    Runs the stand-in server on a free local port while the context is open and yields its base
+    URL, e.g., 'http://127.0.0.1:50123'.
+    Arguments: stub - EdgarStub.
+    """
+    app = web.Application()
+    app.router.add_get('/{path:.*}', stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        await runner.cleanup()
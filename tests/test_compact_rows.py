@@ -0,0 +1,61 @@
+'''
+File: test_compact_rows.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 10:21:45 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 10:21:45 am
+-----
+Description: Tests of the dictionary-encoded tables with the rows of the parsers.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import random
+from f1_parse_filing import parse_ncen_file, parse_nsar_file, FUND_HEADER, ADVISER_HEADER   # selfmade functions
+from f11_synthetic_filings import ncen_filing, nsar_filing
+from f15_compact_rows import CompactRows
+
+
+# =================================================================================================
+# TESTS
+# =================================================================================================
+def parsed_rows():
+    """
+    Returns the fund and adviser rows of an N-CEN and an N-SAR filing.
+    """
+    rng = random.Random(2)
+    _, ncen_funds, ncen_advisers = parse_ncen_file('0000000000-19-000001.txt', ncen_filing(rng).encode())
+    _, nsar_funds, nsar_advisers = parse_nsar_file('0000000000-19-000002.txt', nsar_filing(rng).encode())
+    return [(FUND_HEADER, ncen_funds + nsar_funds), (ADVISER_HEADER, ncen_advisers + nsar_advisers)]
+
+def test_round_trip_of_parsed_rows():
+    for header, rows in parsed_rows():
+        # N-CEN rows have integer fund and adviser IDs
+        assert any(isinstance(value, int) for row in rows for value in row)
+        compact = CompactRows(header, rows=rows)
+        assert list(compact) == rows
+
+        # as in the csv files, all values are strings
+        strings = [[str(value) for value in row] for row in rows]
+        table = compact.to_arrow()
+        assert table.column_names == header
+        assert [list(row.values()) for row in table.to_pylist()] == strings
+        assert compact.to_pandas().astype(str).values.tolist() == strings
+
+def test_missing_values():
+    header = ['accession', 'fund', 'adviser']
+    rows = [['a', 1, None], ['a', 2, 'X'], ['b', None, 'Y'], ['b', 2, None]]
+    compact = CompactRows(header, rows=rows)
+    assert list(compact) == rows
+
+    # missing values are nulls in Arrow and NaN in pandas, not a category
+    strings = [[None if value is None else str(value) for value in row] for row in rows]
+    assert [list(row.values()) for row in compact.to_arrow().to_pylist()] == strings
+    frame = compact.to_pandas()
+    assert list(frame['adviser'].cat.categories) == ['X', 'Y']
+    assert frame['adviser'].isna().tolist() == [True, False, False, True]
+    assert frame['fund'].tolist()[:2] == [1, 2] and frame['fund'].isna().tolist() == [False, False, True, False]
+    assert frame['accession'].tolist() == ['a', 'a', 'b', 'b']
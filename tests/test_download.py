@@ -0,0 +1,208 @@
+'''
+File: test_download.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 9:58:11 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 9:58:11 am
+-----
+Description: Tests of the download engine against the local stand-in for EDGAR (edgar_stub.py):
+             saved and failed files, retries on 429 and 503, Retry-After, 404, timeouts, and
+             the request rate, also of shard workers in separate processes that share one rate
+             file.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from f3_download import download_filings, SharedTokenBucket     # selfmade functions
+from f13_metrics import Metrics
+from f16_shards import shard_of
+from edgar_stub import EdgarStub, serve
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+USER_AGENT = 'Test Name test@example.com'
+
+
+# =================================================================================================
+# TESTS
+# =================================================================================================
+def fixture_filings(n):
+    """
+    Returns n small fixture filings by path.
+    """
+    return {f'/Archives/edgar/data/{i}/0000000000-19-{i:06d}.txt': f'filing {i}\n'.encode() * 100
+            for i in range(n)}
+
+def run_downloads(stub, paths, output_dir, **options):
+    """
+    Downloads the paths from the stand-in server into output_dir; returns the counts, the
+    metrics, and (HTTP status, attempts, saved) of every path.
+    """
+    metrics = Metrics()
+    records = {}
+
+    def record(url, status, attempts, content):
+        records[url[url.index('/Archives/'):]] = (status, attempts, content is not None)
+
+    async def main():
+        async with serve(stub) as base:
+            tasks = [(base + path, os.path.join(output_dir, path.rsplit('/', 1)[1])) for path in paths]
+            return await download_filings(tasks, USER_AGENT, record=record, metrics=metrics, **options)
+
+    count = asyncio.run(main())
+    return count, metrics, records
+
+def test_saved_failed_and_retries(tmp_path):
+    filings = fixture_filings(5)
+    paths = list(filings)
+    missing = '/Archives/edgar/data/9/0000000000-19-999999.txt'
+    broken = '/Archives/edgar/data/8/0000000000-19-888888.txt'
+    stub = EdgarStub(filings, faults={paths[0]: [503, 503], paths[1]: [429], broken: [503]})
+    count, metrics, records = run_downloads(stub, paths + [missing, broken], tmp_path, rate=1000,
+                                            retries=2, backoff=0.01)
+
+    assert count == {'saved': 5, 'failed': 2}
+    for path, content in filings.items():
+        with open(tmp_path / path.rsplit('/', 1)[1], 'rb') as f:
+            assert f.read() == content
+    assert not os.path.exists(tmp_path / missing.rsplit('/', 1)[1])
+    assert sorted(os.listdir(tmp_path)) == sorted(path.rsplit('/', 1)[1] for path in paths)
+
+    # a 404 is not retried, a lasting 503 is given up after the retries
+    assert records[paths[0]] == (200, 3, True)
+    assert records[paths[1]] == (200, 2, True)
+    assert records[missing] == (404, 1, False)
+    assert records[broken] == (503, 3, False)
+    assert metrics.counters['retries.http_503'] == 2 + 2
+    assert metrics.counters['retries.http_429'] == 1
+    assert metrics.counters['errors.http_404'] == 1
+    assert metrics.counters['errors.http_503'] == 1
+    assert metrics.counters['requests'] == len(stub.requests) == 3 + 2 + 3 + 1 + 3
+    assert stub.user_agents == {USER_AGENT}
+
+def test_retry_after_is_respected(tmp_path):
+    filings = fixture_filings(1)
+    path = list(filings)[0]
+    stub = EdgarStub(filings, faults={path: [429]}, retry_after=1)
+    count, _, _ = run_downloads(stub, [path], tmp_path, rate=1000, backoff=0.01)
+
+    first, second = stub.times(path)
+    assert count == {'saved': 1, 'failed': 0}
+    assert second - first >= 0.95
+
+def test_timeouts_are_retried_and_fail(tmp_path):
+    filings = fixture_filings(2)
+    stub = EdgarStub(filings, delay=0.5)
+    count, metrics, records = run_downloads(stub, list(filings), tmp_path, rate=1000, retries=1,
+                                            backoff=0.01, timeout=0.1)
+
+    assert count == {'saved': 0, 'failed': 2}
+    assert metrics.counters['retries.TimeoutError'] == 2
+    assert all(attempts == 2 and not saved for _, attempts, saved in records.values())
+
+def test_request_rate_with_latency(tmp_path):
+    rate, n = 20, 30
+    filings = fixture_filings(n)
+    stub = EdgarStub(filings, delay=0.2, faults={list(filings)[3]: [503]})
+    start = time.perf_counter()
+    count, _, _ = run_downloads(stub, list(filings), tmp_path, rate=rate, max_in_flight=10, backoff=0.01)
+    elapsed = time.perf_counter() - start
+
+    # all requests (the retry included) stay below the rate
+    times = sorted(stub.times())
+    assert count == {'saved': n, 'failed': 0}
+    assert len(times) == n + 1
+    for i, t in enumerate(times):
+        assert t - times[0] >= i / rate - 0.02
+    # requests are in flight at the same time; one after the other they would take n * 0.2 seconds
+    assert elapsed < n * 0.2 / 2
+
+def download_shard(base, paths, shard, n_shards, output_dir, rate_file, rate):
+    """
+    Downloads the paths of a shard like a worker of 2_1_download_nsar_filings.py (in its own
+    process) with the request rate shared through rate_file.
+    """
+    tasks = [(base + path, os.path.join(output_dir, path.rsplit('/', 1)[1]))
+             for path in paths if shard_of(path, n_shards) == shard]
+    os.makedirs(output_dir, exist_ok=True)
+    bucket = SharedTokenBucket(rate_file, rate)
+    asyncio.run(download_filings(tasks, USER_AGENT, rate=rate, backoff=0.01, bucket=bucket))
+
+def test_shard_workers_share_the_rate(tmp_path):
+    rate, n, n_shards = 20, 30, 3
+    filings = fixture_filings(n)
+    paths = list(filings)
+    stub = EdgarStub(filings)
+
+    # the stand-in server runs in a thread of this process, the workers in processes of their own
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    stop = asyncio.Event()
+    base = []
+
+    async def run_server():
+        async with serve(stub) as url:
+            base.append(url)
+            started.set()
+            await stop.wait()
+
+    server = threading.Thread(target=loop.run_until_complete, args=(run_server(),))
+    server.start()
+    started.wait()
+    try:
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=download_shard,
+                                   args=(base[0], paths, shard, n_shards, str(tmp_path / str(shard)),
+                                         str(tmp_path / 'rate'), rate))
+                   for shard in range(n_shards)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+        assert all(worker.exitcode == 0 for worker in workers)
+    finally:
+        loop.call_soon_threadsafe(stop.set)
+        server.join()
+        loop.close()
+
+    # every filing is downloaded once, by the worker of its shard
+    saved = [set(os.listdir(tmp_path / str(shard))) for shard in range(n_shards)]
+    assert all(saved)
+    assert sum(len(files) for files in saved) == len(set.union(*saved)) == n
+    assert set.union(*saved) == {path.rsplit('/', 1)[1] for path in paths}
+    assert sorted(p for _, p, _ in stub.requests) == sorted(paths)
+
+    # the workers together stay below the rate
+    times = sorted(stub.times())
+    assert len(times) == n
+    for i, t in enumerate(times):
+        assert t - times[0] >= i / rate - 0.02
+    assert not os.path.exists(tmp_path / 'rate.lock')
+
+def test_only_stale_or_own_locks_are_removed(tmp_path):
+    bucket = SharedTokenBucket(str(tmp_path / 'rate'), 10)
+    with open(bucket.lock_path, 'w') as f:
+        f.write('other worker')
+
+    # the live lock of another worker stays
+    assert not bucket.remove_lock('this worker')
+    assert bucket.reserve() is None
+    with open(bucket.lock_path, 'r') as f:
+        assert f.read() == 'other worker'
+
+    # a stale lock is removed, then the next slot can be reserved
+    os.utime(bucket.lock_path, (time.time() - 60, time.time() - 60))
+    assert bucket.reserve() is None
+    assert not os.path.exists(bucket.lock_path)
+    assert bucket.reserve() is not None
+    assert os.listdir(tmp_path) == ['rate']
@@ -0,0 +1,49 @@
+'''
+File: test_filing_store.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 2:06:51 pm
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 2:06:51 pm
+-----
+Description: Tests of the yearly packs of filings after an interrupted append.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import f5_filing_store                                       # selfmade functions
+from f5_filing_store import append_filing, load_index, read_filing, pack_path
+
+
+# =================================================================================================
+# TESTS
+# =================================================================================================
+def test_append_after_interrupted_index_write(tmp_path):
+    pack_dir = str(tmp_path)
+    append_filing(pack_dir, '2019', 'a.txt', b'filing a')
+    # an append interrupted while its index entry was written
+    with open(pack_path(pack_dir, '2019') + '.idx', 'a', encoding='utf-8') as f:
+        f.write('b.txt\t12')
+    append_filing(pack_dir, '2019', 'c.txt', b'filing c')
+
+    # a new process reads the index from disk
+    f5_filing_store.INDEXES.clear()
+    f5_filing_store.READERS.clear()
+    assert list(load_index(pack_dir, '2019')) == ['a.txt', 'c.txt']
+    assert read_filing(pack_dir, '2019', 'a.txt') == b'filing a'
+    assert read_filing(pack_dir, '2019', 'c.txt') == b'filing c'
+
+def test_malformed_lines_are_skipped(tmp_path):
+    pack_dir = str(tmp_path)
+    append_filing(pack_dir, '2019', 'a.txt', b'filing a')
+    with open(pack_path(pack_dir, '2019') + '.idx', 'a', encoding='utf-8') as f:
+        f.write('b.txt\t12c.txt\t0\t5\n')
+    append_filing(pack_dir, '2019', 'd.txt', b'filing d')
+
+    # the entries after a malformed line still count
+    f5_filing_store.INDEXES.clear()
+    f5_filing_store.READERS.clear()
+    assert list(load_index(pack_dir, '2019')) == ['a.txt', 'd.txt']
+    assert read_filing(pack_dir, '2019', 'd.txt') == b'filing d'
@@ -0,0 +1,71 @@
+'''
+File: test_parse_filing.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 9:14:02 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 9:14:02 am
+-----
+Description: Tests of the N-CEN parser with broken XML: the registrant and the funds completed
+             before the error are kept, and the error is reported.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import random
+from f1_parse_filing import parse_file, parse_ncen_file     # selfmade functions
+from f11_synthetic_filings import ncen_filing
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+FILE_NAME = '0000000000-19-000001.txt'
+FUND_END = '</managementInvestmentQuestion>'
+
+
+# =================================================================================================
+# TESTS
+# =================================================================================================
+def complete_filing():
+    """
+    Returns a synthetic N-CEN filing with five funds and its parse result.
+    """
+    filing = ncen_filing(random.Random(1), n_funds=5)
+    return filing, parse_ncen_file(FILE_NAME, filing.encode())
+
+def test_truncated_filing_keeps_complete_funds():
+    filing, (registrant, funds, advisers) = complete_filing()
+    # cut the filing within the fourth fund
+    cut = filing.index(FUND_END, filing.index(FUND_END, filing.index(FUND_END) + 1) + 1) + len(FUND_END) + 60
+    errors = []
+    result = parse_file(FILE_NAME, filing[:cut].encode(), errors)
+
+    assert result is not None
+    assert result[0] == registrant
+    assert result[1] == funds[:3]
+    assert result[2] == [row for row in advisers if row[3] < 3]
+    assert len(errors) == 1 and errors[0].startswith('ExpatError') and 'first 3 funds' in errors[0]
+
+def test_unescaped_ampersand_keeps_funds_before_it():
+    filing, (registrant, funds, advisers) = complete_filing()
+    # the third fund name becomes 'A & B FUND'
+    start = filing.index('<mgmtInvFundName>', filing.index(FUND_END, filing.index(FUND_END) + 1))
+    end = filing.index('</mgmtInvFundName>', start)
+    broken = filing[:start] + '<mgmtInvFundName>A & B FUND' + filing[end:]
+    errors = []
+    result = parse_file(FILE_NAME, broken.encode(), errors)
+
+    assert result[0] == registrant
+    assert result[1] == funds[:2]
+    assert result[2] == [row for row in advisers if row[3] < 2]
+    assert len(errors) == 1 and 'not well-formed' in errors[0] and 'first 2 funds' in errors[0]
+
+def test_well_formed_filing_has_no_errors():
+    filing, result = complete_filing()
+    errors = []
+    assert parse_file(FILE_NAME, filing.encode(), errors) == result
+    assert errors == []
+    assert len(result[1]) == 5
@@ -0,0 +1,51 @@
+'''
+File: test_parse_years.py
+Project: Extract Location
+
+File Created: Sunday, 18th October 2026 10:47:19 am
+
+Author: Georgij Alekseev (georgij.v.alekseev@gmail.com)
+-----
+Last Modified: Sunday, 18th October 2026 10:47:19 am
+-----
+Description: Tests of the yearly and combined tables: they are utf-8 whatever the platform
+             encoding, so every value the filings decode to can be written.
+'''
+# =================================================================================================
+# PACKAGES
+# =================================================================================================
+import re
+import csv
+import random
+from f2_parse_years import parse_year, combine_tables     # selfmade functions
+from f11_synthetic_filings import ncen_filing
+
+
+# =================================================================================================
+# SETTINGS
+# =================================================================================================
+# not in cp1252 (the platform encoding on Windows)
+FUND_NAME = 'ŁÓDŹ 東京 FUND'
+
+
+# =================================================================================================
+# TESTS
+# =================================================================================================
+def test_tables_are_utf8(tmp_path):
+    (tmp_path / 'filings' / '2019').mkdir(parents=True)
+    filing = ncen_filing(random.Random(3))
+    filing = re.sub('<mgmtInvFundName>[^<]*', f'<mgmtInvFundName>{FUND_NAME}', filing, count=1)
+    (tmp_path / 'filings' / '2019' / '0000000000-19-000001.txt').write_bytes(filing.encode('utf-8'))
+    parse_year(str(tmp_path / 'filings'), str(tmp_path), '2019')
+
+    funds = (tmp_path / 'nsar_funds_2019.csv').read_bytes().decode('utf-8')
+    assert FUND_NAME in funds
+
+    # a file with other columns is streamed row by row instead of copied
+    with open(tmp_path / 'other.csv', 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([['fund', 'file_name', 'cik', 'fdate', 'fund_id'],
+                                 [FUND_NAME, 'x', '1', '2', '0']])
+    combine_tables([str(tmp_path / 'nsar_funds_2019.csv'), str(tmp_path / 'other.csv')],
+                   str(tmp_path / 'nsar_funds.csv'))
+    combined = (tmp_path / 'nsar_funds.csv').read_bytes().decode('utf-8')
+    assert combined.count(FUND_NAME) == 2